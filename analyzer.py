@@ -0,0 +1,559 @@
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+from extraction import file_path, is_extraction_error, wait_for_extraction
+from metrics import increment, record_stage, stage_timer
+from prescreen import PRESCREEN_MIN_SCORE, rank_by_similarity
+from resilience import REQUEST_TIMEOUT, call_with_retries, is_api_error
+from result_cache import ResultCache, make_key
+from token_budget import RESUME_TOKEN_BUDGET, fit_to_budget
+
+# Model that makes the final call on every analysis
+CLAUDE_MODEL = os.getenv('CLAUDE_MODEL', 'claude-3-sonnet-20240229')
+# Set to a cheaper model (e.g. claude-3-haiku-20240307) to screen with it first and only escalate borderline cases
+CLAUDE_FAST_MODEL = os.getenv('CLAUDE_FAST_MODEL', '')
+# Fast-model scores in this inclusive band are re-analyzed by CLAUDE_MODEL
+ESCALATION_MIN_SCORE = int(os.getenv('ESCALATION_MIN_SCORE', 4))
+ESCALATION_MAX_SCORE = int(os.getenv('ESCALATION_MAX_SCORE', 7))
+
+# Everything about model routing that changes a live result, for cache keys; just the model when there is no cascade
+ANALYSIS_ROUTE = (f"{CLAUDE_FAST_MODEL}>{CLAUDE_MODEL}:{ESCALATION_MIN_SCORE}-{ESCALATION_MAX_SCORE}"
+                  if CLAUDE_FAST_MODEL else CLAUDE_MODEL)
+
+# USD per million input/output tokens; cache writes cost 1.25x input and cache reads 0.1x
+MODEL_PRICES = {
+    "claude-3-haiku-20240307": (0.25, 1.25),
+    "claude-3-5-haiku-20241022": (0.80, 4.00),
+    "claude-3-sonnet-20240229": (3.00, 15.00),
+    "claude-3-5-sonnet-20241022": (3.00, 15.00),
+    "claude-3-7-sonnet-20250219": (3.00, 15.00),
+    "claude-3-opus-20240229": (15.00, 75.00),
+}
+# Message Batches bill every token type at half the live price
+BATCH_DISCOUNT = 0.5
+
+# Bump whenever the prompt or the parsing changes so cached results are not reused
+PROMPT_VERSION = 3
+
+# Persistent cache of finished analyses (set RESULT_CACHE_MAX_MB=0 to disable)
+RESULT_CACHE = ResultCache(
+    os.getenv('RESULT_CACHE_PATH', os.path.join('.cache', 'results.sqlite3')),
+    int(float(os.getenv('RESULT_CACHE_MAX_MB', 100)) * 1024 * 1024)
+)
+
+RESULT_COLUMNS = ["File Name", "Name", "Email", "Phone", "Current Company Name", 
+                  "Current Designation", "Total Exp", "Match Score", "Recommendation", "Reason", "Resume Tokens", "Model"]
+
+# Batch concurrency settings
+MAX_CONCURRENT_REQUESTS = int(os.getenv('MAX_CONCURRENT_REQUESTS', 4))
+REQUESTS_PER_MINUTE = int(os.getenv('ANTHROPIC_REQUESTS_PER_MINUTE', 50))
+
+class RateLimiter:
+    """Token bucket shared by all workers, kept in sync with Anthropic rate-limit headers"""
+    
+    def __init__(self, requests_per_minute):
+        self.capacity = max(1, requests_per_minute)
+        self.tokens = float(self.capacity)
+        self.refill_rate = self.capacity / 60.0
+        self.updated_at = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+    
+    def _refill(self, now):
+        elapsed = now - self.updated_at
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.refill_rate)
+        self.updated_at = now
+    
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self.paused_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = max(self.paused_until - now, (1 - self.tokens) / self.refill_rate)
+            time.sleep(wait)
+    
+    def update_from_headers(self, headers):
+        """Tighten the bucket using the server's view of our remaining quota"""
+        if not headers:
+            return
+        
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            
+            remaining = headers.get('anthropic-ratelimit-requests-remaining')
+            if remaining is not None and remaining.isdigit():
+                self.tokens = min(self.tokens, float(remaining))
+            
+            pause = 0.0
+            retry_after = headers.get('retry-after')
+            if retry_after:
+                try:
+                    pause = float(retry_after)
+                except ValueError:
+                    pass
+            elif remaining == '0':
+                reset = headers.get('anthropic-ratelimit-requests-reset')
+                if reset:
+                    try:
+                        reset_at = datetime.fromisoformat(reset.replace('Z', '+00:00'))
+                        pause = (reset_at - datetime.now(timezone.utc)).total_seconds()
+                    except ValueError:
+                        pass
+            
+            if pause > 0:
+                self.paused_until = max(self.paused_until, now + pause)
+
+def model_cost(model, totals, batch=False):
+    """Estimated USD cost of the token totals on a model, or None if its price is unknown
+
+    With batch, the tokens were sent through the Message Batches API and cost BATCH_DISCOUNT as much.
+    """
+    if model not in MODEL_PRICES:
+        return None
+    input_price, output_price = MODEL_PRICES[model]
+    cost = (totals["input_tokens"] * input_price
+            + totals["cache_creation_input_tokens"] * input_price * 1.25
+            + totals["cache_read_input_tokens"] * input_price * 0.1
+            + totals["output_tokens"] * output_price) / 1_000_000
+    return cost * BATCH_DISCOUNT if batch else cost
+
+class UsageStats:
+    """Token usage summed over a batch, including prompt-cache reads and writes, with a breakdown per model"""
+    
+    FIELDS = ["input_tokens", "output_tokens", "cache_creation_input_tokens", "cache_read_input_tokens"]
+    
+    def __init__(self):
+        self.requests = 0
+        self.totals = dict.fromkeys(self.FIELDS, 0)
+        # model -> requests, seconds the API spent on them (failed attempts included) and token totals
+        self.models = {}
+        # Analyses the fast model handed on to CLAUDE_MODEL
+        self.escalations = 0
+        # Estimated resume tokens before and after fit_to_budget, over the resumes actually sent
+        self.resume_tokens = 0
+        self.resume_tokens_sent = 0
+        self.lock = threading.Lock()
+    
+    def add(self, usage, model=None, seconds=0.0):
+        if usage is None:
+            return
+        
+        model = model or CLAUDE_MODEL
+        with self.lock:
+            self.requests += 1
+            tier = self.models.setdefault(model, {"requests": 0, "seconds": 0.0, **dict.fromkeys(self.FIELDS, 0)})
+            tier["requests"] += 1
+            tier["seconds"] += seconds
+            for field in self.FIELDS:
+                tokens = getattr(usage, field, None) or 0
+                self.totals[field] += tokens
+                tier[field] += tokens
+        
+        for field in self.FIELDS:
+            increment("resume_tokens_total", getattr(usage, field, None) or 0, type=field, model=model)
+    
+    def add_escalation(self):
+        with self.lock:
+            self.escalations += 1
+    
+    def add_resume_tokens(self, original_tokens, tokens):
+        with self.lock:
+            self.resume_tokens += original_tokens
+            self.resume_tokens_sent += tokens
+    
+    def to_dict(self):
+        with self.lock:
+            return {"requests": self.requests, **self.totals,
+                    "models": {model: dict(tier) for model, tier in self.models.items()},
+                    "escalations": self.escalations,
+                    "resume_tokens": self.resume_tokens, "resume_tokens_sent": self.resume_tokens_sent}
+    
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls()
+        stats.requests = data.get("requests", 0)
+        for field in cls.FIELDS:
+            stats.totals[field] = data.get(field, 0)
+        stats.models = {model: dict(tier) for model, tier in data.get("models", {}).items()}
+        stats.escalations = data.get("escalations", 0)
+        stats.resume_tokens = data.get("resume_tokens", 0)
+        stats.resume_tokens_sent = data.get("resume_tokens_sent", 0)
+        return stats
+    
+    def summary(self, batch=False):
+        """One-line usage report; pass batch=True for Message Batches usage so costs get the batch discount"""
+        if not self.requests:
+            return ""
+        
+        totals = self.totals
+        summary = (f"{self.requests} API call(s): {totals['input_tokens']:,} input tokens, "
+                   f"{totals['cache_read_input_tokens']:,} cache read, "
+                   f"{totals['cache_creation_input_tokens']:,} cache write, "
+                   f"{totals['output_tokens']:,} output tokens")
+        saved = self.resume_tokens - self.resume_tokens_sent
+        if saved > 0:
+            summary += (f"; resume text trimmed from ~{self.resume_tokens:,} to ~{self.resume_tokens_sent:,} tokens "
+                        f"({saved / self.resume_tokens:.0%} saved)")
+        
+        tiers = []
+        for model, tier in self.models.items():
+            text = f"{model}: {tier['requests']} call(s)"
+            # Message Batches results carry no per-request latency
+            if tier["seconds"]:
+                text += f", avg {tier['seconds'] / tier['requests']:.1f}s"
+            cost = model_cost(model, tier, batch)
+            if cost is not None:
+                text += f", ~${cost:.4f}" + (" at batch rates" if batch else "")
+            tiers.append(text)
+        if tiers:
+            summary += f" · {'; '.join(tiers)}"
+        if self.escalations:
+            summary += f" · {self.escalations} escalated to the stronger model"
+        return summary
+
+def validate_job_requirements(job_title, important_duties, considerable_duties):
+    """Return an error message for the job form, or None if it is valid"""
+    if not job_title.strip():
+        return "Please enter the job title"
+    if not important_duties.strip():
+        return "Please enter the important duties"
+    if not considerable_duties.strip():
+        return "Please enter the considerable duties"
+    if len(important_duties) > 500:
+        return f"Important Duties exceeds 500 characters. Current: {len(important_duties)} characters"
+    if len(considerable_duties) > 500:
+        return f"Considerable Duties exceeds 500 characters. Current: {len(considerable_duties)} characters"
+    return None
+
+def build_job_prefix(job_title, important_duties, considerable_duties):
+    """Everything except the resume; identical across a batch so it can be prompt-cached"""
+    return f"""You are an expert HR analyst. Please analyze the candidate's resume in the user message against the job requirements and extract specific information.
+
+JOB TITLE: {job_title}
+
+IMPORTANT DUTIES CANDIDATE SHOULD HANDLE:
+{important_duties}
+
+CONSIDERABLE DUTIES CANDIDATE SHOULD HANDLE:
+{considerable_duties}
+
+ANALYSIS INSTRUCTIONS:
+1. Extract candidate's personal and professional information
+2. Identify candidate's CURRENT job duties and responsibilities from their resume
+3. For CURRENT_COMPANY and CURRENT_DESIGNATION, look for:
+   - Jobs with "Present", "Current", or the current year (2024/2025) as end date
+   - The most recent position that is still ongoing
+   - If multiple current positions, choose the primary/main one
+4. Compare candidate's CURRENT job duties with the Important Duties and Considerable Duties
+5. Apply the following matching logic:
+   - If candidate's CURRENT duties closely match Important Duties → "GOOD MATCH"
+   - If candidate's CURRENT duties closely match Considerable Duties → "CONSIDERABLE MATCH"  
+   - If candidate's CURRENT duties don't match either Important or Considerable Duties → "REJECT"
+
+IMPORTANT: Pay special attention to date ranges. "2024-Present", "2024-Current", or similar patterns indicate the CURRENT position.
+
+Record your analysis by calling the record_analysis tool. Base MATCH_SCORE, RECOMMENDATION and REASON on the candidate's CURRENT role duties.
+
+If any information is not available in the resume, write "Not Available" for that field."""
+
+def build_resume_message(resume_text):
+    return f"""CANDIDATE RESUME:
+{resume_text}"""
+
+# Structured output schema: the model must answer by calling this tool
+RECOMMENDATIONS = ["GOOD MATCH", "CONSIDERABLE MATCH", "REJECT"]
+
+ANALYSIS_TOOL = {
+    "name": "record_analysis",
+    "description": "Record the structured analysis of one candidate's resume against the job requirements.",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "candidate_name": {"type": "string", "description": "Full name"},
+            "email": {"type": "string", "description": "Email address"},
+            "phone": {"type": "string", "description": "Phone number"},
+            "current_company": {"type": "string", "description": "CURRENT/most recent ongoing company name - look for \"Present\" or current year"},
+            "current_designation": {"type": "string", "description": "CURRENT/most recent ongoing job title - look for \"Present\" or current year"},
+            "total_experience": {"type": "string", "description": "Total years of experience across all positions"},
+            "match_score": {"type": "integer", "minimum": 1, "maximum": 10, "description": "How well the CURRENT duties match the job requirements, 1-10"},
+            "recommendation": {"type": "string", "enum": RECOMMENDATIONS},
+            "reason": {"type": "string", "description": "One sentence explaining the decision based on CURRENT job duty matching"}
+        },
+        "required": ["candidate_name", "email", "phone", "current_company", "current_designation",
+                     "total_experience", "match_score", "recommendation", "reason"]
+    }
+}
+
+# Tool input field -> results table column
+ANALYSIS_FIELDS = {
+    "candidate_name": "Name",
+    "email": "Email",
+    "phone": "Phone",
+    "current_company": "Current Company Name",
+    "current_designation": "Current Designation",
+    "total_experience": "Total Exp",
+    "match_score": "Match Score",
+    "recommendation": "Recommendation",
+    "reason": "Reason"
+}
+
+# Retries when the reply does not match the schema
+ANALYSIS_MAX_ATTEMPTS = int(os.getenv('ANALYSIS_MAX_ATTEMPTS', 2))
+
+class AnalysisValidationError(ValueError):
+    """The model's reply did not match ANALYSIS_TOOL's schema"""
+
+def parse_analysis_message(message, filename):
+    """Validate the record_analysis tool call in a reply and turn it into a results row"""
+    tool_input = find_tool_input(message, ANALYSIS_TOOL["name"])
+    if not isinstance(tool_input, dict):
+        raise AnalysisValidationError("reply did not call record_analysis")
+    
+    missing = [field for field in ANALYSIS_FIELDS if field not in tool_input]
+    if missing:
+        raise AnalysisValidationError(f"missing fields: {', '.join(missing)}")
+    
+    score, recommendation = validate_match(tool_input)
+    candidate_data = {column: str(tool_input[field]).strip() or "Not Available" for field, column in ANALYSIS_FIELDS.items()}
+    candidate_data["Match Score"] = score
+    candidate_data["Recommendation"] = recommendation
+    candidate_data["File Name"] = filename
+    candidate_data["Model"] = message.model
+    return candidate_data
+
+def find_tool_input(message, tool_name):
+    return next(
+        (block.input for block in message.content if block.type == "tool_use" and block.name == tool_name),
+        None
+    )
+
+def validate_match(tool_input):
+    """(match_score, recommendation) from a tool call, normalized, or AnalysisValidationError"""
+    score = tool_input["match_score"]
+    if isinstance(score, str) and score.strip().isdigit():
+        score = int(score)
+    if isinstance(score, bool) or not isinstance(score, int) or not 1 <= score <= 10:
+        raise AnalysisValidationError(f"match_score must be an integer from 1 to 10, got {score!r}")
+    
+    recommendation = str(tool_input["recommendation"]).strip().upper()
+    if recommendation not in RECOMMENDATIONS:
+        raise AnalysisValidationError(f"unknown recommendation {tool_input['recommendation']!r}")
+    return score, recommendation
+
+def api_error_result(filename, error):
+    return {
+        "Name": "Error",
+        "Email": "Error",
+        "Phone": "Error",
+        "Current Company Name": "Error",
+        "Current Designation": "Error",
+        "Total Exp": "Error",
+        "Match Score": "Error",
+        "Recommendation": "Error",
+        "Reason": f"API Error: {error}",
+        "File Name": filename
+    }
+
+def file_error_result(filename, reason):
+    return {
+        "Name": "File Error",
+        "Email": "N/A",
+        "Phone": "N/A",
+        "Current Company Name": "N/A",
+        "Current Designation": "N/A",
+        "Total Exp": "N/A",
+        "Match Score": "N/A",
+        "Recommendation": "ERROR",
+        "Reason": reason,
+        "File Name": filename
+    }
+
+def prescreen_reject_result(filename, score, min_score):
+    return {
+        "Name": "Not Analyzed",
+        "Email": "N/A",
+        "Phone": "N/A",
+        "Current Company Name": "N/A",
+        "Current Designation": "N/A",
+        "Total Exp": "N/A",
+        "Match Score": "N/A",
+        "Recommendation": "REJECT (pre-screen)",
+        "Reason": f"Pre-screen similarity to the duties is {score:.2f}, below the {min_score:.2f} threshold",
+        "File Name": filename
+    }
+
+def resume_tokens_label(original_tokens, tokens):
+    """Per-file token count for the Resume Tokens column"""
+    if tokens < original_tokens:
+        return f"{tokens:,} (trimmed from {original_tokens:,})"
+    return f"{tokens:,}"
+
+def analysis_cache_key(resume_text, job_title, important_duties, considerable_duties, route=ANALYSIS_ROUTE):
+    return make_key(resume_text, job_title, important_duties, considerable_duties, route, PROMPT_VERSION)
+
+def needs_escalation(score):
+    return ESCALATION_MIN_SCORE <= score <= ESCALATION_MAX_SCORE
+
+def build_request_params(resume_text, job_title, important_duties, considerable_duties, model=CLAUDE_MODEL):
+    """Messages API parameters for one analysis, shared by live calls and Message Batches"""
+    return {
+        "model": model,
+        # The tool call is a few hundred tokens; this leaves headroom without inviting rambling
+        "max_tokens": 1024,
+        "tools": [ANALYSIS_TOOL],
+        "tool_choice": {"type": "tool", "name": ANALYSIS_TOOL["name"]},
+        # The job prefix is marked cacheable so every resume after the first reads it from cache
+        "system": [{
+            "type": "text",
+            "text": build_job_prefix(job_title, important_duties, considerable_duties),
+            "cache_control": {"type": "ephemeral"}
+        }],
+        "messages": [{"role": "user", "content": build_resume_message(resume_text)}]
+    }
+
+def request_analysis(client, params, parse, rate_limiter=None, usage=None, breaker=None, timings=None):
+    """Send one analysis request and return parse(message)
+    
+    Transient API errors are retried by call_with_retries; replies that fail validation
+    are asked for again, up to ANALYSIS_MAX_ATTEMPTS, before the last AnalysisValidationError is raised.
+    """
+    # Retries are handled by call_with_retries so they can share the batch's rate limiter and breaker
+    messages = client.with_options(max_retries=0, timeout=REQUEST_TIMEOUT).messages
+    
+    # API time of the attempts behind the current reply
+    attempt_seconds = []
+    
+    def timed_request():
+        # Each attempt is timed on its own; rate-limit waits and retry backoff are not API time
+        started = time.perf_counter()
+        try:
+            response = messages.with_raw_response.create(**params)
+        except Exception:
+            increment("resume_api_requests_total", outcome="error")
+            raise
+        finally:
+            attempt_seconds.append(time.perf_counter() - started)
+            record_stage("api", attempt_seconds[-1], timings)
+        increment("resume_api_requests_total", outcome="success")
+        return response
+    
+    for attempt in range(1, ANALYSIS_MAX_ATTEMPTS + 1):
+        attempt_seconds.clear()
+        response = call_with_retries(timed_request, rate_limiter, breaker)
+        message = response.parse()
+        if usage:
+            usage.add(message.usage, params["model"], sum(attempt_seconds))
+        
+        try:
+            with stage_timer("parse", timings):
+                return parse(message)
+        except AnalysisValidationError:
+            if attempt == ANALYSIS_MAX_ATTEMPTS:
+                raise
+
+def cascade_analysis(client, build_params, parse, escalate, rate_limiter=None, usage=None, breaker=None, timings=None):
+    """Run an analysis on CLAUDE_FAST_MODEL first, and on CLAUDE_MODEL only when it has to be
+    
+    build_params(model) gives the request for a model, and escalate(result) says whether a
+    fast result is too borderline to keep. A fast reply that still fails validation after
+    ANALYSIS_MAX_ATTEMPTS is escalated as well. API errors are not: they have already been
+    retried, and sending the resume to a second model would only add load to an overloaded API.
+    Without a fast model configured this is a single CLAUDE_MODEL request.
+    """
+    if not CLAUDE_FAST_MODEL:
+        return request_analysis(client, build_params(CLAUDE_MODEL), parse, rate_limiter, usage, breaker, timings)
+    
+    fast_result = None
+    try:
+        fast_result = request_analysis(client, build_params(CLAUDE_FAST_MODEL), parse, rate_limiter, usage, breaker, timings)
+        if not escalate(fast_result):
+            return fast_result
+    except AnalysisValidationError:
+        pass
+    
+    if usage:
+        usage.add_escalation()
+    increment("resume_escalations_total")
+    try:
+        return request_analysis(client, build_params(CLAUDE_MODEL), parse, rate_limiter, usage, breaker, timings)
+    except Exception as e:
+        # A borderline fast answer is still better than an error row, but a bug is still a bug
+        if fast_result is None or not (isinstance(e, AnalysisValidationError) or is_api_error(e)):
+            raise
+        return fast_result
+
+def analyze_single_resume(client, resume_text, job_title, important_duties, considerable_duties, filename, rate_limiter=None, usage=None, breaker=None, timings=None):
+    try:
+        return cascade_analysis(
+            client,
+            lambda model: build_request_params(resume_text, job_title, important_duties, considerable_duties, model),
+            lambda message: parse_analysis_message(message, filename),
+            lambda result: needs_escalation(result["Match Score"]),
+            rate_limiter, usage, breaker, timings
+        )
+    except AnalysisValidationError as e:
+        return api_error_result(filename, f"Invalid analysis response after {ANALYSIS_MAX_ATTEMPTS} attempt(s): {e}")
+    except Exception as e:
+        return api_error_result(filename, str(e))
+
+def prescreen_resume_files(resume_files, extractions, important_duties, considerable_duties, min_score=PRESCREEN_MIN_SCORE, timings=None):
+    """Split a batch into pre-screen rejects and the indexes still worth a Claude call, best match first
+    
+    Returns (rejected, order): rejected maps upload index to its finished row.
+    """
+    if min_score <= 0:
+        return {}, list(range(len(resume_files)))
+    
+    # Scoring needs every text, so this waits for the whole batch to be extracted
+    texts = [wait_for_extraction(extraction, file_path(resume_file)) for resume_file, extraction in zip(resume_files, extractions)]
+    readable = [index for index, text in enumerate(texts) if not is_extraction_error(text)]
+    with stage_timer("prescreen", timings):
+        scores, passed = rank_by_similarity([texts[index] for index in readable], important_duties, considerable_duties, min_score)
+    
+    passed_indexes = {readable[position] for position in passed}
+    rejected = {
+        index: prescreen_reject_result(os.path.basename(file_path(resume_files[index])), scores[position], min_score)
+        for position, index in enumerate(readable) if index not in passed_indexes
+    }
+    
+    # Unreadable files still go through analyze_resume_file so they get their error row
+    order = [readable[position] for position in passed]
+    order += [index for index in range(len(resume_files)) if index not in rejected and index not in passed_indexes]
+    return rejected, order
+
+def analyze_resume_file(client, resume_file, extraction, job_title, important_duties, considerable_duties, rate_limiter=None, usage=None, breaker=None, timings=None):
+    filename = os.path.basename(file_path(resume_file))
+    resume_text = wait_for_extraction(extraction, file_path(resume_file))
+    started = time.perf_counter()
+    
+    if is_extraction_error(resume_text):
+        return file_error_result(filename, resume_text)
+    
+    # Long resumes are cut down to their most relevant sections before prompting
+    resume_text, original_tokens, tokens = fit_to_budget(resume_text, RESUME_TOKEN_BUDGET)
+    
+    cache_key = analysis_cache_key(resume_text, job_title, important_duties, considerable_duties)
+    cached = RESULT_CACHE.get(cache_key)
+    if cached is not None:
+        cached["File Name"] = filename
+        cached["Resume Tokens"] = resume_tokens_label(original_tokens, tokens)
+        return cached
+    
+    if usage:
+        usage.add_resume_tokens(original_tokens, tokens)
+    candidate_data = analyze_single_resume(client, resume_text, job_title, important_duties, considerable_duties, filename, rate_limiter, usage, breaker, timings)
+    candidate_data["Resume Tokens"] = resume_tokens_label(original_tokens, tokens)
+    # Whole analysis of one resume, including rate-limit waits and retries
+    record_stage("analysis", time.perf_counter() - started, timings)
+    
+    # Don't cache transient API failures
+    if not candidate_data["Reason"].startswith("API Error"):
+        RESULT_CACHE.put(cache_key, candidate_data)
+    
+    return candidate_data
@@ -1,255 +1,401 @@
 import gradio as gr
-import anthropic
-import PyPDF2
-import docx
+import numpy as np
 import pandas as pd
-import re
 import os
+import tempfile
+import uuid
 from datetime import datetime
 
+import job_queue
+from analyzer import RESULT_CACHE, RESULT_COLUMNS, UsageStats, validate_job_requirements
+from batch_jobs import batch_job_rows, job_finished, list_jobs, load_job, prune_jobs
+from extraction import EXTRACTION_CACHE
+from metrics import StageTimings, render, stage_timer
+from multi_role import MULTI_ROLE_COLUMNS, score_matrix, validate_roles
+from prescreen import PRESCREEN_MIN_SCORE
+from session_store import SessionRegistry
+
+STATUS_COLUMN = "Status"
+
+# Rows shown per page of the results table; the full history stays server-side
+RESULTS_PAGE_SIZE = int(os.getenv('RESULTS_PAGE_SIZE', 50))
+
+SESSIONS = SessionRegistry()
+
+# Encrypts the browser id kept in localStorage; set it so browsers still see their jobs after a restart
+BROWSER_STATE_SECRET = os.getenv('BROWSER_STATE_SECRET')
+
 # Secure API key handling
 CLAUDE_API_KEY = os.getenv('ANTHROPIC_API_KEY')
 
-def extract_text_from_file(file):
-    if file is None:
-        return ""
+def add_color_indicators(df):
+    """Add a Status column with a color indicator based on Recommendation"""
+    recommendation = df['Recommendation'].astype(str).str.upper()
+    status = np.select(
+        [
+            recommendation.str.contains('GOOD MATCH', regex=False),
+            recommendation.str.contains('CONSIDERABLE MATCH', regex=False),
+            recommendation.str.contains('REJECT|ERROR')
+        ],
+        ["🟢", "🟠", "🔴"],
+        default="⚪"
+    )
     
-    file_extension = file.name.lower().split('.')[-1]
+    df_colored = df.copy()
+    df_colored.insert(0, STATUS_COLUMN, status)
+    return df_colored
+
+def build_results_table(all_candidates):
+    df = pd.DataFrame(all_candidates)
     
-    try:
-        if file_extension == 'pdf':
-            pdf_reader = PyPDF2.PdfReader(file)
-            text = ""
-            for page in pdf_reader.pages:
-                text += page.extract_text() + "\n"
-            return text
-        
-        elif file_extension in ['docx', 'doc']:
-            doc = docx.Document(file)
-            text = ""
-            for paragraph in doc.paragraphs:
-                text += paragraph.text + "\n"
-            return text
-        
-        elif file_extension == 'txt':
-            return file.read().decode('utf-8')
-        
-        else:
-            return f"Unsupported file format: {file.name}"
+    # Rows that never reached Claude (errors, pre-screen rejects) have no token count
+    df = df.reindex(columns=RESULT_COLUMNS, fill_value="N/A")
     
-    except Exception as e:
-        return f"Error reading {file.name}: {str(e)}"
-
-def analyze_single_resume(client, resume_text, job_title, important_duties, considerable_duties, filename):
-    prompt = f"""You are an expert HR analyst. Please analyze this candidate's resume against the job requirements and extract specific information.
+    # Add color indicators
+    return add_color_indicators(df)
 
-JOB TITLE: {job_title}
+def get_session(request):
+    """Server-side result store for the browser session behind a request"""
+    return SESSIONS.get(request.session_hash if request else "default")
 
-IMPORTANT DUTIES CANDIDATE SHOULD HANDLE:
-{important_duties}
+def job_owner(browser_id, request):
+    """Who queued jobs belong to: the id saved in the browser, or the page session if there is none"""
+    return browser_id or (request.session_hash if request else "default")
 
-CONSIDERABLE DUTIES CANDIDATE SHOULD HANDLE:
-{considerable_duties}
+def ensure_browser_id(browser_id):
+    """On page load: give a new browser its id and list the jobs it queued"""
+    browser_id = browser_id or uuid.uuid4().hex
+    return browser_id, gr.update(choices=queue_job_choices(browser_id)), gr.update(choices=batch_job_choices(browser_id))
 
-CANDIDATE RESUME:
-{resume_text}
+def page_count(total_rows):
+    return max(1, -(-total_rows // RESULTS_PAGE_SIZE))
 
-ANALYSIS INSTRUCTIONS:
-1. Extract candidate's personal and professional information
-2. Identify candidate's CURRENT job duties and responsibilities from their resume
-3. For CURRENT_COMPANY and CURRENT_DESIGNATION, look for:
-   - Jobs with "Present", "Current", or the current year (2024/2025) as end date
-   - The most recent position that is still ongoing
-   - If multiple current positions, choose the primary/main one
-4. Compare candidate's CURRENT job duties with the Important Duties and Considerable Duties
-5. Apply the following matching logic:
-   - If candidate's CURRENT duties closely match Important Duties → "GOOD MATCH"
-   - If candidate's CURRENT duties closely match Considerable Duties → "CONSIDERABLE MATCH"  
-   - If candidate's CURRENT duties don't match either Important or Considerable Duties → "REJECT"
+def results_page(session, page, pending=()):
+    """One page of stored rows; the current batch's finished rows are shown after the last page"""
+    total_rows = len(session)
+    pages = page_count(total_rows)
+    page = min(max(int(page or 1), 1), pages)
+    
+    start = (page - 1) * RESULTS_PAGE_SIZE
+    rows = session.slice(start, start + RESULTS_PAGE_SIZE)
+    if page == pages:
+        rows += list(pending)
+    
+    if rows:
+        with stage_timer("postprocess"):
+            df = build_results_table(rows)
+    else:
+        df = pd.DataFrame(columns=[STATUS_COLUMN] + RESULT_COLUMNS)
+    
+    info = f"Rows {start + 1 if rows else 0}-{start + len(rows)} of {total_rows + len(pending)} · Page {page} of {pages}"
+    return df, page, info
 
-IMPORTANT: Pay special attention to date ranges. "2024-Present", "2024-Current", or similar patterns indicate the CURRENT position.
+def show_results_page(page, request: gr.Request = None):
+    return results_page(get_session(request), page)
 
-Please provide your analysis in the following EXACT format:
+def previous_results_page(page, request: gr.Request = None):
+    return results_page(get_session(request), int(page or 1) - 1)
 
-CANDIDATE_NAME: [Extract full name]
-EMAIL: [Extract email address]
-PHONE: [Extract phone number]
-CURRENT_COMPANY: [Extract CURRENT/most recent ongoing company name - look for "Present" or current year]
-CURRENT_DESIGNATION: [Extract CURRENT/most recent ongoing job title - look for "Present" or current year]
-TOTAL_EXPERIENCE: [Extract total years of experience across all positions]
-MATCH_SCORE: [Rate 1-10 how well candidate's CURRENT duties match job requirements]
-RECOMMENDATION: [Either "GOOD MATCH" or "CONSIDERABLE MATCH" or "REJECT" based on CURRENT role duties]
-REASON: [One sentence explaining your decision based on CURRENT job duty matching]
+def next_results_page(page, request: gr.Request = None):
+    return results_page(get_session(request), int(page or 1) + 1)
 
-If any information is not available in the resume, write "Not Available" for that field."""
+def export_results(export_format, request: gr.Request = None):
+    """Write the whole session to CSV or Parquet; files are only produced when the user asks"""
+    session = get_session(request)
+    if not len(session):
+        return gr.update(value=None, visible=False), "⚠️ No results to export yet"
+    
+    df = pd.DataFrame(session.all_rows()).reindex(columns=RESULT_COLUMNS, fill_value="N/A")
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    export_dir = tempfile.mkdtemp(prefix="resume_export_")
     
     try:
-        message = client.messages.create(
-            model="claude-3-sonnet-20240229",
-            max_tokens=4000,
-            messages=[{"role": "user", "content": prompt}]
-        )
-        
-        analysis_text = message.content[0].text
-        
-        candidate_data = {
-            "Name": "Not Available",
-            "Email": "Not Available", 
-            "Phone": "Not Available",
-            "Current Company Name": "Not Available",
-            "Current Designation": "Not Available",
-            "Total Exp": "Not Available",
-            "Match Score": "Not Available",
-            "Recommendation": "Not Available",
-            "Reason": "Not Available",
-            "File Name": filename
-        }
-        
-        patterns = {
-            "Name": r"CANDIDATE_NAME:\s*(.+)",
-            "Email": r"EMAIL:\s*(.+)",
-            "Phone": r"PHONE:\s*(.+)",
-            "Current Company Name": r"CURRENT_COMPANY:\s*(.+)",
-            "Current Designation": r"CURRENT_DESIGNATION:\s*(.+)",
-            "Total Exp": r"TOTAL_EXPERIENCE:\s*(.+)",
-            "Match Score": r"MATCH_SCORE:\s*(.+)",
-            "Recommendation": r"RECOMMENDATION:\s*(.+)",
-            "Reason": r"REASON:\s*(.+)"
-        }
-        
-        for key, pattern in patterns.items():
-            match = re.search(pattern, analysis_text, re.IGNORECASE)
-            if match:
-                candidate_data[key] = match.group(1).strip()
-        
-        return candidate_data
-        
-    except Exception as e:
-        return {
-            "Name": "Error",
-            "Email": "Error",
-            "Phone": "Error",
-            "Current Company Name": "Error",
-            "Current Designation": "Error",
-            "Total Exp": "Error",
-            "Match Score": "Error",
-            "Recommendation": "Error",
-            "Reason": f"API Error: {str(e)}",
-            "File Name": filename
-        }
+        with stage_timer("export"):
+            if export_format == "Parquet":
+                path = os.path.join(export_dir, f"resume_analysis_{timestamp}.parquet")
+                # Columns mix "N/A" text with integer scores, so store everything as text
+                df.astype(str).to_parquet(path, index=False)
+            else:
+                path = os.path.join(export_dir, f"resume_analysis_{timestamp}.csv")
+                df.to_csv(path, index=False)
+    except ImportError:
+        return gr.update(value=None, visible=False), "⚠️ Parquet export needs pyarrow installed; use CSV instead"
+    
+    return gr.update(value=path, visible=True), f"✅ Exported {len(df)} row(s)"
 
-def add_color_indicators(df):
-    """Add color indicators to File Name based on Recommendation"""
-    df_colored = df.copy()
+def job_latency_text(job):
+    return tuple(f"{seconds:.1f}s" for seconds in job_queue.job_latency(job))
+
+def describe_queue_job(job):
+    wait, run = job_latency_text(job)
+    done = sum(item["result"] is not None for item in job["items"])
     
-    for idx, row in df_colored.iterrows():
-        recommendation = str(row['Recommendation']).upper()
-        filename = str(row['File Name'])
-        
-        if 'GOOD MATCH' in recommendation:
-            df_colored.at[idx, 'File Name'] = f"🟢 {filename}"
-        elif 'CONSIDERABLE MATCH' in recommendation:
-            df_colored.at[idx, 'File Name'] = f"🟠 {filename}"
-        elif 'REJECT' in recommendation or 'ERROR' in recommendation:
-            df_colored.at[idx, 'File Name'] = f"🔴 {filename}"
-        else:
-            df_colored.at[idx, 'File Name'] = f"⚪ {filename}"
+    if job["status"] == "queued":
+        ahead = job_queue.queue_position(job)
+        return f"⏳ Job `{job['id']}` queued ({ahead} job(s) ahead) · waiting {wait}"
+    if job["status"] == "running":
+        return f"⏳ Job `{job['id']}`: analyzed {done}/{job['total']} resume(s) · queued {wait}, running {run}"
+    if job["status"] == "failed":
+        return f"⚠️ Job `{job['id']}` failed after {done}/{job['total']} resume(s): {job['error']}"
     
-    return df_colored
+    status = f"✅ Analyzed {job['total']} resume(s) · queued {wait}, ran {run}"
+    prescreened = sum(str(row["Recommendation"]).endswith("(pre-screen)") for row in job_queue.job_rows(job))
+    if job["roles"]:
+        # Multi-role jobs have one row per role
+        status = f"✅ Matched {job['total']} resume(s) against {len(job['roles'])} role(s) · queued {wait}, ran {run}"
+        prescreened //= len(job["roles"])
+    if prescreened:
+        status += f" · {prescreened} rejected by pre-screen"
+    usage = UsageStats.from_dict(job["usage"])
+    if usage.requests:
+        status += f" · {usage.summary()}"
+    timings = StageTimings.from_dict(job["timings"]).summary()
+    if timings:
+        status += f"\n\nTiming: {timings}"
+    return status
 
-def analyze_multiple_resumes(resume_files, job_title, important_duties, considerable_duties, existing_data):
+def load_queue_job(session, job):
+    """Add a finished job's rows to the session once, however many times it is loaded"""
+    if job["id"] not in session.loaded_jobs:
+        session.loaded_jobs.add(job["id"])
+        session.append(job_queue.job_rows(job))
+
+def analyze_multiple_resumes(resume_files, job_title, important_duties, considerable_duties, prescreen_min_score=PRESCREEN_MIN_SCORE, browser_id="", request: gr.Request = None):
+    """Generator: queues the batch for the worker processes, then yields the latest results page as rows come in"""
+    session = get_session(request)
+    
+    def error_view(message):
+        return pd.DataFrame({"Error": [message]}), gr.update(), "", gr.update(visible=False), ""
+    
     # Check if API key is available
     if not CLAUDE_API_KEY:
-        error_df = pd.DataFrame({
-            "Error": ["⚠️ API Key not configured. Please contact administrator."]
-        })
-        return error_df, None, gr.update(visible=False)
+        yield error_view("⚠️ API Key not configured. Please contact administrator.")
+        return
     
     if not resume_files or len(resume_files) == 0:
-        return existing_data, None, gr.update(visible=False)
+        yield *results_page(session, page_count(len(session))), gr.update(), ""
+        return
     
     if len(resume_files) > 10:
-        return pd.DataFrame({"Error": ["Maximum 10 resume files allowed"]}), None, gr.update(visible=False)
+        error_message = "Maximum 10 resume files allowed"
+    else:
+        error_message = validate_job_requirements(job_title, important_duties, considerable_duties)
     
-    if not job_title.strip():
-        return pd.DataFrame({"Error": ["Please enter the job title"]}), None, gr.update(visible=False)
-        
-    if not important_duties.strip():
-        return pd.DataFrame({"Error": ["Please enter the important duties"]}), None, gr.update(visible=False)
-        
-    if not considerable_duties.strip():
-        return pd.DataFrame({"Error": ["Please enter the considerable duties"]}), None, gr.update(visible=False)
+    if error_message:
+        yield error_view(error_message)
+        return
     
-    if len(important_duties) > 500:
-        return pd.DataFrame({"Error": [f"Important Duties exceeds 500 characters. Current: {len(important_duties)} characters"]}), None, gr.update(visible=False)
+    # The work itself happens in the queue workers; this handler only polls,
+    # and the job keeps running if the browser goes away
+    job_id = job_queue.enqueue_job(resume_files, job_title, important_duties, considerable_duties, prescreen_min_score,
+                                   owner=job_owner(browser_id, request))
+    last_page = page_count(len(session))
+    seen = None
+    
+    for job in job_queue.watch_job(job_id):
+        if job["status"] in ("done", "failed"):
+            break
         
-    if len(considerable_duties) > 500:
-        return pd.DataFrame({"Error": [f"Considerable Duties exceeds 500 characters. Current: {len(considerable_duties)} characters"]}), None, gr.update(visible=False)
+        finished = job_queue.job_rows(job)
+        status = describe_queue_job(job)
+        # Redraw the table only when a row has arrived; otherwise just refresh the status line
+        if len(finished) != seen:
+            seen = len(finished)
+            yield *results_page(session, last_page, finished), gr.update(), status
+        else:
+            yield gr.update(), gr.update(), gr.update(), gr.update(), status
     
-    try:
-        client = anthropic.Anthropic(api_key=CLAUDE_API_KEY)
-    except Exception as e:
-        return pd.DataFrame({"Error": [f"Error initializing Claude API: {str(e)}"]}), None, gr.update(visible=False)
-    
-    all_candidates = []
-    
-    # Add existing data if any
-    if existing_data is not None and not existing_data.empty:
-        # Remove color indicators from existing data for processing
-        existing_clean = existing_data.copy()
-        if 'File Name' in existing_clean.columns:
-            for idx, row in existing_clean.iterrows():
-                filename = str(row['File Name'])
-                clean_filename = re.sub(r'^[🟢🟠🔴⚪] ', '', filename)
-                existing_clean.at[idx, 'File Name'] = clean_filename
-        all_candidates.extend(existing_clean.to_dict('records'))
-    
-    for resume_file in resume_files:
-        resume_text = extract_text_from_file(resume_file)
-        filename = os.path.basename(resume_file.name)
+    if job["status"] not in ("done", "failed"):
+        yield gr.update(), gr.update(), gr.update(), gr.update(), no_workers_status(job)
+        return
+    
+    load_queue_job(session, job)
+    
+    # Show the "Upload More Resumes" section after first analysis
+    yield *results_page(session, page_count(len(session))), gr.update(visible=True), describe_queue_job(job)
+
+def no_workers_status(job):
+    return (f"⚠️ No queue worker is running, so job `{job['id']}` is still {job['status']}. "
+            "It will continue once a worker starts; check on it under Job Queue.")
+
+def queue_job_choices(owner):
+    return [job["id"] for job in job_queue.list_jobs(owner)]
+
+def refresh_queue_jobs(browser_id="", request: gr.Request = None):
+    return gr.update(choices=queue_job_choices(job_owner(browser_id, request))), show_queue_status()
+
+def show_queue_status():
+    """Show queue depth and recent job latency"""
+    stats = job_queue.queue_stats()
+    return (f"Job queue: {stats['queued']} queued, {stats['running']} running, "
+            f"{stats['waiting']} bulk batch(es) in progress, {stats['done']} done, {stats['failed']} failed · "
+            f"average wait {stats['avg_wait_seconds']:.1f}s, run {stats['avg_run_seconds']:.1f}s")
+
+def check_queue_job(job_id, browser_id="", request: gr.Request = None):
+    """Reattach to a queued job, e.g. after a page refresh, and load its rows when it has finished"""
+    no_change = (gr.update(), gr.update(), gr.update(), gr.update())
+    if not job_id:
+        return "⚠️ Select a job first", *no_change
+    
+    job = job_queue.get_job(job_id)
+    # Other people's jobs hold their candidates' details: treat them as missing
+    if job is None or job["owner"] != job_owner(browser_id, request):
+        return f"⚠️ Job `{job_id}` not found", *no_change
+    
+    # Multi-role results go to the score matrix rather than the session's table
+    if job["roles"]:
+        return describe_queue_job(job), gr.update(), gr.update(), gr.update(), role_matrix_table(job)
+    
+    session = get_session(request)
+    if job["status"] not in ("done", "failed"):
+        return describe_queue_job(job), *results_page(session, page_count(len(session)), job_queue.job_rows(job)), gr.update()
+    
+    load_queue_job(session, job)
+    return describe_queue_job(job), *results_page(session, page_count(len(session))), gr.update()
+
+def parse_roles_table(roles_table):
+    """Role dicts from the editable roles table, skipping blank rows"""
+    if roles_table is None:
+        return []
+    records = roles_table.values.tolist() if isinstance(roles_table, pd.DataFrame) else roles_table
+    roles = []
+    for record in records:
+        job_title, important_duties, considerable_duties = (str(value).strip() if value is not None else "" for value in list(record)[:3])
+        if job_title or important_duties or considerable_duties:
+            roles.append({"job_title": job_title, "important_duties": important_duties, "considerable_duties": considerable_duties})
+    return roles
+
+def role_matrix_table(job):
+    """Resume x role score matrix of a multi-role job's finished rows"""
+    titles = [role["job_title"] for role in job["roles"]]
+    rows = score_matrix(job_queue.job_rows(job), job["roles"])
+    return pd.DataFrame(rows, columns=["File Name", "Name", "Current Designation", *titles, "Best Role"])
+
+def export_role_rows(job):
+    """CSV of every resume x role row, with reasons, for download"""
+    df = pd.DataFrame(job_queue.job_rows(job)).reindex(columns=MULTI_ROLE_COLUMNS, fill_value="N/A")
+    path = os.path.join(tempfile.mkdtemp(prefix="resume_export_"), f"role_matches_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
+    with stage_timer("export"):
+        df.to_csv(path, index=False)
+    return path
+
+def analyze_roles(resume_files, roles_table, prescreen_min_score=PRESCREEN_MIN_SCORE, browser_id="", request: gr.Request = None):
+    """Queue one job that scores every resume against all the roles, and stream the score matrix"""
+    def error_view(message):
+        return gr.update(), gr.update(value=None, visible=False), f"⚠️ {message}"
+    
+    if not CLAUDE_API_KEY:
+        yield error_view("API Key not configured. Please contact administrator.")
+        return
+    
+    roles = parse_roles_table(roles_table)
+    if not resume_files:
+        error_message = "Please upload resume files above"
+    elif len(resume_files) > 10:
+        error_message = "Maximum 10 resume files allowed"
+    else:
+        error_message = validate_roles(roles)
+    
+    if error_message:
+        yield error_view(error_message)
+        return
+    
+    label = " · ".join(role["job_title"] for role in roles)
+    job_id = job_queue.enqueue_job(resume_files, label, "", "", prescreen_min_score, roles, job_owner(browser_id, request))
+    seen = None
+    
+    for job in job_queue.watch_job(job_id):
+        if job["status"] in ("done", "failed"):
+            break
         
-        if resume_text.startswith("Error") or resume_text.startswith("Unsupported"):
-            error_data = {
-                "Name": "File Error",
-                "Email": "N/A",
-                "Phone": "N/A",
-                "Current Company Name": "N/A",
-                "Current Designation": "N/A",
-                "Total Exp": "N/A",
-                "Match Score": "N/A",
-                "Recommendation": "ERROR",
-                "Reason": resume_text,
-                "File Name": filename
-            }
-            all_candidates.append(error_data)
+        finished = sum(item["result"] is not None for item in job["items"])
+        if finished != seen:
+            seen = finished
+            yield role_matrix_table(job), gr.update(), describe_queue_job(job)
         else:
-            candidate_data = analyze_single_resume(client, resume_text, job_title, important_duties, considerable_duties, filename)
-            all_candidates.append(candidate_data)
+            yield gr.update(), gr.update(), describe_queue_job(job)
     
-    df = pd.DataFrame(all_candidates)
+    if job["status"] not in ("done", "failed"):
+        yield gr.update(), gr.update(), no_workers_status(job)
+        return
     
-    column_order = ["File Name", "Name", "Email", "Phone", "Current Company Name", 
-                   "Current Designation", "Total Exp", "Match Score", "Recommendation", "Reason"]
-    df = df[column_order]
+    yield role_matrix_table(job), gr.update(value=export_role_rows(job), visible=True), describe_queue_job(job)
+
+def describe_batch_job(job):
+    counts = job["request_counts"]
+    if job["status"] == "ended":
+        usage = UsageStats.from_dict(job.get("usage", {}))
+        status = f"✅ Job `{job['id']}` finished: {len(job['entries'])} resume(s)"
+        if usage.requests:
+            status += f" · {usage.summary(batch=True)}"
+        return status
     
-    # Add color indicators
-    df = add_color_indicators(df)
+    done = sum(count for name, count in counts.items() if name != "processing")
+    return (f"⏳ Job `{job['id']}` is {job['status'].replace('_', ' ')}: {done}/{sum(counts.values())} request(s) done"
+            " · results are collected automatically when it ends")
+
+def describe_bulk_submission(job):
+    """Status of a bulk job the queue has not submitted as a Message Batch yet"""
+    if job["status"] == "queued":
+        return f"⏳ Bulk job `{job['id']}` is waiting for a queue worker ({job_queue.queue_position(job)} job(s) ahead)"
+    if job["status"] == "failed":
+        return f"⚠️ Bulk job `{job['id']}` could not be submitted: {job['error']}"
+    return f"⏳ Bulk job `{job['id']}`: extracting and pre-screening {job['total']} file(s) before submitting them"
+
+def batch_job_choices(owner):
+    prune_jobs()
+    # Bulk jobs still in the queue, then saved batches (the same ids once submitted)
+    choices = [job["id"] for job in job_queue.list_jobs(owner, kind="bulk")]
+    return choices + [job["id"] for job in list_jobs(owner) if job["id"] not in choices]
+
+def submit_bulk_analysis(resume_files, job_title, important_duties, considerable_duties, prescreen_min_score=PRESCREEN_MIN_SCORE, browser_id="", request: gr.Request = None):
+    """Queue a bulk job; a queue worker extracts the files and submits the Message Batch"""
+    if not CLAUDE_API_KEY:
+        return "⚠️ API Key not configured. Please contact administrator.", gr.update()
     
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    csv_filename = f"resume_analysis_{timestamp}.csv"
+    if not resume_files or len(resume_files) == 0:
+        return "⚠️ Please upload resume files for the bulk job", gr.update()
     
-    # Create clean version for CSV (without emoji indicators)
-    df_for_csv = df.copy()
-    for idx, row in df_for_csv.iterrows():
-        filename = str(row['File Name'])
-        # Remove emoji indicators for CSV
-        clean_filename = re.sub(r'^[🟢🟠🔴⚪] ', '', filename)
-        df_for_csv.at[idx, 'File Name'] = clean_filename
+    error_message = validate_job_requirements(job_title, important_duties, considerable_duties)
+    if error_message:
+        return f"⚠️ {error_message}", gr.update()
     
-    df_for_csv.to_csv(csv_filename, index=False)
+    owner = job_owner(browser_id, request)
+    try:
+        job_id = job_queue.enqueue_job(resume_files, job_title, important_duties, considerable_duties, prescreen_min_score,
+                                       owner=owner, kind="bulk")
+    except Exception as e:
+        return f"⚠️ Error submitting bulk job: {str(e)}", gr.update()
     
-    # Show the "Upload More Resumes" section after first analysis
-    return df, csv_filename, gr.update(visible=True)
+    return describe_bulk_submission(job_queue.get_job(job_id)), gr.update(choices=batch_job_choices(owner), value=job_id)
+
+def check_bulk_job(job_id, browser_id="", request: gr.Request = None):
+    """Report on a bulk job and add its results to the session once the queue workers have merged them"""
+    no_change = (gr.update(), gr.update(), gr.update())
+    if not job_id:
+        return "⚠️ Select a bulk job first", *no_change
+    
+    owner = job_owner(browser_id, request)
+    try:
+        job = load_job(job_id)
+    except OSError:
+        job = None
+        queued = job_queue.get_job(job_id)
+        # Not submitted yet: report on the queue job that will submit it
+        if queued is not None and queued["owner"] == owner and queued["status"] != "done":
+            return describe_bulk_submission(queued), *no_change
+    # Other people's jobs hold their candidates' details: treat them as missing
+    if job is None or job.get("owner") != owner:
+        return f"⚠️ Bulk job `{job_id}` not found", *no_change
+    
+    if not job_finished(job):
+        return describe_batch_job(job), *no_change
+    
+    session = get_session(request)
+    if job_id not in session.loaded_jobs:
+        session.loaded_jobs.add(job_id)
+        session.append(batch_job_rows(job))
+    return describe_batch_job(job), *results_page(session, page_count(len(session)))
 
 def show_analyze_button(files):
     """Show or hide the analyze button based on file upload"""
@@ -284,8 +430,42 @@ def update_considerable_char_count_and_button(text, important_text):
     
     return char_display, gr.update(interactive=button_interactive), gr.update(interactive=button_interactive)
 
-def clear_all():
-    return [], [], "", "", "", pd.DataFrame(), None, "✅ 0/500 characters", "✅ 0/500 characters", gr.update(interactive=True), gr.update(visible=False), gr.update(visible=False)
+def clear_all(request: gr.Request = None):
+    session = get_session(request)
+    session.clear()
+    return [], [], "", "", "", *results_page(session, 1), gr.update(value=None, visible=False), "✅ 0/500 characters", "✅ 0/500 characters", gr.update(interactive=True), gr.update(visible=False), gr.update(visible=False), ""
+
+def describe_cache(label, cache):
+    if not cache.enabled:
+        return f"{label} disabled"
+    
+    # Lookups happen in the queue workers, so report the totals shared through the cache file
+    stats = cache.stats()
+    return (f"{label}: {stats['total_hits']} hits, {stats['total_misses']} misses "
+            f"({stats['total_hit_rate']:.0%} hit rate), {stats['entries']} entries, "
+            f"{stats['size_bytes'] / 1024:.1f} KB")
+
+def show_cache_status():
+    """Show result and extracted-text cache hit/miss statistics"""
+    return f"{describe_cache('Result cache', RESULT_CACHE)} · {describe_cache('Text cache', EXTRACTION_CACHE)}"
+
+def metrics_text():
+    """Prometheus exposition for /metrics: recorded stage timings plus queue and cache gauges"""
+    stats = job_queue.queue_stats()
+    gauges = [
+        ("resume_queue_jobs_queued", "Jobs waiting for a worker", stats["queued"]),
+        ("resume_queue_jobs_running", "Jobs being processed", stats["running"]),
+        ("resume_queue_jobs_waiting", "Bulk jobs waiting for their batch to end", stats["waiting"]),
+    ]
+    for name, cache in (("result", RESULT_CACHE), ("text", EXTRACTION_CACHE)):
+        if cache.enabled:
+            cache_stats = cache.stats()
+            gauges += [
+                (f"resume_{name}_cache_entries", f"Entries in the {name} cache", cache_stats["entries"]),
+                (f"resume_{name}_cache_hits", f"{name.capitalize()} cache hits across all processes", cache_stats["total_hits"]),
+                (f"resume_{name}_cache_misses", f"{name.capitalize()} cache misses across all processes", cache_stats["total_misses"]),
+            ]
+    return render(gauges)
 
 def show_api_status():
     """Show API configuration status"""
@@ -335,8 +515,13 @@ def create_interface():
         gr.Markdown("# Resume Analysis Tool - Duty-Based Matching")
         gr.Markdown("Upload resumes (bulk or individual) and define job requirements for structured analysis")
         
+        # Identifies this browser across page loads, so it can get back to the jobs it queued (and only those)
+        browser_id = gr.BrowserState("", storage_key="resume_analyzer_browser_id", secret=BROWSER_STATE_SECRET)
+        
         # API Status indicator
         api_status = gr.Markdown(show_api_status(), elem_classes=["api-status"])
+        cache_status = gr.Markdown(show_cache_status())
+        queue_status = gr.Markdown(show_queue_status())
         
         with gr.Row():
             with gr.Column():            
@@ -370,6 +555,15 @@ def create_interface():
                     )
                     considerable_char_count = gr.Markdown("✅ 0/500 characters")
                 
+                prescreen_slider = gr.Slider(
+                    label="Pre-screen Threshold (0 = off)",
+                    info="Resumes whose keyword similarity to the duties is below this are rejected without an API call",
+                    minimum=0,
+                    maximum=0.5,
+                    step=0.01,
+                    value=PRESCREEN_MIN_SCORE
+                )
+                
                 with gr.Row():
                     analyze_bulk_btn = gr.Button(
                         "Analyze Multiple Resumes", 
@@ -380,6 +574,58 @@ def create_interface():
                 with gr.Row():
                     clear_btn = gr.Button("Clear All", variant="stop")
                 
+                with gr.Accordion("Job Queue", open=False):
+                    gr.Markdown("Every analysis runs as a job in a persistent queue. If the page was refreshed "
+                                "or closed, pick the job here to see its progress or load its results.")
+                    queue_job_select = gr.Dropdown(
+                        label="Recent Jobs",
+                        choices=[],
+                        interactive=True
+                    )
+                    with gr.Row():
+                        refresh_jobs_btn = gr.Button("Refresh List", size="sm")
+                        check_queue_btn = gr.Button("Check Status / Load Results", size="sm")
+                    queue_job_status = gr.Markdown("")
+                
+                with gr.Accordion("Bulk Mode (Message Batches API)", open=False):
+                    gr.Markdown("For large drops: no file limit and about half the per-token cost. "
+                                "Results usually arrive within minutes, at most 24 hours. Uses the job requirements above.")
+                    bulk_files_input = gr.File(
+                        label="Upload Resumes for Bulk Job (PDF, DOCX, TXT)",
+                        file_types=[".pdf", ".docx", ".txt"],
+                        file_count="multiple"
+                    )
+                    submit_bulk_btn = gr.Button(
+                        "Submit Bulk Job",
+                        variant="secondary",
+                        interactive=bool(CLAUDE_API_KEY)
+                    )
+                    bulk_job_select = gr.Dropdown(
+                        label="Bulk Jobs",
+                        choices=[],
+                        interactive=True
+                    )
+                    check_bulk_btn = gr.Button("Check Status / Load Results", interactive=bool(CLAUDE_API_KEY))
+                    bulk_status = gr.Markdown("")
+                
+                with gr.Accordion("Multi-Role Matching", open=False):
+                    gr.Markdown("Score the uploaded resumes against several open roles at once. Each resume is "
+                                "read once and matched against all roles in the same request, so extra roles "
+                                "cost far less than separate runs. One role per row; the pre-screen threshold above applies.")
+                    roles_input = gr.Dataframe(
+                        headers=["Job Title", "Important Duties", "Considerable Duties"],
+                        value=[["", "", ""] for _ in range(3)],
+                        datatype=["str", "str", "str"],
+                        row_count=3,
+                        interactive=True,
+                        wrap=True
+                    )
+                    analyze_roles_btn = gr.Button(
+                        "Match Against All Roles",
+                        variant="secondary",
+                        interactive=bool(CLAUDE_API_KEY)
+                    )
+                
                 gr.Markdown("### Instructions:")
                 gr.Markdown("1. Upload resume files and define job requirements")
                 gr.Markdown("2. Click 'Analyze Multiple Resumes' to start")
@@ -393,13 +639,36 @@ def create_interface():
                     gr.Markdown("API key is not configured. Please contact the administrator to set up the ANTHROPIC_API_KEY environment variable.")
             
             with gr.Column():
+                analysis_status = gr.Markdown("")
+                
                 results_output = gr.Dataframe(
                     label="Analysis Results for All Candidates",
                     interactive=False
                 )
                 
+                with gr.Row():
+                    prev_page_btn = gr.Button("◀ Previous", size="sm")
+                    page_number = gr.Number(value=1, label="Page", precision=0, minimum=1)
+                    next_page_btn = gr.Button("Next ▶", size="sm")
+                page_info = gr.Markdown("")
+                
+                with gr.Row():
+                    export_format = gr.Radio(["CSV", "Parquet"], value="CSV", label="Export Format")
+                    export_btn = gr.Button("Export Results")
+                export_status = gr.Markdown("")
+                
                 csv_download = gr.File(
-                    label="Download Results as CSV",
+                    label="Download Results",
+                    visible=False
+                )
+                
+                roles_status = gr.Markdown("")
+                roles_matrix = gr.Dataframe(
+                    label="Match Scores by Role",
+                    interactive=False
+                )
+                roles_download = gr.File(
+                    label="Download Role Matches",
                     visible=False
                 )
                 
@@ -422,9 +691,9 @@ def create_interface():
                     gr.Markdown("*This section uses the same job requirements as above*")
                 
                 gr.Markdown("### Export Results:")
-                gr.Markdown("- After analysis, you can download the results as a CSV file")
+                gr.Markdown("- Click 'Export Results' to download every analyzed resume as CSV or Parquet")
                 gr.Markdown("- You can also copy the table data or take a screenshot")
-                gr.Markdown("### Color Legend:")
+                gr.Markdown("### Status Legend:")
                 gr.Markdown("- 🟢 **Good Match**")
                 gr.Markdown("- 🟠 **Considerable Match**")
                 gr.Markdown("- 🔴 **Reject/Error**")
@@ -454,40 +723,131 @@ def create_interface():
             
             analyze_bulk_btn.click(
                 fn=analyze_multiple_resumes,
-                inputs=[resume_files_input, job_title_input, important_duties_input, considerable_duties_input, results_output],
-                outputs=[results_output, csv_download, upload_more_section]
+                inputs=[resume_files_input, job_title_input, important_duties_input, considerable_duties_input, prescreen_slider, browser_id],
+                outputs=[results_output, page_number, page_info, upload_more_section, analysis_status],
+                # The handler only polls the queue, so recruiters' batches don't wait on each other here
+                concurrency_limit=None
+            ).then(
+                fn=show_cache_status,
+                outputs=[cache_status]
             ).then(
-                fn=lambda csv_file: gr.update(visible=True) if csv_file else gr.update(visible=False),
-                inputs=[csv_download],
-                outputs=[csv_download]
+                fn=show_queue_status,
+                outputs=[queue_status]
             )
             
             analyze_more_resumes_btn.click(
                 fn=analyze_multiple_resumes,
-                inputs=[additional_resume_input, job_title_input, important_duties_input, considerable_duties_input, results_output],
-                outputs=[results_output, csv_download, upload_more_section]
+                inputs=[additional_resume_input, job_title_input, important_duties_input, considerable_duties_input, prescreen_slider, browser_id],
+                outputs=[results_output, page_number, page_info, upload_more_section, analysis_status],
+                # The handler only polls the queue, so recruiters' batches don't wait on each other here
+                concurrency_limit=None
             ).then(
-                fn=lambda csv_file: gr.update(visible=True) if csv_file else gr.update(visible=False),
-                inputs=[csv_download],
-                outputs=[csv_download]
+                fn=show_cache_status,
+                outputs=[cache_status]
+            ).then(
+                fn=show_queue_status,
+                outputs=[queue_status]
             )
         
+            submit_bulk_btn.click(
+                fn=submit_bulk_analysis,
+                inputs=[bulk_files_input, job_title_input, important_duties_input, considerable_duties_input, prescreen_slider, browser_id],
+                outputs=[bulk_status, bulk_job_select],
+                # Extraction and submission happen in the queue workers; the handler only copies the files
+                concurrency_limit=None
+            )
+            
+            check_bulk_btn.click(
+                fn=check_bulk_job,
+                inputs=[bulk_job_select, browser_id],
+                outputs=[bulk_status, results_output, page_number, page_info]
+            )
+        
+        interface.load(
+            fn=ensure_browser_id,
+            inputs=[browser_id],
+            outputs=[browser_id, queue_job_select, bulk_job_select]
+        )
+        
+        refresh_jobs_btn.click(
+            fn=refresh_queue_jobs,
+            inputs=[browser_id],
+            outputs=[queue_job_select, queue_status]
+        )
+        
+        check_queue_btn.click(
+            fn=check_queue_job,
+            inputs=[queue_job_select, browser_id],
+            outputs=[queue_job_status, results_output, page_number, page_info, roles_matrix]
+        )
+        
+        analyze_roles_btn.click(
+            fn=analyze_roles,
+            inputs=[resume_files_input, roles_input, prescreen_slider, browser_id],
+            outputs=[roles_matrix, roles_download, roles_status],
+            concurrency_limit=None
+        ).then(
+            fn=show_cache_status,
+            outputs=[cache_status]
+        ).then(
+            fn=show_queue_status,
+            outputs=[queue_status]
+        )
+        
+        prev_page_btn.click(
+            fn=previous_results_page,
+            inputs=[page_number],
+            outputs=[results_output, page_number, page_info]
+        )
+        
+        next_page_btn.click(
+            fn=next_results_page,
+            inputs=[page_number],
+            outputs=[results_output, page_number, page_info]
+        )
+        
+        page_number.submit(
+            fn=show_results_page,
+            inputs=[page_number],
+            outputs=[results_output, page_number, page_info]
+        )
+        
+        export_btn.click(
+            fn=export_results,
+            inputs=[export_format],
+            outputs=[csv_download, export_status]
+        )
+        
         clear_btn.click(
             fn=clear_all,
-            outputs=[resume_files_input, additional_resume_input, job_title_input, important_duties_input, considerable_duties_input, results_output, csv_download, important_char_count, considerable_char_count, analyze_bulk_btn, upload_more_section, analyze_more_resumes_btn]
+            outputs=[resume_files_input, additional_resume_input, job_title_input, important_duties_input, considerable_duties_input, results_output, page_number, page_info, csv_download, important_char_count, considerable_char_count, analyze_bulk_btn, upload_more_section, analyze_more_resumes_btn, analysis_status]
         )
     
     return interface
 
 # Create and launch the interface
 if __name__ == "__main__":
+    # Analysis runs in these processes; the web process only queues and polls
+    job_queue.start_workers()
     interface = create_interface()
     
     # Get port from environment variable (Render requirement)
     port = int(os.environ.get("PORT", 7860))
     
-    interface.launch(
-        server_name="0.0.0.0",  # Required for external access
-        server_port=port,        # Use Render's assigned port
-        share=False             # Render handles public access
+    # Serve the UI under FastAPI so Prometheus can scrape /metrics on the same port
+    import uvicorn
+    from fastapi import FastAPI
+    from fastapi.responses import PlainTextResponse
+    
+    app = FastAPI()
+    
+    @app.get("/metrics", response_class=PlainTextResponse)
+    def metrics():
+        return PlainTextResponse(metrics_text(), media_type="text/plain; version=0.0.4")
+    
+    app = gr.mount_gradio_app(app, interface, path="/")
+    uvicorn.run(
+        app,
+        host="0.0.0.0",  # Required for external access
+        port=port        # Use Render's assigned port
     )
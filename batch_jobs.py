@@ -0,0 +1,181 @@
+import json
+import os
+import time
+import uuid
+from datetime import datetime
+
+from analyzer import (CLAUDE_MODEL, RESULT_CACHE, AnalysisValidationError, UsageStats, analysis_cache_key, api_error_result,
+                      build_request_params, file_error_result, is_extraction_error, parse_analysis_message,
+                      prescreen_resume_files, resume_tokens_label)
+from extraction import file_path, submit_extraction, wait_for_extraction
+from prescreen import PRESCREEN_MIN_SCORE
+from token_budget import RESUME_TOKEN_BUDGET, fit_to_budget
+
+# Job state lives on disk so a submitted batch survives restarts
+BATCH_JOBS_DIR = os.getenv('BATCH_JOBS_DIR', os.path.join('.cache', 'batch_jobs'))
+# Seconds between the queue workers' checks on a submitted batch
+BATCH_POLL_INTERVAL = float(os.getenv('BATCH_POLL_INTERVAL', 30))
+# Saved jobs hold candidates' details; they are deleted this many seconds after they were last updated (0 = keep forever)
+BATCH_JOB_RETENTION = float(os.getenv('JOB_RETENTION', 7 * 24 * 60 * 60))
+
+def job_path(job_id):
+    return os.path.join(BATCH_JOBS_DIR, f"{job_id}.json")
+
+def save_job(job):
+    os.makedirs(BATCH_JOBS_DIR, exist_ok=True)
+    path = job_path(job["id"])
+    # Write then rename so a crash never leaves a half-written state file
+    with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+        json.dump(job, f, indent=2)
+    os.replace(f"{path}.tmp", path)
+
+def load_job(job_id):
+    with open(job_path(job_id), encoding='utf-8') as f:
+        return json.load(f)
+
+def list_jobs(owner):
+    """An owner's saved jobs, newest first"""
+    if not os.path.isdir(BATCH_JOBS_DIR):
+        return []
+
+    jobs = []
+    for name in os.listdir(BATCH_JOBS_DIR):
+        if name.endswith('.json'):
+            job = load_job(name[:-len('.json')])
+            if job.get("owner") == owner:
+                jobs.append(job)
+    return sorted(jobs, key=lambda job: job["created_at"], reverse=True)
+
+def prune_jobs(retention=BATCH_JOB_RETENTION):
+    """Delete saved jobs not updated within the retention period; returns how many went"""
+    if retention <= 0 or not os.path.isdir(BATCH_JOBS_DIR):
+        return 0
+
+    cutoff = time.time() - retention
+    pruned = 0
+    for name in os.listdir(BATCH_JOBS_DIR):
+        path = os.path.join(BATCH_JOBS_DIR, name)
+        if name.endswith('.json') and os.path.getmtime(path) < cutoff:
+            os.remove(path)
+            pruned += 1
+    return pruned
+
+def job_finished(job):
+    """Ended and its results merged in"""
+    return job["status"] == "ended" and all(entry["result"] is not None for entry in job["entries"])
+
+def submit_batch_job(client, resume_files, job_title, important_duties, considerable_duties, prescreen_min_score=PRESCREEN_MIN_SCORE, owner=None, job_id=None):
+    """Extract every file, then send all uncached analyses that pass the pre-screen as one Message Batch
+
+    Only `owner` sees the job in list_jobs. The job queue passes its own job id so both
+    share one; otherwise a new id is made up.
+    """
+    extractions = [submit_extraction(resume_file) for resume_file in resume_files]
+    rejected, _ = prescreen_resume_files(resume_files, extractions, important_duties, considerable_duties, prescreen_min_score)
+
+    entries = []
+    requests = []
+    for index, (resume_file, extraction) in enumerate(zip(resume_files, extractions)):
+        filename = os.path.basename(file_path(resume_file))
+        resume_text = wait_for_extraction(extraction, file_path(resume_file))
+        entry = {"custom_id": f"resume-{index}", "filename": filename, "cache_key": None, "result": None}
+
+        if index in rejected:
+            entry["result"] = rejected[index]
+        elif is_extraction_error(resume_text):
+            entry["result"] = file_error_result(filename, resume_text)
+        else:
+            resume_text, original_tokens, tokens = fit_to_budget(resume_text, RESUME_TOKEN_BUDGET)
+            entry["resume_tokens"] = [original_tokens, tokens]
+            # Batches always go to CLAUDE_MODEL, whatever the live cascade settings
+            cache_key = analysis_cache_key(resume_text, job_title, important_duties, considerable_duties, CLAUDE_MODEL)
+            cached = RESULT_CACHE.get(cache_key)
+            if cached is not None:
+                cached["File Name"] = filename
+                cached["Resume Tokens"] = resume_tokens_label(original_tokens, tokens)
+                entry["result"] = cached
+            else:
+                entry["cache_key"] = cache_key
+                requests.append({
+                    "custom_id": entry["custom_id"],
+                    "params": build_request_params(resume_text, job_title, important_duties, considerable_duties)
+                })
+
+        entries.append(entry)
+
+    job = {
+        "id": job_id or f"job_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}",
+        "created_at": datetime.now().isoformat(timespec='seconds'),
+        "job_title": job_title,
+        "owner": owner,
+        "batch_id": None,
+        "status": "ended",
+        "request_counts": {},
+        "usage": {},
+        "entries": entries
+    }
+
+    # Everything may already be cached or unreadable, in which case there is nothing to send
+    if requests:
+        batch = client.messages.batches.create(requests=requests)
+        job["batch_id"] = batch.id
+        job["status"] = batch.processing_status
+        job["request_counts"] = batch.request_counts.to_dict()
+
+    save_job(job)
+    # A batch can end before we first look at it; collect its results right away then
+    return refresh_batch_job(client, job)
+
+def _result_error_message(result):
+    if result.type == "errored":
+        error = getattr(result.error, 'error', result.error)
+        return getattr(error, 'message', str(error))
+    return f"Batch request {result.type}"
+
+def refresh_batch_job(client, job):
+    """Poll the batch once; when it has ended, merge its results into the job"""
+    if job_finished(job):
+        return job
+
+    batch = client.messages.batches.retrieve(job["batch_id"])
+    job["status"] = batch.processing_status
+    job["request_counts"] = batch.request_counts.to_dict()
+
+    if batch.processing_status == "ended":
+        entries = {entry["custom_id"]: entry for entry in job["entries"]}
+        usage = UsageStats()
+
+        # Results arrive in arbitrary order; custom_id maps them back to their file
+        for item in client.messages.batches.results(job["batch_id"]):
+            entry = entries.get(item.custom_id)
+            if entry is None:
+                continue
+
+            if item.result.type == "succeeded":
+                usage.add(item.result.message.usage, item.result.message.model)
+                # Jobs saved before token budgeting have no counts
+                resume_tokens = entry.get("resume_tokens")
+                if resume_tokens:
+                    usage.add_resume_tokens(*resume_tokens)
+                try:
+                    entry["result"] = parse_analysis_message(item.result.message, entry["filename"])
+                    if resume_tokens:
+                        entry["result"]["Resume Tokens"] = resume_tokens_label(*resume_tokens)
+                    RESULT_CACHE.put(entry["cache_key"], entry["result"])
+                except AnalysisValidationError as e:
+                    entry["result"] = api_error_result(entry["filename"], f"Invalid analysis response: {e}")
+            else:
+                entry["result"] = api_error_result(entry["filename"], _result_error_message(item.result))
+
+        for entry in job["entries"]:
+            if entry["result"] is None:
+                entry["result"] = api_error_result(entry["filename"], "No result returned for this request")
+
+        job["usage"] = usage.to_dict()
+
+    save_job(job)
+    return job
+
+def batch_job_rows(job):
+    """Finished rows in upload order"""
+    return [entry["result"] for entry in job["entries"] if entry["result"] is not None]
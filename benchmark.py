@@ -0,0 +1,315 @@
+"""Benchmark the analysis pipeline offline against fake_anthropic.py.
+
+    python benchmark.py --sizes 1,10,100,1000 --latency 1 --error-rate 0.05 > bench_output.txt
+
+A synthetic corpus of PDF, DOCX and TXT resumes of varying length is generated
+once, then each batch size is queued and run through job_queue.process_job, the
+same code a queue worker runs: process-pool extraction, pre-screen, concurrent
+Claude calls with retries, and SQLite result writes. Caches are off and every
+run uses a fresh queue, so each batch size is measured cold.
+
+Reported per batch size: extraction wall time (measured in a separate
+extraction-only pass), LLM wall time (first request sent to last response
+received), end-to-end throughput, p50/p95 latency of individual API requests,
+and peak memory.
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+FIRST_NAMES = ["Alex", "Priya", "Jordan", "Mei", "Carlos", "Fatima", "Liam", "Aisha", "Noah", "Elena"]
+LAST_NAMES = ["Smith", "Patel", "Garcia", "Chen", "Okafor", "Novak", "Haddad", "Silva", "Kim", "Brown"]
+TITLES = ["Software Engineer", "Sales Manager", "Head Chef", "Data Analyst", "Project Manager", "Nurse", "Accountant"]
+COMPANIES = ["Acme Corp", "Globex", "Initech", "Umbrella Health", "Stark Foods", "Wayne Logistics", "Hooli"]
+DUTIES = [
+    "Designed and shipped backend services handling millions of requests per day",
+    "Managed a team of {n} people and ran weekly planning and review meetings",
+    "Owned quarterly revenue targets and grew key accounts by {n} percent",
+    "Planned seasonal menus, controlled food cost and trained kitchen staff",
+    "Built dashboards and reports for leadership from SQL and Python pipelines",
+    "Coordinated vendors, budgets and timelines across {n} concurrent projects",
+    "Prepared monthly closes, reconciliations and audit documentation",
+    "Provided patient care, triage and medication administration on a {n}-bed ward",
+]
+
+JOB = {
+    "job_title": "Software Engineer",
+    "important_duties": "Design, build and operate backend services in Python; own reliability and on-call",
+    "considerable_duties": "Mentor engineers, review code and plan projects with product managers",
+}
+
+# Lines per generated PDF page
+PDF_PAGE_LINES = 50
+
+def resume_lines(rng, size):
+    """Plain-text lines of one synthetic resume; size scales roles, bullets and publications"""
+    name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+    lines = [name, f"{name.lower().replace(' ', '.')}@example.com | +1 555 {rng.randint(1000, 9999)}", "",
+             "SUMMARY", f"{rng.choice(TITLES)} with {rng.randint(2, 25)} years of experience.", "", "EXPERIENCE"]
+
+    year = 2025
+    for role in range(1 + size * 2):
+        start = year - rng.randint(1, 4)
+        end = "Present" if role == 0 else str(year)
+        lines.append(f"{rng.choice(TITLES)}, {rng.choice(COMPANIES)}")
+        lines.append(f"{start} - {end}")
+        for _ in range(2 + size):
+            lines.append("- " + rng.choice(DUTIES).format(n=rng.randint(2, 40)))
+        year = start
+
+    lines += ["", "SKILLS", "Python, SQL, communication, planning, budgeting", "", "EDUCATION", "BSc, State University"]
+    if size >= 2:
+        lines += ["", "PUBLICATIONS"]
+        lines += [f"Paper {i}: Notes on scalable systems, Journal of Practice {2000 + i % 25}" for i in range(size * 15)]
+    return lines
+
+def pdf_escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def write_pdf(path, lines):
+    """Minimal multi-page PDF with one Helvetica text stream per page, written by hand"""
+    pages = [lines[start:start + PDF_PAGE_LINES] for start in range(0, len(lines), PDF_PAGE_LINES)] or [[]]
+    page_ids = [4 + 2 * index for index in range(len(pages))]
+
+    objects = {
+        1: b"<< /Type /Catalog /Pages 2 0 R >>",
+        2: f"<< /Type /Pages /Kids [{' '.join(f'{pid} 0 R' for pid in page_ids)}] /Count {len(pages)} >>".encode(),
+        3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    }
+    for page_id, page_lines in zip(page_ids, pages):
+        text = "".join(f"({pdf_escape(line)}) Tj T* " for line in page_lines)
+        stream = f"BT /F1 10 Tf 13 TL 50 760 Td {text}ET".encode('latin-1', 'replace')
+        objects[page_id] = (f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {page_id + 1} 0 R >>").encode()
+        objects[page_id + 1] = b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream)
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = {}
+    for object_id in sorted(objects):
+        offsets[object_id] = len(output)
+        output += b"%d 0 obj\n%s\nendobj\n" % (object_id, objects[object_id])
+
+    xref = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    output += b"".join(b"%010d 00000 n \n" % offsets[object_id] for object_id in sorted(objects))
+    output += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+
+    with open(path, 'wb') as f:
+        f.write(output)
+
+def write_docx(path, lines):
+    import docx
+
+    document = docx.Document()
+    for line in lines:
+        document.add_paragraph(line)
+    document.save(path)
+
+def write_txt(path, lines):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("\n".join(lines))
+
+WRITERS = {"pdf": write_pdf, "docx": write_docx, "txt": write_txt}
+
+def generate_corpus(directory, count, seed=0):
+    """`count` resumes cycling through PDF, DOCX and TXT, sizes 0-3"""
+    rng = random.Random(seed)
+    paths = []
+    for index in range(count):
+        extension = ("pdf", "docx", "txt")[index % 3]
+        path = os.path.join(directory, f"resume_{index:04d}.{extension}")
+        WRITERS[extension](path, resume_lines(rng, rng.randint(0, 3)))
+        paths.append(path)
+    return paths
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+def peak_rss_mb():
+    """Peak resident memory of this process and its reaped children, in MB (Linux/macOS)"""
+    try:
+        import resource
+    except ImportError:
+        return 0.0
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss) / scale
+
+class TimedMessages:
+    """Wraps client.messages (and its with_raw_response view) to record every create() call"""
+
+    def __init__(self, target, latencies):
+        self._target = target
+        self._latencies = latencies
+
+    @property
+    def with_raw_response(self):
+        return TimedMessages(self._target.with_raw_response, self._latencies)
+
+    def create(self, **params):
+        started = time.perf_counter()
+        try:
+            return self._target.create(**params)
+        finally:
+            self._latencies.append((started, time.perf_counter()))
+
+class TimingClient:
+    """Anthropic client stand-in recording (sent, answered) times of each Messages request, failed ones included"""
+
+    def __init__(self, client, latencies):
+        self._client = client
+        self._latencies = latencies
+
+    def with_options(self, **options):
+        return TimingClient(self._client.with_options(**options), self._latencies)
+
+    @property
+    def messages(self):
+        return TimedMessages(self._client.messages, self._latencies)
+
+def run_batch(paths, base_url, requests_per_minute):
+    import job_queue
+    from analyzer import RateLimiter, UsageStats, model_cost
+    from extraction import shutdown_extraction_pool, submit_extraction, wait_for_extraction
+
+    # Extraction on its own, so its cost is visible even though the pipeline overlaps it with API calls
+    started = time.perf_counter()
+    for future in [submit_extraction(path) for path in paths]:
+        wait_for_extraction(future, "benchmark")
+    extract_seconds = time.perf_counter() - started
+    # A fresh pool per run so every batch pays the same startup cost
+    shutdown_extraction_pool()
+
+    import anthropic
+
+    latencies = []
+    client = TimingClient(anthropic.Anthropic(api_key="benchmark", base_url=base_url), latencies)
+    job_id = job_queue.enqueue_job(paths, JOB["job_title"], JOB["important_duties"], JOB["considerable_duties"], 0)
+    conn = job_queue.connect()
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    job = job_queue.claim_job(conn, "benchmark")
+    job_queue.process_job(client, job, "benchmark", RateLimiter(requests_per_minute))
+    total_seconds = time.perf_counter() - started
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    shutdown_extraction_pool()
+
+    job = job_queue.get_job(job_id, conn)
+    conn.close()
+    rows = job_queue.job_rows(job)
+    request_seconds = [end - begin for begin, end in latencies]
+    usage = UsageStats.from_dict(job["usage"])
+
+    return {
+        "files": len(paths),
+        "extract_s": extract_seconds,
+        "llm_wall_s": (max(end for _, end in latencies) - min(begin for begin, _ in latencies)) if latencies else 0.0,
+        "total_s": total_seconds,
+        "per_min": len(paths) / total_seconds * 60 if total_seconds else 0.0,
+        "p50_ms": percentile(request_seconds, 0.50) * 1000,
+        "p95_ms": percentile(request_seconds, 0.95) * 1000,
+        "requests": len(latencies),
+        "errors": sum(str(row.get("Reason", "")).startswith("API Error") for row in rows),
+        "py_peak_mb": peak_bytes / (1024 * 1024),
+        "rss_peak_mb": peak_rss_mb(),
+        "escalated": usage.escalations,
+        "cost_usd": sum(model_cost(model, tier) or 0.0 for model, tier in usage.models.items()),
+        "timings": job["timings"],
+    }
+
+# (result key, column width, decimals or None for integers)
+COLUMNS = [("files", 6, None), ("extract_s", 10, 2), ("llm_wall_s", 11, 2), ("total_s", 8, 2),
+           ("per_min", 9, 1), ("p50_ms", 8, 0), ("p95_ms", 8, 0), ("requests", 9, None),
+           ("errors", 7, None), ("escalated", 10, None), ("cost_usd", 9, 4), ("py_peak_mb", 11, 1), ("rss_peak_mb", 12, 1)]
+
+def format_header():
+    return " ".join(f"{name:>{width}}" for name, width, _ in COLUMNS)
+
+def format_row(result):
+    return " ".join(f"{result[name]:>{width}}" if decimals is None else f"{result[name]:>{width}.{decimals}f}"
+                    for name, width, decimals in COLUMNS)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python benchmark.py", description="Benchmark the pipeline against a local fake Anthropic server.")
+    parser.add_argument("--sizes", default="1,10,100,1000", help="comma-separated batch sizes (default: %(default)s)")
+    parser.add_argument("--latency", type=float, default=0.5, help="fake API latency per request in seconds (default: %(default)s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of API requests that fail (default: %(default)s)")
+    parser.add_argument("--error-status", type=int, default=529, help="HTTP status of injected failures (default: %(default)s)")
+    parser.add_argument("--fast-model", help="CLAUDE_FAST_MODEL for the run, to measure the model cascade")
+    parser.add_argument("--fast-latency", type=float, help="fake API latency for haiku models (default: --latency)")
+    parser.add_argument("--concurrency", type=int, help="MAX_CONCURRENT_REQUESTS for the run")
+    parser.add_argument("--extraction-workers", type=int, help="EXTRACTION_WORKERS for the run")
+    parser.add_argument("--rpm", type=int, default=100000,
+                        help="client-side requests per minute; high by default so the fake server, not the limiter, is measured")
+    parser.add_argument("--seed", type=int, default=0, help="corpus random seed (default: %(default)s)")
+    parser.add_argument("--keep", action="store_true", help="keep the generated corpus and queue directory")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    sizes = sorted({int(size) for size in args.sizes.split(",") if size.strip()})
+    workdir = tempfile.mkdtemp(prefix="resume_bench_")
+
+    # Settings are read at import time, so they are fixed before the pipeline modules load
+    os.environ.update({
+        "RESULT_CACHE_MAX_MB": "0",
+        "EXTRACTION_CACHE_MAX_MB": "0",
+        "JOB_QUEUE_PATH": os.path.join(workdir, "queue.sqlite3"),
+        "JOB_FILES_DIR": os.path.join(workdir, "job_files"),
+        "METRICS_PATH": os.path.join(workdir, "metrics.sqlite3"),
+        # Injected failures are retried quickly so runs measure the retry path, not long sleeps
+        "RETRY_BASE_DELAY": os.getenv("RETRY_BASE_DELAY", "0.05"),
+        "CIRCUIT_COOLDOWN": os.getenv("CIRCUIT_COOLDOWN", "1"),
+    })
+    if args.concurrency:
+        os.environ["MAX_CONCURRENT_REQUESTS"] = str(args.concurrency)
+    if args.extraction_workers:
+        os.environ["EXTRACTION_WORKERS"] = str(args.extraction_workers)
+    if args.fast_model:
+        os.environ["CLAUDE_FAST_MODEL"] = args.fast_model
+
+    from analyzer import CLAUDE_FAST_MODEL, CLAUDE_MODEL, MAX_CONCURRENT_REQUESTS
+    from extraction import EXTRACTION_WORKERS
+    from fake_anthropic import start_server
+    from metrics import StageTimings
+
+    server, url = start_server(latency=args.latency, error_rate=args.error_rate, error_status=args.error_status,
+                               fast_latency=args.fast_latency)
+    try:
+        corpus_dir = os.path.join(workdir, "corpus")
+        os.makedirs(corpus_dir)
+        started = time.perf_counter()
+        paths = generate_corpus(corpus_dir, max(sizes), args.seed)
+        corpus_mb = sum(os.path.getsize(path) for path in paths) / (1024 * 1024)
+
+        print(f"# corpus: {len(paths)} files ({corpus_mb:.1f} MB) generated in {time.perf_counter() - started:.1f}s")
+        print(f"# fake API latency {args.latency}s, error rate {args.error_rate:.0%} ({args.error_status}); "
+              f"concurrency {MAX_CONCURRENT_REQUESTS}, extraction workers {EXTRACTION_WORKERS}, {os.cpu_count()} CPU(s)")
+        print(f"# models: {CLAUDE_FAST_MODEL + ' -> ' if CLAUDE_FAST_MODEL else ''}{CLAUDE_MODEL}")
+        print(format_header())
+        timings = {}
+        for size in sizes:
+            result = run_batch(paths[:size], url, args.rpm)
+            timings[size] = result["timings"]
+            print(format_row(result), flush=True)
+        for size, stages in timings.items():
+            print(f"# stages at {size}: {StageTimings.from_dict(stages).summary()}")
+    finally:
+        server.shutdown()
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+        else:
+            print(f"# kept {workdir}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future, InvalidStateError, ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+
+import PyPDF2
+import docx
+
+from metrics import record_stage
+from result_cache import ResultCache, make_key
+
+# PDF parsing is CPU-bound, so it runs in worker processes rather than threads
+EXTRACTION_WORKERS = int(os.getenv('EXTRACTION_WORKERS', min(4, os.cpu_count() or 1)))
+EXTRACTION_TIMEOUT = float(os.getenv('EXTRACTION_TIMEOUT', 30))
+
+# Bump whenever extraction or normalization changes so cached text is not reused
+EXTRACTION_VERSION = 2
+
+# Normalized text keyed by file content, so re-analyzing a file never parses it again
+# (set EXTRACTION_CACHE_MAX_MB=0 to disable)
+EXTRACTION_CACHE = ResultCache(
+    os.getenv('EXTRACTION_CACHE_PATH', os.path.join('.cache', 'extracted_text.sqlite3')),
+    int(float(os.getenv('EXTRACTION_CACHE_MAX_MB', 200)) * 1024 * 1024)
+)
+
+# Lines this close to the top or bottom of a page are header/footer candidates
+EDGE_LINES = 3
+INLINE_WHITESPACE = re.compile(r"[^\S\n]+")
+# "Page 2 of 3" inside a running header; other digits (dates in particular) must still match exactly
+PAGE_LABEL = re.compile(r"\bpage \d{1,3}( ?(of|/) ?\d{1,3})?\b")
+# At most three digits, so a year on a line of its own is never taken for a page number
+PAGE_NUMBER = re.compile(r"^[-–— ]*(page )?\d{1,3}( ?(of|/) ?\d{1,3})?[-–— ]*$")
+
+_pool = None
+_pool_lock = threading.RLock()
+# Files waiting for a free worker, and the pool futures being worked on. The pool is never
+# handed more files than it has workers, so a file's timeout clock starts when parsing does
+_waiting = deque()
+_in_flight = set()
+
+def file_path(resume_file):
+    """Path of an uploaded file object, or the path itself when given a string"""
+    return getattr(resume_file, 'name', resume_file)
+
+def is_extraction_error(resume_text):
+    return resume_text.startswith("Error") or resume_text.startswith("Unsupported")
+
+def normalize_text(pages):
+    """Collapse whitespace and blank-line runs, and keep only the first copy of repeated page headers/footers
+
+    A line counts as a header or footer when the same text sits within EDGE_LINES of the
+    top or bottom of at least half the pages; only "Page N" labels are ignored when
+    comparing. Bare page numbers ("Page 2 of 3", "- 2 -") at a page edge are dropped altogether.
+    """
+    pages = [[INLINE_WHITESPACE.sub(" ", line).strip() for line in page.splitlines()] for page in pages]
+    pages = [[line for line in lines if line] for lines in pages]
+
+    def line_key(line):
+        return PAGE_LABEL.sub("page #", line.lower())
+
+    def edge_keys(lines):
+        return {line_key(line) for line in lines[:EDGE_LINES] + lines[-EDGE_LINES:]}
+
+    repeated = set()
+    if len(pages) > 1:
+        counts = Counter(key for lines in pages for key in edge_keys(lines))
+        repeated = {key for key, count in counts.items() if count >= max(2, len(pages) / 2)}
+
+    seen = set()
+    kept_pages = []
+    for lines in pages:
+        edges = set(range(min(EDGE_LINES, len(lines)))) | set(range(max(0, len(lines) - EDGE_LINES), len(lines)))
+        kept = []
+        for position, line in enumerate(lines):
+            key = line_key(line)
+            if position in edges and len(pages) > 1 and PAGE_NUMBER.match(line.lower()):
+                continue
+            if position in edges and key in repeated:
+                if key in seen:
+                    continue
+                seen.add(key)
+            kept.append(line)
+        kept_pages.append("\n".join(kept))
+
+    return "\n\n".join(page for page in kept_pages if page)
+
+def extract_text_from_file(file):
+    """Normalized text of a resume, or an "Error ..."/"Unsupported ..." message"""
+    if file is None:
+        return ""
+
+    # Accept both uploaded file objects and plain paths (what the process pool receives)
+    name = file_path(file)
+    file_extension = name.lower().split('.')[-1]
+
+    try:
+        if file_extension == 'pdf':
+            pdf_reader = PyPDF2.PdfReader(file)
+            pages = [page.extract_text() or "" for page in pdf_reader.pages]
+
+        elif file_extension in ['docx', 'doc']:
+            doc = docx.Document(file)
+            pages = ["\n".join(paragraph.text for paragraph in doc.paragraphs)]
+
+        elif file_extension == 'txt':
+            if hasattr(file, 'read'):
+                pages = [file.read().decode('utf-8')]
+            else:
+                with open(file, 'rb') as f:
+                    pages = [f.read().decode('utf-8')]
+
+        else:
+            return f"Unsupported file format: {name}"
+
+    except Exception as e:
+        return f"Error reading {name}: {str(e)}"
+
+    return normalize_text(pages)
+
+def _timed_extraction(path):
+    """Pool task: (text, seconds spent parsing) so the parent can record the stage"""
+    started = time.perf_counter()
+    text = extract_text_from_file(path)
+    return text, time.perf_counter() - started
+
+def extraction_cache_key(path):
+    """Key from the file's bytes and type, or None if the file can't be read"""
+    digest = hashlib.sha256()
+    try:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+    except OSError:
+        return None
+    return make_key(digest.hexdigest(), path.lower().split('.')[-1], EXTRACTION_VERSION)
+
+def get_extraction_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=EXTRACTION_WORKERS)
+        return _pool
+
+def _reset_extraction_pool(pool, terminate=False):
+    """Stop handing work to a pool; with terminate, also kill its workers so a hung file frees them"""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    if terminate:
+        # Files still in this pool go back to the front of the queue when their futures fail (see _forward_result)
+        pool.terminated = True
+        # ProcessPoolExecutor has no public way to stop a busy worker
+        for process in list((pool._processes or {}).values()):
+            process.terminate()
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def shutdown_extraction_pool():
+    """Stop the pool's worker processes, e.g. before the owning process exits"""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+        waiting = list(_waiting)
+        _waiting.clear()
+    for future, _ in waiting:
+        future.cancel()
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+def _extraction_done(cache_key, timings, future):
+    if future.cancelled() or future.exception() is not None:
+        return
+    text, seconds = future.result()
+    record_stage("extract", seconds, timings)
+    if cache_key is not None and not is_extraction_error(text):
+        EXTRACTION_CACHE.put(cache_key, text)
+
+def _forward_result(future, path, pool_future):
+    """Copy a pool future's outcome to the caller's future, or requeue the file if its pool was terminated"""
+    with _pool_lock:
+        _in_flight.discard(pool_future)
+        if not future.done():
+            failed = pool_future.cancelled() or pool_future.exception() is not None
+            if failed and getattr(pool_future.pool, 'terminated', False):
+                future.pool_future = None
+                _waiting.appendleft((future, path))
+            elif pool_future.cancelled():
+                future.cancel()
+            else:
+                try:
+                    future.set_result(pool_future.result())
+                except InvalidStateError:
+                    pass
+                except BaseException as e:
+                    _set_exception(future, e)
+        _dispatch()
+
+def _set_exception(future, exception):
+    try:
+        future.set_exception(exception)
+        return True
+    except InvalidStateError:
+        return False
+
+def _dispatch():
+    """Hand waiting files to the pool while it has idle workers"""
+    with _pool_lock:
+        while _waiting and len(_in_flight) < EXTRACTION_WORKERS:
+            future, path = _waiting.popleft()
+            if future.done():
+                continue
+            pool = get_extraction_pool()
+            try:
+                pool_future = pool.submit(_timed_extraction, path)
+            except BrokenProcessPool:
+                # A worker crashed: the files it held fail, the ones still waiting go to a fresh pool
+                _waiting.appendleft((future, path))
+                _reset_extraction_pool(pool)
+                continue
+            except RuntimeError as e:
+                _set_exception(future, e)
+                continue
+            pool_future.pool = pool
+            future.pool = pool
+            future.pool_future = pool_future
+            _in_flight.add(pool_future)
+            pool_future.add_done_callback(partial(_forward_result, future, path))
+
+def submit_extraction(resume_file, timings=None):
+    """Start extracting a file in the process pool and return its future
+
+    Files seen before (same bytes) are answered from EXTRACTION_CACHE with an
+    already-completed future, without touching the pool. Parse time is recorded
+    as the "extract" stage, in `timings` too when given. The returned future
+    outlives the pool: if another file hangs and its pool is terminated, this
+    file is rerun in the replacement pool.
+    """
+    path = file_path(resume_file)
+    cache_key = extraction_cache_key(path) if EXTRACTION_CACHE.enabled else None
+
+    future = Future()
+    future.pool = future.pool_future = None
+    if cache_key is not None:
+        cached = EXTRACTION_CACHE.get(cache_key)
+        if cached is not None:
+            future.set_result((cached, 0.0))
+            return future
+
+    future.add_done_callback(partial(_extraction_done, cache_key, timings))
+    with _pool_lock:
+        _waiting.append((future, path))
+        _dispatch()
+    return future
+
+def wait_for_extraction(future, name):
+    """Wait for a submitted extraction, giving up after EXTRACTION_TIMEOUT seconds of work
+
+    A file that runs out of time has its pool terminated, so the worker it was hogging
+    is replaced instead of stalling every file queued behind it.
+    """
+    while True:
+        # Only start the clock once a worker has actually picked the file up
+        while future.pool_future is None and not future.done():
+            time.sleep(0.01)
+        pool_future = future.pool_future
+
+        try:
+            text, _ = future.result(timeout=EXTRACTION_TIMEOUT)
+            return text
+        except TimeoutError:
+            if future.pool_future is not pool_future:
+                # Rerun after another file's pool was terminated: its clock starts again
+                continue
+            message = f"Error reading {name}: extraction timed out after {EXTRACTION_TIMEOUT:g} seconds"
+            if not _set_exception(future, TimeoutError(message)):
+                # Finished just as the clock ran out
+                continue
+            _reset_extraction_pool(future.pool, terminate=True)
+            return message
+        except BrokenProcessPool as e:
+            _reset_extraction_pool(future.pool)
+            return f"Error reading {name}: {str(e)}"
+        except Exception as e:
+            return f"Error reading {name}: {str(e)}"
@@ -0,0 +1,331 @@
+"""Local stand-in for the Anthropic Messages and Message Batches endpoints.
+
+Point the app at it to exercise the full pipeline without an API key or cost:
+
+    python fake_anthropic.py --port 8765
+    ANTHROPIC_BASE_URL=http://127.0.0.1:8765 ANTHROPIC_API_KEY=test python app.py
+"""
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def fake_match(seed):
+    score = int(hashlib.sha256(seed.encode('utf-8')).hexdigest(), 16) % 10 + 1
+    if score >= 7:
+        recommendation = "GOOD MATCH"
+    elif score >= 4:
+        recommendation = "CONSIDERABLE MATCH"
+    else:
+        recommendation = "REJECT"
+    return {"match_score": score, "recommendation": recommendation, "reason": "Generated by the local fake Anthropic server."}
+
+
+def fake_analysis(prompt, role_count=0):
+    """Deterministic analysis fields derived from the resume in the prompt
+
+    With a role count, answers the multi-role tool: one match per role instead of a single one.
+    """
+    resume = prompt.split("CANDIDATE RESUME:", 1)[-1]
+    first_line = next((line.strip() for line in resume.splitlines() if line.strip()), "Not Available")
+    email = re.search(r"[\w.+-]+@[\w-]+\.[\w.]+", resume)
+    analysis = {
+        "candidate_name": first_line[:60],
+        "email": email.group(0) if email else "Not Available",
+        "phone": "Not Available",
+        "current_company": "Example Corp",
+        "current_designation": "Engineer",
+        "total_experience": "5 years",
+    }
+    if role_count:
+        titles = re.findall(r"^ROLE (\d+): (.*)$", prompt, re.MULTILINE)
+        analysis["roles"] = [{"role": int(number), **fake_match(resume + title)} for number, title in titles[:role_count]]
+    else:
+        analysis.update(fake_match(resume))
+    return analysis
+
+
+def role_count(params):
+    """Number of roles the request's multi-role tool asks for, or 0"""
+    for tool in params.get("tools") or []:
+        roles = tool.get("input_schema", {}).get("properties", {}).get("roles")
+        if roles:
+            return roles.get("maxItems", 0)
+    return 0
+
+
+def content_blocks(params, analysis):
+    """Answer with a tool call when the request offers tools, otherwise with labelled text lines"""
+    tools = params.get("tools") or []
+    if tools:
+        return [{"type": "tool_use", "id": f"toolu_{uuid.uuid4().hex[:24]}", "name": tools[0]["name"], "input": analysis}]
+
+    text = "\n".join(f"{field.upper()}: {value}" for field, value in analysis.items())
+    return [{"type": "text", "text": text}]
+
+
+def system_blocks(params):
+    system = params.get("system") or []
+    if isinstance(system, str):
+        return [{"type": "text", "text": system}]
+    return system
+
+
+def prompt_text(params):
+    """Flatten system and message content into one string"""
+    parts = [block.get("text", "") for block in system_blocks(params)]
+    for message in params.get("messages", []):
+        content = message.get("content")
+        if isinstance(content, str):
+            parts.append(content)
+        else:
+            parts.extend(block.get("text", "") for block in content or [])
+    return "\n".join(parts)
+
+
+def tools_text(params):
+    tools = params.get("tools")
+    return json.dumps(tools) if tools else ""
+
+
+def cached_prefix(params):
+    """Tools and system text up to and including the last system block marked with cache_control"""
+    blocks = system_blocks(params)
+    marked = [index for index, block in enumerate(blocks) if block.get("cache_control")]
+    if not marked:
+        return ""
+    return "\n".join([tools_text(params)] + [block.get("text", "") for block in blocks[:marked[-1] + 1]])
+
+
+def min_cacheable_tokens(model):
+    """Shortest prefix the API will cache; shorter ones are silently billed as ordinary input"""
+    return 2048 if "haiku" in str(model) else 1024
+
+
+def build_message(params, seen_prefixes=None):
+    prompt = prompt_text(params)
+    roles = role_count(params)
+    # Candidate details plus one short match per role
+    usage = {"input_tokens": max(1, (len(prompt) + len(tools_text(params))) // 4),
+             "output_tokens": 80 + 40 * roles if roles else 120,
+             "cache_creation_input_tokens": 0, "cache_read_input_tokens": 0}
+
+    # Imitate prompt caching: the first request writes the prefix, later ones read it
+    prefix = cached_prefix(params)
+    prefix_tokens = len(prefix) // 4
+    if prefix and seen_prefixes is not None and prefix_tokens >= min_cacheable_tokens(params.get("model")):
+        usage["input_tokens"] = max(1, usage["input_tokens"] - prefix_tokens)
+        if prefix in seen_prefixes:
+            usage["cache_read_input_tokens"] = prefix_tokens
+        else:
+            seen_prefixes.add(prefix)
+            usage["cache_creation_input_tokens"] = prefix_tokens
+
+    return {
+        "id": f"msg_{uuid.uuid4().hex[:24]}",
+        "type": "message",
+        "role": "assistant",
+        "model": params.get("model", "fake-model"),
+        "content": content_blocks(params, fake_analysis(prompt, roles)),
+        "stop_reason": "tool_use" if params.get("tools") else "end_turn",
+        "stop_sequence": None,
+        "usage": usage,
+    }
+
+
+def isoformat(moment):
+    return moment.isoformat().replace('+00:00', 'Z')
+
+
+ERROR_TYPES = {429: "rate_limit_error", 500: "api_error", 529: "overloaded_error"}
+
+
+class FakeAnthropicState:
+    def __init__(self, latency, batch_delay, error_rate=0.0, error_status=529, retry_after=None, fast_latency=None):
+        self.latency = latency
+        self.fast_latency = latency if fast_latency is None else fast_latency
+        self.batch_delay = batch_delay
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self.requests = 0
+        self.errors = 0
+        self.batches = {}
+        self.seen_prefixes = set()
+        self.lock = threading.Lock()
+
+    def latency_for(self, model):
+        """Haiku models answer after fast_latency, the rest after latency"""
+        return self.fast_latency if "haiku" in str(model) else self.latency
+
+    def create_message(self, params):
+        with self.lock:
+            return build_message(params, self.seen_prefixes)
+
+    def should_fail(self):
+        """Count a /v1/messages request and decide whether to inject an error for it"""
+        with self.lock:
+            self.requests += 1
+            if random.random() < self.error_rate:
+                self.errors += 1
+                return True
+            return False
+
+    def create_batch(self, requests, base_url):
+        batch_id = f"msgbatch_{uuid.uuid4().hex[:24]}"
+        with self.lock:
+            self.batches[batch_id] = {
+                "requests": requests,
+                "created_at": datetime.now(timezone.utc),
+                "base_url": base_url,
+            }
+        return self.batch_object(batch_id)
+
+    def batch_object(self, batch_id):
+        batch = self.batches[batch_id]
+        created_at = batch["created_at"]
+        ended = datetime.now(timezone.utc) >= created_at + timedelta(seconds=self.batch_delay)
+        count = len(batch["requests"])
+        return {
+            "id": batch_id,
+            "type": "message_batch",
+            "processing_status": "ended" if ended else "in_progress",
+            "request_counts": {
+                "processing": 0 if ended else count,
+                "succeeded": count if ended else 0,
+                "errored": 0,
+                "canceled": 0,
+                "expired": 0,
+            },
+            "created_at": isoformat(created_at),
+            "expires_at": isoformat(created_at + timedelta(hours=24)),
+            "ended_at": isoformat(created_at + timedelta(seconds=self.batch_delay)) if ended else None,
+            "archived_at": None,
+            "cancel_initiated_at": None,
+            "results_url": f"{batch['base_url']}/v1/messages/batches/{batch_id}/results" if ended else None,
+        }
+
+    def batch_results(self, batch_id):
+        return [
+            {"custom_id": request["custom_id"],
+             "result": {"type": "succeeded", "message": self.create_message(request["params"])}}
+            for request in self.batches[batch_id]["requests"]
+        ]
+
+
+class FakeAnthropicHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def state(self):
+        return self.server.state
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, body, headers=None):
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def send_error_json(self, status, error_type, message, headers=None):
+        self.send_json(status, {"type": "error", "error": {"type": error_type, "message": message}}, headers)
+
+    def read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_POST(self):
+        path = self.path.split('?', 1)[0]
+        body = self.read_json()
+
+        if path == "/v1/messages":
+            time.sleep(self.state.latency_for(body.get("model")))
+            if self.state.should_fail():
+                status = self.state.error_status
+                headers = {"retry-after": str(self.state.retry_after)} if self.state.retry_after is not None else {}
+                self.send_error_json(status, ERROR_TYPES.get(status, "api_error"), "Injected failure", headers)
+                return
+            self.send_json(200, self.state.create_message(body), {
+                "anthropic-ratelimit-requests-limit": "1000",
+                "anthropic-ratelimit-requests-remaining": "999",
+            })
+        elif path == "/v1/messages/batches":
+            base_url = f"http://{self.headers.get('Host')}"
+            self.send_json(200, self.state.create_batch(body.get("requests", []), base_url))
+        else:
+            self.send_error_json(404, "not_found_error", f"Unknown endpoint {path}")
+
+    def do_GET(self):
+        path = self.path.split('?', 1)[0]
+        match = re.fullmatch(r"/v1/messages/batches/([\w-]+)(/results)?", path)
+
+        if not match or match.group(1) not in self.state.batches:
+            self.send_error_json(404, "not_found_error", f"Unknown endpoint {path}")
+            return
+
+        batch_id = match.group(1)
+        if not match.group(2):
+            self.send_json(200, self.state.batch_object(batch_id))
+            return
+
+        payload = "".join(json.dumps(line) + "\n" for line in self.state.batch_results(batch_id)).encode('utf-8')
+        self.send_response(200)
+        self.send_header("Content-Type", "application/binary")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def create_server(host="127.0.0.1", port=0, latency=0.0, batch_delay=0.0, error_rate=0.0, error_status=529, retry_after=None,
+                  fast_latency=None):
+    """Build a server bound to host:port (port 0 picks a free one); call serve_forever() to run it"""
+    server = ThreadingHTTPServer((host, port), FakeAnthropicHandler)
+    server.daemon_threads = True
+    server.state = FakeAnthropicState(latency, batch_delay, error_rate, error_status, retry_after, fast_latency)
+    return server
+
+
+def start_server(**kwargs):
+    """Run a server on a background thread and return it with its base URL"""
+    server = create_server(**kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address[:2]
+    return server, f"http://{host}:{port}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Anthropic API server for local testing")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before answering /v1/messages")
+    parser.add_argument("--fast-latency", type=float, help="Latency for haiku models (default: --latency)")
+    parser.add_argument("--batch-delay", type=float, default=5.0, help="Seconds before a Message Batch reports ended")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of /v1/messages requests that fail")
+    parser.add_argument("--error-status", type=int, default=529, help="HTTP status for injected failures (429, 500, 529, ...)")
+    parser.add_argument("--retry-after", type=float, help="retry-after header sent with injected failures")
+    args = parser.parse_args()
+
+    server = create_server(args.host, args.port, args.latency, args.batch_delay,
+                           args.error_rate, args.error_status, args.retry_after, args.fast_latency)
+    print(f"Fake Anthropic API listening on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,581 @@
+"""Persistent analysis queue drained by worker processes.
+
+The web tier only enqueues jobs and polls their progress; worker processes
+(`python -m job_queue --worker`, started by the app or by `python -m job_queue
+--workers N`, so they never import the web UI) claim jobs from the SQLite
+queue and run the analysis pipeline. Uploads are copied next to the queue
+and every finished row is written back as it completes, so a job
+interrupted by a restart resumes where it stopped.
+Jobs belong to whoever queued them (an id kept by their browser) and are
+deleted, rows and files, JOB_RETENTION seconds after they finish. Bulk
+jobs only prepare the files and submit them as a Message Batch (see
+batch_jobs), so large drops never tie up the web process; the job then
+waits in the queue and a worker checks on the batch every
+BATCH_POLL_INTERVAL seconds until its results are merged.
+"""
+import argparse
+import atexit
+import json
+import os
+import shutil
+import signal
+import socket
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+
+import batch_jobs
+from analyzer import (MAX_CONCURRENT_REQUESTS, REQUESTS_PER_MINUTE, RateLimiter, UsageStats, analyze_resume_file,
+                      api_error_result, prescreen_resume_files)
+from extraction import file_path, shutdown_extraction_pool, submit_extraction
+from metrics import StageTimings, observe
+from multi_role import analyze_resume_roles, role_rows
+from prescreen import PRESCREEN_MIN_SCORE
+from resilience import CircuitBreaker
+
+JOB_QUEUE_PATH = os.getenv('JOB_QUEUE_PATH', os.path.join('.cache', 'job_queue.sqlite3'))
+# Uploads are copied here so queued jobs survive Gradio cleaning up its temp files
+JOB_FILES_DIR = os.getenv('JOB_FILES_DIR', os.path.join('.cache', 'job_files'))
+# Worker processes started by the app (0 = run them separately with `python -m job_queue`)
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', 2))
+JOB_POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', 0.5))
+# A running job whose worker has not checked in for this long is handed to another worker
+JOB_STALE_AFTER = float(os.getenv('JOB_STALE_AFTER', 60))
+HEARTBEAT_INTERVAL = JOB_STALE_AFTER / 4
+# Seconds a terminated worker keeps waiting for requests already in flight, so their rows are saved
+JOB_SHUTDOWN_GRACE = float(os.getenv('JOB_SHUTDOWN_GRACE', 3))
+# Finished jobs, with their candidates' details, are deleted this many seconds later (0 = keep forever);
+# jobs that never finish are deleted this long after they were queued
+JOB_RETENTION = float(os.getenv('JOB_RETENTION', 7 * 24 * 60 * 60))
+
+# Set by SIGTERM in a worker process: stop starting requests, save what finishes, requeue the job
+_shutdown = threading.Event()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    job_title TEXT NOT NULL,
+    important_duties TEXT NOT NULL,
+    considerable_duties TEXT NOT NULL,
+    prescreen_min_score REAL NOT NULL,
+    status TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    heartbeat_at REAL,
+    worker TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    usage TEXT,
+    timings TEXT,
+    roles TEXT,
+    owner TEXT,
+    kind TEXT,
+    available_at REAL,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);
+CREATE TABLE IF NOT EXISTS items (
+    job_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    result TEXT,
+    PRIMARY KEY (job_id, idx)
+);
+CREATE TABLE IF NOT EXISTS workers (
+    id TEXT PRIMARY KEY,
+    seen_at REAL NOT NULL
+);
+"""
+
+def connect(path=None):
+    """New connection to the queue; every process and thread opens its own"""
+    path = path or JOB_QUEUE_PATH
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    # WAL lets the UI read progress while a worker is writing results
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    # Queues created by older versions lack the newer columns
+    columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+    column_types = {"timings": "TEXT", "roles": "TEXT", "owner": "TEXT", "kind": "TEXT", "available_at": "REAL"}
+    for column, column_type in column_types.items():
+        if column not in columns:
+            conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {column_type}")
+    conn.execute("CREATE INDEX IF NOT EXISTS jobs_owner ON jobs (owner, created_at)")
+    return conn
+
+def enqueue_job(resume_files, job_title, important_duties, considerable_duties, prescreen_min_score=PRESCREEN_MIN_SCORE, roles=None, owner=None, kind="live"):
+    """Copy the uploads into the queue's file store and add a queued job; returns the job id
+
+    With `roles` (a list of job_title/important_duties/considerable_duties dicts) every
+    resume is scored against all of them and job_title is just the job's label. Only
+    `owner` sees the job in list_jobs. A "bulk" job is submitted as a Message Batch
+    saved under the same id instead of being analyzed here.
+    """
+    job_id = f"q_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
+
+    items = []
+    for index, resume_file in enumerate(resume_files):
+        source = file_path(resume_file)
+        # One directory per file keeps the original name, which becomes the File Name column
+        directory = os.path.join(JOB_FILES_DIR, job_id, str(index))
+        os.makedirs(directory, exist_ok=True)
+        destination = os.path.join(directory, os.path.basename(source))
+        shutil.copyfile(source, destination)
+        items.append((job_id, index, destination))
+
+    conn = connect()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute(
+            "INSERT INTO jobs (id, job_title, important_duties, considerable_duties, prescreen_min_score, status, total, created_at, roles, owner, kind) "
+            "VALUES (?, ?, ?, ?, ?, 'queued', ?, ?, ?, ?, ?)",
+            (job_id, job_title, important_duties, considerable_duties, prescreen_min_score, len(items), time.time(),
+             json.dumps(roles) if roles else None, owner, kind)
+        )
+        conn.executemany("INSERT INTO items (job_id, idx, path) VALUES (?, ?, ?)", items)
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+    return job_id
+
+def claim_job(conn, worker):
+    """Atomically take the oldest queued job, a waiting bulk job due for a check, or a running one whose worker went silent"""
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = conn.execute(
+            "SELECT id FROM jobs WHERE status = 'queued' OR (status = 'waiting' AND available_at <= ?) "
+            "OR (status = 'running' AND heartbeat_at < ?) ORDER BY created_at LIMIT 1",
+            (now, now - JOB_STALE_AFTER)
+        ).fetchone()
+        if row is None:
+            conn.execute("COMMIT")
+            return None
+
+        conn.execute(
+            "UPDATE jobs SET status = 'running', worker = ?, heartbeat_at = ?, attempts = attempts + 1, "
+            "started_at = COALESCE(started_at, ?) WHERE id = ?",
+            (worker, now, now, row["id"])
+        )
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    return get_job(row["id"], conn)
+
+def get_job(job_id, conn=None):
+    """Job row as a dict with its finished rows, or None if it does not exist"""
+    own_conn = conn is None
+    conn = conn or connect()
+    try:
+        job = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if job is None:
+            return None
+
+        job = dict(job)
+        job["usage"] = json.loads(job["usage"]) if job["usage"] else {}
+        job["timings"] = json.loads(job["timings"]) if job["timings"] else {}
+        job["roles"] = json.loads(job["roles"]) if job["roles"] else None
+        job["items"] = [
+            {"index": item["idx"], "path": item["path"], "result": json.loads(item["result"]) if item["result"] else None}
+            for item in conn.execute("SELECT idx, path, result FROM items WHERE job_id = ? ORDER BY idx", (job_id,))
+        ]
+        return job
+    finally:
+        if own_conn:
+            conn.close()
+
+def job_rows(job):
+    """Finished rows in upload order; a failed job reports its error for the files it never reached
+
+    Multi-role jobs store a list of rows per file, one per role, and are flattened here.
+    """
+    rows = []
+    for item in job["items"]:
+        result = item["result"]
+        if result is None and job["status"] == "failed":
+            result = api_error_result(os.path.basename(item["path"]), job["error"])
+            if job["roles"]:
+                result = role_rows(result, job["roles"])
+        if isinstance(result, list):
+            rows.extend(result)
+        elif result is not None:
+            rows.append(result)
+    return rows
+
+def list_jobs(owner, limit=20, kind="live"):
+    """An owner's most recent jobs of one kind, newest first, without their rows"""
+    conn = connect()
+    try:
+        return [dict(row) for row in conn.execute(
+            "SELECT id, job_title, status, total, created_at FROM jobs WHERE owner = ? AND COALESCE(kind, 'live') = ? "
+            "ORDER BY created_at DESC LIMIT ?",
+            (owner, kind, limit)
+        )]
+    finally:
+        conn.close()
+
+def prune_jobs(retention=JOB_RETENTION):
+    """Delete jobs, their rows and their copied uploads once they are older than the retention period"""
+    if retention <= 0:
+        return 0
+
+    conn = connect()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # A running job is left alone however old it is; its worker is still writing to it
+            job_ids = [row["id"] for row in conn.execute(
+                "SELECT id FROM jobs WHERE status != 'running' AND COALESCE(finished_at, created_at) < ?",
+                (time.time() - retention,)
+            )]
+            for job_id in job_ids:
+                conn.execute("DELETE FROM items WHERE job_id = ?", (job_id,))
+                conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.close()
+
+    for job_id in job_ids:
+        shutil.rmtree(os.path.join(JOB_FILES_DIR, job_id), ignore_errors=True)
+    return len(job_ids)
+
+def queue_stats():
+    """Queue depth and average wait/run time of recently finished jobs"""
+    conn = connect()
+    try:
+        counts = dict(conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        wait, run = conn.execute(
+            "SELECT AVG(started_at - created_at), AVG(finished_at - started_at) FROM "
+            "(SELECT * FROM jobs WHERE status = 'done' ORDER BY finished_at DESC LIMIT 50)"
+        ).fetchone()
+    finally:
+        conn.close()
+
+    return {
+        "queued": counts.get("queued", 0),
+        "running": counts.get("running", 0),
+        "waiting": counts.get("waiting", 0),
+        "done": counts.get("done", 0),
+        "failed": counts.get("failed", 0),
+        "avg_wait_seconds": wait or 0.0,
+        "avg_run_seconds": run or 0.0,
+    }
+
+def queue_position(job):
+    """Number of queued jobs ahead of this one"""
+    conn = connect()
+    try:
+        return conn.execute(
+            "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND created_at < ?", (job["created_at"],)
+        ).fetchone()[0]
+    finally:
+        conn.close()
+
+def watch_job(job_id, poll_interval=JOB_POLL_INTERVAL):
+    """Yield a job's latest state every poll_interval until it finishes
+
+    Stops early, leaving the job unfinished, once no worker has checked in for
+    JOB_STALE_AFTER seconds, since nothing would ever pick the job up.
+    """
+    idle_since = None
+    while True:
+        job = get_job(job_id)
+        yield job
+        if job["status"] in ("done", "failed"):
+            return
+        if live_workers():
+            idle_since = None
+        elif idle_since is None:
+            idle_since = time.monotonic()
+        elif time.monotonic() - idle_since >= JOB_STALE_AFTER:
+            return
+        time.sleep(poll_interval)
+
+def job_latency(job):
+    """(seconds spent queued, seconds spent running) so far"""
+    now = time.time()
+    if job["started_at"] is None:
+        return now - job["created_at"], 0.0
+    return job["started_at"] - job["created_at"], (job["finished_at"] or now) - job["started_at"]
+
+def check_in(conn, worker):
+    """Record that a worker is alive, busy or idle, for live_workers"""
+    conn.execute("INSERT OR REPLACE INTO workers (id, seen_at) VALUES (?, ?)", (worker, time.time()))
+
+def live_workers():
+    """Number of workers, on any host, that have checked in within JOB_STALE_AFTER seconds"""
+    conn = connect()
+    try:
+        return conn.execute("SELECT COUNT(*) FROM workers WHERE seen_at >= ?", (time.time() - JOB_STALE_AFTER,)).fetchone()[0]
+    finally:
+        conn.close()
+
+def _heartbeat(job_id, worker, stop):
+    conn = connect()
+    try:
+        while not stop.wait(HEARTBEAT_INTERVAL):
+            conn.execute("UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND worker = ?", (time.time(), job_id, worker))
+            check_in(conn, worker)
+    finally:
+        conn.close()
+
+def process_bulk_job(client, job, worker):
+    """Submit a claimed bulk job's files as one Message Batch, or check on the batch it already submitted
+
+    Until the batch has ended and its results are merged, the job goes back to the queue
+    as "waiting" and is claimed again BATCH_POLL_INTERVAL seconds later.
+    """
+    conn = connect()
+    stop = threading.Event()
+    heartbeat = threading.Thread(target=_heartbeat, args=(job["id"], worker, stop), daemon=True)
+    heartbeat.start()
+
+    try:
+        try:
+            if os.path.exists(batch_jobs.job_path(job["id"])):
+                batch_job = batch_jobs.refresh_batch_job(client, batch_jobs.load_job(job["id"]))
+            else:
+                batch_job = batch_jobs.submit_batch_job(client, [item["path"] for item in job["items"]], job["job_title"],
+                                                        job["important_duties"], job["considerable_duties"],
+                                                        job["prescreen_min_score"], job["owner"], job["id"])
+        except Exception as e:
+            if not os.path.exists(batch_jobs.job_path(job["id"])):
+                conn.execute(
+                    "UPDATE jobs SET status = 'failed', finished_at = ?, error = ? WHERE id = ?",
+                    (time.time(), str(e), job["id"])
+                )
+                return
+            # The batch was submitted and only a status check failed: try again at the next interval
+            batch_job = None
+
+        if batch_job is not None and batch_jobs.job_finished(batch_job):
+            conn.execute(
+                "UPDATE jobs SET status = 'done', finished_at = ?, usage = ? WHERE id = ?",
+                (time.time(), json.dumps(batch_job["usage"]), job["id"])
+            )
+        else:
+            conn.execute(
+                "UPDATE jobs SET status = 'waiting', worker = NULL, available_at = ? WHERE id = ?",
+                (time.time() + batch_jobs.BATCH_POLL_INTERVAL, job["id"])
+            )
+    finally:
+        stop.set()
+        conn.close()
+        # Once submitted, the saved batch job has everything from the files that the results need
+        shutil.rmtree(os.path.join(JOB_FILES_DIR, job["id"]), ignore_errors=True)
+
+def process_job(client, job, worker, rate_limiter=None):
+    """Analyze every item of a claimed job that has no result yet, saving each row as it finishes"""
+    if job["kind"] == "bulk":
+        return process_bulk_job(client, job, worker)
+
+    conn = connect()
+    stop = threading.Event()
+    heartbeat = threading.Thread(target=_heartbeat, args=(job["id"], worker, stop), daemon=True)
+    heartbeat.start()
+
+    try:
+        pending = [item for item in job["items"] if item["result"] is None]
+        paths = [item["path"] for item in pending]
+        breaker = CircuitBreaker()
+        usage = UsageStats.from_dict(job["usage"])
+        timings = StageTimings.from_dict(job["timings"])
+
+        def save(item, result):
+            conn.execute(
+                "UPDATE items SET result = ? WHERE job_id = ? AND idx = ?",
+                (json.dumps(result), job["id"], item["index"])
+            )
+
+        roles = job["roles"]
+        extractions = [submit_extraction(path, timings) for path in paths]
+        if roles:
+            # Keep every resume that is close enough to any one of the roles
+            important_duties = [role["important_duties"] for role in roles]
+            considerable_duties = [role["considerable_duties"] for role in roles]
+        else:
+            important_duties, considerable_duties = job["important_duties"], job["considerable_duties"]
+        rejected, order = prescreen_resume_files(paths, extractions, important_duties, considerable_duties,
+                                                 job["prescreen_min_score"], timings)
+        for position, result in rejected.items():
+            save(pending[position], role_rows(result, roles) if roles else result)
+
+        executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_REQUESTS)
+        try:
+            if roles:
+                futures = {
+                    executor.submit(analyze_resume_roles, client, paths[position], extractions[position], roles,
+                                    rate_limiter, usage, breaker, timings): position
+                    for position in order
+                }
+            else:
+                futures = {
+                    executor.submit(analyze_resume_file, client, paths[position], extractions[position], job["job_title"],
+                                    job["important_duties"], job["considerable_duties"], rate_limiter, usage, breaker, timings): position
+                    for position in order
+                }
+            remaining = set(futures)
+            while remaining and not _shutdown.is_set():
+                done, remaining = wait(remaining, timeout=JOB_POLL_INTERVAL, return_when=FIRST_COMPLETED)
+                for future in done:
+                    save(pending[futures[future]], future.result())
+
+            if remaining:
+                # Terminated: drop the requests that have not started and keep whatever the
+                # in-flight ones return within the grace period; the rest is redone on resume
+                executor.shutdown(wait=False, cancel_futures=True)
+                done, _ = wait(remaining, timeout=JOB_SHUTDOWN_GRACE)
+                for future in done:
+                    if not future.cancelled():
+                        save(pending[futures[future]], future.result())
+                conn.execute("UPDATE jobs SET status = 'queued', worker = NULL WHERE id = ?", (job["id"],))
+                return
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        finished_at = time.time()
+        conn.execute(
+            "UPDATE jobs SET status = 'done', finished_at = ?, usage = ?, timings = ? WHERE id = ?",
+            (finished_at, json.dumps(usage.to_dict()), json.dumps(timings.to_dict()), job["id"])
+        )
+        observe("resume_job_wait_seconds", job["started_at"] - job["created_at"])
+        observe("resume_job_run_seconds", finished_at - job["started_at"])
+        # Results are in the queue now, so the copied uploads are no longer needed
+        shutil.rmtree(os.path.join(JOB_FILES_DIR, job["id"]), ignore_errors=True)
+    except Exception as e:
+        conn.execute(
+            "UPDATE jobs SET status = 'failed', finished_at = ?, error = ? WHERE id = ?",
+            (time.time(), str(e), job["id"])
+        )
+        # Failed jobs are not resumed, so their uploads are not needed either
+        shutil.rmtree(os.path.join(JOB_FILES_DIR, job["id"]), ignore_errors=True)
+    finally:
+        stop.set()
+        conn.close()
+
+def run_worker(requests_per_minute=REQUESTS_PER_MINUTE, poll_interval=JOB_POLL_INTERVAL):
+    """Worker process main loop: claim, process, repeat"""
+    import anthropic
+
+    client = anthropic.Anthropic()
+    rate_limiter = RateLimiter(requests_per_minute)
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    conn = connect()
+
+    # On terminate, process_job stops sending requests and puts its job back in the queue
+    signal.signal(signal.SIGTERM, lambda *_: _shutdown.set())
+    checked_in = 0.0
+    try:
+        while not _shutdown.is_set():
+            if time.monotonic() - checked_in >= HEARTBEAT_INTERVAL:
+                check_in(conn, worker)
+                checked_in = time.monotonic()
+            job = claim_job(conn, worker)
+            if job is None:
+                _shutdown.wait(poll_interval)
+                continue
+            process_job(client, job, worker, rate_limiter)
+            prune_jobs()
+            checked_in = 0.0
+    finally:
+        shutdown_extraction_pool()
+        conn.execute("DELETE FROM workers WHERE id = ?", (worker,))
+        conn.close()
+    # Requests still running after the grace period are abandoned rather than waited for at interpreter exit
+    os._exit(0)
+
+def requeue_orphaned_jobs():
+    """Put back running jobs whose worker process on this host is gone, so a restart resumes them at once"""
+    host = socket.gethostname()
+    conn = connect()
+    try:
+        for row in conn.execute("SELECT id, worker FROM jobs WHERE status = 'running'").fetchall():
+            worker_host, _, pid = (row["worker"] or "").rpartition(":")
+            if worker_host != host or not pid.isdigit():
+                continue
+            try:
+                os.kill(int(pid), 0)
+                continue
+            except ProcessLookupError:
+                pass
+            except OSError:
+                continue
+            conn.execute("UPDATE jobs SET status = 'queued' WHERE id = ? AND status = 'running'", (row["id"],))
+    finally:
+        conn.close()
+
+_workers = []
+
+def start_workers(count=JOB_WORKERS, requests_per_minute=REQUESTS_PER_MINUTE):
+    """Start worker processes that stop with this process; the API rate limit is split between them
+
+    Each worker is a fresh `python -m job_queue --worker` interpreter rather than a
+    multiprocessing child, which would re-import the caller's main script (the web UI).
+    """
+    if _workers or count <= 0:
+        return _workers
+
+    requeue_orphaned_jobs()
+    prune_jobs()
+
+    command = [sys.executable, "-m", "job_queue", "--worker",
+               "--requests-per-minute", str(max(1, requests_per_minute // count))]
+    # The worker imports this module by name, whatever directory the caller was started from
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [os.path.dirname(os.path.abspath(__file__)), env.get("PYTHONPATH")]))
+    for _ in range(count):
+        _workers.append(subprocess.Popen(command, env=env))
+
+    atexit.register(stop_workers)
+    return _workers
+
+def stop_workers():
+    for process in _workers:
+        process.terminate()
+    for process in _workers:
+        try:
+            process.wait(timeout=JOB_SHUTDOWN_GRACE + 5)
+        except subprocess.TimeoutExpired:
+            # A worker stuck past its grace period is killed; its job is requeued on the next start
+            process.kill()
+            process.wait()
+    _workers.clear()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m job_queue", description="Run analysis queue workers.")
+    parser.add_argument("--workers", type=int, default=max(1, JOB_WORKERS), help="worker processes to run")
+    parser.add_argument("--requests-per-minute", type=int, default=REQUESTS_PER_MINUTE,
+                        help="API rate limit shared by the workers")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        # Ctrl+C reaches the whole process group; the parent stops workers with SIGTERM instead
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        run_worker(args.requests_per_minute)
+        return
+
+    start_workers(args.workers, args.requests_per_minute)
+    try:
+        for process in _workers:
+            process.wait()
+    except KeyboardInterrupt:
+        stop_workers()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""Per-stage timings and Prometheus-style metrics shared by the app, queue workers and the CLI.
+
+Observations go straight into a small SQLite file, so every process that does
+work (the web tier, each queue worker) feeds the same /metrics output and
+nothing is lost when a worker restarts.
+"""
+import math
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+# Set METRICS_PATH to an empty string to turn metrics off
+METRICS_PATH = os.getenv('METRICS_PATH', os.path.join('.cache', 'metrics.sqlite3'))
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, math.inf)
+
+# name -> (type, help)
+METRICS = {
+    "resume_stage_seconds": ("histogram", "Time spent per pipeline stage (extract, prescreen, api, parse, analysis, postprocess, export)"),
+    "resume_api_requests_total": ("counter", "Claude API requests by outcome"),
+    "resume_tokens_total": ("counter", "Tokens reported in message.usage, by type and model"),
+    "resume_escalations_total": ("counter", "Analyses escalated from the fast model to the stronger one"),
+    "resume_job_wait_seconds": ("histogram", "Time queued jobs waited for a worker"),
+    "resume_job_run_seconds": ("histogram", "Time workers spent running a job"),
+}
+
+_local = threading.local()
+
+def _connect():
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        directory = os.path.dirname(METRICS_PATH)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(METRICS_PATH, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS samples ("
+            "name TEXT NOT NULL, labels TEXT NOT NULL, value REAL NOT NULL, PRIMARY KEY (name, labels))"
+        )
+        _local.conn = conn
+    return conn
+
+def _labels(labels):
+    return ",".join(f'{key}="{value}"' for key, value in sorted(labels.items()))
+
+def _add(rows):
+    conn = _connect()
+    conn.execute("BEGIN IMMEDIATE")
+    conn.executemany(
+        "INSERT INTO samples (name, labels, value) VALUES (?, ?, ?) "
+        "ON CONFLICT(name, labels) DO UPDATE SET value = value + excluded.value",
+        rows
+    )
+    conn.execute("COMMIT")
+
+def increment(name, amount=1, **labels):
+    if METRICS_PATH and amount:
+        _add([(name, _labels(labels), amount)])
+
+def observe(name, seconds, **labels):
+    """Add one observation to a histogram (buckets are stored per bucket and summed up when rendered)"""
+    if not METRICS_PATH:
+        return
+
+    bucket = next(bound for bound in BUCKETS if seconds <= bound)
+    base = _labels(labels)
+    # le always goes last so render() can split it back off
+    le = 'le="%s"' % ("+Inf" if bucket == math.inf else f"{bucket:g}")
+    _add([
+        (f"{name}_bucket", f"{base},{le}" if base else le, 1),
+        (f"{name}_sum", base, seconds),
+        (f"{name}_count", base, 1),
+    ])
+
+def render(gauges=()):
+    """Prometheus text exposition of everything recorded, plus (name, help, value) gauges computed at scrape time"""
+    samples = {}
+    if METRICS_PATH:
+        for name, labels, value in _connect().execute("SELECT name, labels, value FROM samples ORDER BY name, labels"):
+            samples.setdefault(name, []).append((labels, value))
+
+    lines = []
+    for name, (metric_type, help_text) in METRICS.items():
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}"]
+        if metric_type != "histogram":
+            lines += [f"{name}{{{labels}}} {value:g}" if labels else f"{name} {value:g}" for labels, value in samples.get(name, [])]
+            continue
+
+        # Buckets are stored individually; Prometheus wants them cumulative per label set
+        series = {}
+        for labels, value in samples.get(f"{name}_bucket", []):
+            base, _, le = labels.rpartition('le="')
+            base, le = base.rstrip(","), le.rstrip('"')
+            series.setdefault(base, {})[le] = value
+        for base, counts in series.items():
+            total = 0
+            for bound in BUCKETS:
+                le = "+Inf" if bound == math.inf else f"{bound:g}"
+                total += counts.get(le, 0)
+                lines.append(f'{name}_bucket{{{base + "," if base else ""}le="{le}"}} {total:g}')
+            for suffix in ("sum", "count"):
+                value = dict(samples.get(f"{name}_{suffix}", [])).get(base, 0)
+                lines.append(f"{name}_{suffix}{{{base}}} {value:g}" if base else f"{name}_{suffix} {value:g}")
+
+    for name, help_text, value in gauges:
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {value:g}"]
+    return "\n".join(lines) + "\n"
+
+class StageTimings:
+    """Per-batch totals of each stage's duration, kept alongside the global metrics"""
+
+    def __init__(self):
+        self.stages = {}
+        self.lock = threading.Lock()
+
+    def add(self, stage, seconds):
+        with self.lock:
+            count, total, longest = self.stages.get(stage, (0, 0.0, 0.0))
+            self.stages[stage] = (count + 1, total + seconds, max(longest, seconds))
+
+    def to_dict(self):
+        with self.lock:
+            return {stage: list(values) for stage, values in self.stages.items()}
+
+    @classmethod
+    def from_dict(cls, data):
+        timings = cls()
+        timings.stages = {stage: tuple(values) for stage, values in (data or {}).items()}
+        return timings
+
+    def summary(self):
+        """e.g. "extract 6× avg 40 ms (max 90 ms) · api 6× avg 1.2 s (max 2.0 s)" """
+        def duration(seconds):
+            return f"{seconds * 1000:.0f} ms" if seconds < 1 else f"{seconds:.1f} s"
+
+        with self.lock:
+            return " · ".join(
+                f"{stage} {count}× avg {duration(total / count)} (max {duration(longest)})"
+                for stage, (count, total, longest) in self.stages.items() if count
+            )
+
+def record_stage(stage, seconds, timings=None):
+    """Record a stage duration in the global histogram and, if given, a batch's timings"""
+    observe("resume_stage_seconds", seconds, stage=stage)
+    if timings is not None:
+        timings.add(stage, seconds)
+
+@contextmanager
+def stage_timer(stage, timings=None):
+    """Time the enclosed block as one observation of `stage`"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - started, timings)
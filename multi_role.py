@@ -0,0 +1,248 @@
+"""Score each resume against several open roles at once.
+
+One request per resume covers a group of roles: the resume text, the
+candidate's details and the system prompt are paid for once per group
+instead of once per role, and the roles prefix is prompt-cached across
+the batch. Results are one row per resume and role (the usual result
+columns plus Job Title), which score_matrix pivots into a resume x role table.
+"""
+import json
+import os
+import time
+
+from analyzer import (ANALYSIS_FIELDS, ANALYSIS_MAX_ATTEMPTS, ANALYSIS_ROUTE, ANALYSIS_TOOL, CLAUDE_MODEL, RESULT_CACHE,
+                      RESULT_COLUMNS, AnalysisValidationError, api_error_result, cascade_analysis, file_error_result,
+                      find_tool_input, needs_escalation, resume_tokens_label, validate_job_requirements, validate_match)
+from extraction import file_path, is_extraction_error, wait_for_extraction
+from metrics import record_stage
+from result_cache import make_key
+from token_budget import RESUME_TOKEN_BUDGET, fit_to_budget
+
+# Bump whenever the multi-role prompt or its parsing changes
+MULTI_ROLE_PROMPT_VERSION = 2
+
+MAX_ROLES = int(os.getenv('MAX_ROLES', 10))
+# Roles scored in one request; more roles are split over several requests per resume
+ROLES_PER_REQUEST = int(os.getenv('ROLES_PER_REQUEST', 5))
+
+MULTI_ROLE_COLUMNS = ["File Name", "Job Title"] + RESULT_COLUMNS[1:]
+
+CANDIDATE_FIELDS = ["candidate_name", "email", "phone", "current_company", "current_designation", "total_experience"]
+MATCH_FIELDS = ["match_score", "recommendation", "reason"]
+
+def validate_roles(roles):
+    """Return an error message for a list of role dicts, or None if they are valid"""
+    if not roles:
+        return "Please define at least one role"
+    if len(roles) > MAX_ROLES:
+        return f"At most {MAX_ROLES} roles can be matched at once"
+
+    titles = set()
+    for number, role in enumerate(roles, 1):
+        error_message = validate_job_requirements(role["job_title"], role["important_duties"], role["considerable_duties"])
+        if error_message:
+            return f"Role {number}: {error_message}"
+        # Titles become matrix columns, so they must tell the roles apart
+        title = role["job_title"].strip().lower()
+        if title in titles:
+            return f"Role {number}: job title \"{role['job_title']}\" is used more than once"
+        titles.add(title)
+    return None
+
+def role_groups(roles):
+    return [roles[start:start + ROLES_PER_REQUEST] for start in range(0, len(roles), max(1, ROLES_PER_REQUEST))]
+
+def build_roles_prefix(roles):
+    """Everything except the resume, for one group of roles; identical across a batch so it can be prompt-cached"""
+    role_sections = "\n\n".join(
+        f"""ROLE {number}: {role['job_title']}
+
+IMPORTANT DUTIES CANDIDATE SHOULD HANDLE:
+{role['important_duties']}
+
+CONSIDERABLE DUTIES CANDIDATE SHOULD HANDLE:
+{role['considerable_duties']}"""
+        for number, role in enumerate(roles, 1)
+    )
+    return f"""You are an expert HR analyst. Please analyze the candidate's resume in the user message against each of the {len(roles)} open roles below and extract specific information.
+
+{role_sections}
+
+ANALYSIS INSTRUCTIONS:
+1. Extract candidate's personal and professional information once
+2. Identify candidate's CURRENT job duties and responsibilities from their resume
+3. For CURRENT_COMPANY and CURRENT_DESIGNATION, look for:
+   - Jobs with "Present", "Current", or the current year (2024/2025) as end date
+   - The most recent position that is still ongoing
+   - If multiple current positions, choose the primary/main one
+4. For EACH role, compare candidate's CURRENT job duties with that role's Important Duties and Considerable Duties
+5. Apply the following matching logic to each role separately:
+   - If candidate's CURRENT duties closely match the role's Important Duties → "GOOD MATCH"
+   - If candidate's CURRENT duties closely match the role's Considerable Duties → "CONSIDERABLE MATCH"
+   - If candidate's CURRENT duties don't match either → "REJECT"
+
+IMPORTANT: Pay special attention to date ranges. "2024-Present", "2024-Current", or similar patterns indicate the CURRENT position.
+
+Record your analysis by calling the record_role_matches tool, with exactly one entry per role in the roles list, identified by its ROLE number. Base each MATCH_SCORE, RECOMMENDATION and REASON on the candidate's CURRENT role duties.
+
+If any information is not available in the resume, write "Not Available" for that field."""
+
+def build_roles_tool(role_count):
+    properties = ANALYSIS_TOOL["input_schema"]["properties"]
+    return {
+        "name": "record_role_matches",
+        "description": "Record one candidate's details and how well they match each open role.",
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                **{field: properties[field] for field in CANDIDATE_FIELDS},
+                "roles": {
+                    "type": "array",
+                    "minItems": role_count,
+                    "maxItems": role_count,
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "role": {"type": "integer", "minimum": 1, "maximum": role_count, "description": "ROLE number from the prompt"},
+                            **{field: properties[field] for field in MATCH_FIELDS}
+                        },
+                        "required": ["role"] + MATCH_FIELDS
+                    }
+                }
+            },
+            "required": CANDIDATE_FIELDS + ["roles"]
+        }
+    }
+
+def build_roles_request_params(resume_text, roles, model=CLAUDE_MODEL):
+    """Messages API parameters scoring one resume against a group of roles"""
+    tool = build_roles_tool(len(roles))
+    return {
+        "model": model,
+        # Candidate details once, then a score and one-sentence reason per role
+        "max_tokens": 512 + 200 * len(roles),
+        "tools": [tool],
+        "tool_choice": {"type": "tool", "name": tool["name"]},
+        "system": [{
+            "type": "text",
+            "text": build_roles_prefix(roles),
+            "cache_control": {"type": "ephemeral"}
+        }],
+        "messages": [{"role": "user", "content": f"CANDIDATE RESUME:\n{resume_text}"}]
+    }
+
+def parse_roles_message(message, filename, roles):
+    """Validate a record_role_matches call and turn it into one results row per role, in role order"""
+    tool_input = find_tool_input(message, "record_role_matches")
+    if not isinstance(tool_input, dict):
+        raise AnalysisValidationError("reply did not call record_role_matches")
+
+    missing = [field for field in CANDIDATE_FIELDS + ["roles"] if field not in tool_input]
+    if missing:
+        raise AnalysisValidationError(f"missing fields: {', '.join(missing)}")
+
+    numbers = [str(number) for number in range(1, len(roles) + 1)]
+    matches = {}
+    for entry in tool_input["roles"] if isinstance(tool_input["roles"], list) else []:
+        if not isinstance(entry, dict) or any(field not in entry for field in ["role"] + MATCH_FIELDS):
+            raise AnalysisValidationError(f"incomplete role entry {entry!r}")
+        number = str(entry["role"]).strip()
+        # A second or unknown entry means the model lost track of which role it was scoring
+        if number not in numbers:
+            raise AnalysisValidationError(f"unknown role {entry['role']!r}")
+        if number in matches:
+            raise AnalysisValidationError(f"role {number} recorded more than once")
+        matches[number] = entry
+    missing_roles = [number for number in numbers if number not in matches]
+    if missing_roles:
+        raise AnalysisValidationError(f"no match recorded for role(s) {', '.join(missing_roles)}")
+
+    candidate = {ANALYSIS_FIELDS[field]: str(tool_input[field]).strip() or "Not Available" for field in CANDIDATE_FIELDS}
+    rows = []
+    for number, role in enumerate(roles, 1):
+        entry = matches[str(number)]
+        score, recommendation = validate_match(entry)
+        rows.append({
+            **candidate,
+            "File Name": filename,
+            "Job Title": role["job_title"],
+            "Match Score": score,
+            "Recommendation": recommendation,
+            "Reason": str(entry["reason"]).strip() or "Not Available",
+            "Model": message.model
+        })
+    return rows
+
+def role_rows(row, roles):
+    """Copy a per-file row (file error, API error, pre-screen reject) once for every role"""
+    return [{**row, "Job Title": role["job_title"]} for role in roles]
+
+def roles_cache_key(resume_text, roles):
+    return make_key(resume_text, json.dumps(roles, sort_keys=True), ANALYSIS_ROUTE, MULTI_ROLE_PROMPT_VERSION)
+
+def analyze_resume_roles(client, resume_file, extraction, roles, rate_limiter=None, usage=None, breaker=None, timings=None):
+    """One resume against every role: a list of rows in role order"""
+    filename = os.path.basename(file_path(resume_file))
+    resume_text = wait_for_extraction(extraction, file_path(resume_file))
+    started = time.perf_counter()
+
+    if is_extraction_error(resume_text):
+        return role_rows(file_error_result(filename, resume_text), roles)
+
+    resume_text, original_tokens, tokens = fit_to_budget(resume_text, RESUME_TOKEN_BUDGET)
+
+    rows = []
+    for group in role_groups(roles):
+        cache_key = roles_cache_key(resume_text, group)
+        cached = RESULT_CACHE.get(cache_key)
+        if cached is not None:
+            rows += [{**row, "File Name": filename} for row in cached]
+            continue
+
+        if usage:
+            usage.add_resume_tokens(original_tokens, tokens)
+        try:
+            # With a fast model configured, the group is escalated when its best score is borderline:
+            # a clear reject for every role, or a clear fit for one, is settled by the fast model
+            group_rows = cascade_analysis(
+                client,
+                lambda model: build_roles_request_params(resume_text, group, model),
+                lambda message: parse_roles_message(message, filename, group),
+                lambda rows: needs_escalation(max(row["Match Score"] for row in rows)),
+                rate_limiter, usage, breaker, timings
+            )
+        except AnalysisValidationError as e:
+            rows += role_rows(api_error_result(filename, f"Invalid analysis response after {ANALYSIS_MAX_ATTEMPTS} attempt(s): {e}"), group)
+            continue
+        except Exception as e:
+            rows += role_rows(api_error_result(filename, str(e)), group)
+            continue
+
+        RESULT_CACHE.put(cache_key, group_rows)
+        rows += group_rows
+
+    for row in rows:
+        row["Resume Tokens"] = resume_tokens_label(original_tokens, tokens)
+    record_stage("analysis", time.perf_counter() - started, timings)
+    return rows
+
+def score_matrix(rows, roles):
+    """Pivot per-role rows into one row per resume: its details, a score column per role and the best role"""
+    matrix = {}
+    for row in rows:
+        entry = matrix.setdefault(row["File Name"], {
+            "File Name": row["File Name"],
+            "Name": row["Name"],
+            "Current Designation": row["Current Designation"],
+            **{role["job_title"]: "N/A" for role in roles},
+            "Best Role": "N/A"
+        })
+        entry[row["Job Title"]] = row["Match Score"]
+
+    for entry in matrix.values():
+        scores = {role["job_title"]: entry[role["job_title"]] for role in roles
+                  if isinstance(entry[role["job_title"]], int)}
+        if scores:
+            best = max(scores.values())
+            entry["Best Role"] = " / ".join(title for title, score in scores.items() if score == best)
+    return list(matrix.values())
@@ -0,0 +1,89 @@
+import os
+import re
+import zlib
+
+import numpy as np
+
+# Resumes scoring below this similarity are rejected without an API call (0 disables pre-screening)
+PRESCREEN_MIN_SCORE = float(os.getenv('PRESCREEN_MIN_SCORE', 0))
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9][a-z0-9+#]+")
+
+# Terms are hashed into a fixed number of buckets so no Python-level vocabulary is needed.
+# crc32 rather than hash(), which is salted per process, so scores repeat across runs
+N_FEATURES = 1 << 20
+
+STOP_WORDS = frozenset("""
+a an and are as at be by for from has have in is it its of on or that the their this to was were will with
+you your our we they he she his her i me my us able also any all etc per via into over under about across
+""".split())
+
+def term_hash(term):
+    return zlib.crc32(term.encode())
+
+_STOP_IDS = np.array([term_hash(word) for word in STOP_WORDS], dtype=np.int64) % N_FEATURES
+
+def term_ids(text):
+    """Hashed term ids for a text, stop words removed"""
+    ids = np.fromiter(map(term_hash, TOKEN_PATTERN.findall(text.lower())), dtype=np.int64) % N_FEATURES
+    return ids[~np.isin(ids, _STOP_IDS)]
+
+def similarity_scores(resume_texts, *duty_texts):
+    """TF-IDF cosine similarity of each resume to the duties, as a float array in [0, 1]
+
+    Each resume is scored against every duty list and keeps the best of them.
+    IDF comes from the duty lists alone, so a resume scores the same whatever it
+    was uploaded with. All term weighting runs as flat numpy array operations.
+    """
+    if not resume_texts:
+        return np.zeros(0)
+
+    n_resumes = len(resume_texts)
+    documents = [term_ids(text) for text in resume_texts]
+    documents += [term_ids(duties) for duties in duty_texts]
+    n_docs = len(documents)
+
+    lengths = np.array([len(ids) for ids in documents])
+    if not lengths.any():
+        return np.zeros(n_resumes)
+
+    # Unique (document, term) pairs with their counts
+    keys = np.repeat(np.arange(n_docs, dtype=np.int64), lengths) * N_FEATURES + np.concatenate(documents)
+    pairs, counts = np.unique(keys, return_counts=True)
+    pair_docs = pairs // N_FEATURES
+    pair_terms = pairs % N_FEATURES
+
+    # Smoothed IDF over the duty lists only, sublinear TF
+    is_resume = pair_docs < n_resumes
+    document_frequency = np.bincount(pair_terms[~is_resume], minlength=N_FEATURES)
+    idf = np.log((1 + len(duty_texts)) / (1 + document_frequency[pair_terms])) + 1
+    weights = (1 + np.log(counts)) * idf
+
+    norms = np.sqrt(np.bincount(pair_docs, weights=weights ** 2, minlength=n_docs))
+    norms[norms == 0] = 1
+    weights = weights / norms[pair_docs]
+
+    best = np.zeros(n_resumes)
+    for query_doc in range(n_resumes, n_docs):
+        query = np.zeros(N_FEATURES)
+        in_query = pair_docs == query_doc
+        query[pair_terms[in_query]] = weights[in_query]
+        scores = np.bincount(
+            pair_docs[is_resume],
+            weights=weights[is_resume] * query[pair_terms[is_resume]],
+            minlength=n_resumes
+        )
+        best = np.maximum(best, scores)
+
+    return best
+
+def rank_by_similarity(resume_texts, important_duties, considerable_duties, min_score=PRESCREEN_MIN_SCORE):
+    """Return (scores, passed) where passed lists the indexes at or above min_score, best first
+
+    The duties may also be lists, one entry per role, to pass resumes that fit any of them.
+    """
+    duty_texts = [duties for value in (important_duties, considerable_duties)
+                  for duties in ([value] if isinstance(value, str) else value)]
+    scores = similarity_scores(resume_texts, *duty_texts)
+    order = np.argsort(-scores, kind='stable')
+    return scores, [int(index) for index in order if scores[index] >= min_score]
@@ -0,0 +1,126 @@
+import os
+import random
+import threading
+import time
+
+# Retry policy for transient API failures (429, 5xx/529 overloaded, timeouts, dropped connections)
+RETRY_MAX_ATTEMPTS = int(os.getenv('RETRY_MAX_ATTEMPTS', 4))
+RETRY_BASE_DELAY = float(os.getenv('RETRY_BASE_DELAY', 1))
+RETRY_MAX_DELAY = float(os.getenv('RETRY_MAX_DELAY', 30))
+REQUEST_TIMEOUT = float(os.getenv('REQUEST_TIMEOUT', 60))
+
+# Consecutive overload errors that trip the breaker, and how long it then pauses every worker
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', 3))
+CIRCUIT_COOLDOWN = float(os.getenv('CIRCUIT_COOLDOWN', 30))
+
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504, 529}
+OVERLOAD_STATUS_CODES = {429, 529}
+
+def error_headers(error):
+    return getattr(getattr(error, 'response', None), 'headers', None)
+
+def is_retryable(error):
+    import anthropic
+
+    if isinstance(error, (anthropic.APITimeoutError, anthropic.APIConnectionError)):
+        return True
+    return getattr(error, 'status_code', None) in RETRYABLE_STATUS_CODES
+
+def is_api_error(error):
+    """Whether an exception came from the API (after retries) rather than from our own code"""
+    import anthropic
+
+    return isinstance(error, anthropic.APIError)
+
+def is_overloaded(error):
+    return getattr(error, 'status_code', None) in OVERLOAD_STATUS_CODES
+
+def retry_after_seconds(headers):
+    """Server-requested wait from retry-after-ms / retry-after, or None"""
+    if not headers:
+        return None
+
+    for name, scale in (('retry-after-ms', 0.001), ('retry-after', 1)):
+        value = headers.get(name)
+        if value:
+            try:
+                return max(0.0, float(value) * scale)
+            except ValueError:
+                pass
+    return None
+
+def retry_delay(attempt, error):
+    """Honor the server's retry-after, otherwise full-jitter exponential backoff"""
+    retry_after = retry_after_seconds(error_headers(error))
+    if retry_after is not None:
+        return min(retry_after, RETRY_MAX_DELAY)
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (attempt - 1)))
+
+class CircuitBreaker:
+    """Shared by a batch's workers: repeated overload errors pause all of them at once"""
+
+    def __init__(self, failure_threshold=CIRCUIT_FAILURE_THRESHOLD, cooldown=CIRCUIT_COOLDOWN):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.open_until = 0.0
+        self.trips = 0
+        self.lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        return time.monotonic() < self.open_until
+
+    def wait(self):
+        """Block while the breaker is open"""
+        while True:
+            with self.lock:
+                remaining = self.open_until - time.monotonic()
+            if remaining <= 0:
+                return
+            time.sleep(remaining)
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+
+    def record_failure(self, error):
+        if not is_overloaded(error):
+            return
+
+        with self.lock:
+            self.failures += 1
+            if self.failures < self.failure_threshold:
+                return
+
+            # Trip: every worker waits out the cooldown (or the server's retry-after if longer)
+            pause = max(self.cooldown, retry_after_seconds(error_headers(error)) or 0)
+            self.open_until = max(self.open_until, time.monotonic() + pause)
+            self.failures = 0
+            self.trips += 1
+
+def call_with_retries(request, rate_limiter=None, breaker=None, max_attempts=RETRY_MAX_ATTEMPTS):
+    """Run request() with jittered exponential backoff on transient API errors"""
+    for attempt in range(1, max_attempts + 1):
+        if breaker:
+            breaker.wait()
+        if rate_limiter:
+            rate_limiter.acquire()
+
+        try:
+            response = request()
+        except Exception as e:
+            if rate_limiter:
+                rate_limiter.update_from_headers(error_headers(e))
+            if attempt == max_attempts or not is_retryable(e):
+                raise
+            if breaker:
+                breaker.record_failure(e)
+            time.sleep(retry_delay(attempt, e))
+            continue
+
+        if breaker:
+            breaker.record_success()
+        if rate_limiter:
+            rate_limiter.update_from_headers(response.headers)
+        return response
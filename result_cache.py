@@ -0,0 +1,160 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Seconds to wait for another process's write before giving up on a cache read or write
+CACHE_LOCK_TIMEOUT = float(os.getenv('CACHE_LOCK_TIMEOUT', 10))
+
+def make_key(*parts):
+    """Content-address a cache entry from everything that affects the analysis"""
+    digest = hashlib.sha256()
+    for part in parts:
+        encoded = str(part).encode('utf-8')
+        # Length prefix so ("ab", "c") and ("a", "bc") hash differently
+        digest.update(len(encoded).to_bytes(8, 'big'))
+        digest.update(encoded)
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """SQLite-backed key/value store with size-based LRU eviction
+
+    The file is shared by the app, queue workers and the CLI. A cache that stays locked
+    or fails is never fatal: lookups count as misses and writes are skipped.
+    """
+
+    def __init__(self, path, max_bytes, timeout=CACHE_LOCK_TIMEOUT):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.conn = None
+
+        if not self.enabled:
+            return
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.conn = sqlite3.connect(path, timeout=timeout, check_same_thread=False)
+        # WAL so lookups in one process are not blocked by another process's writes
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)")
+        # Hit/miss totals across every process sharing the file (the app, queue workers, the CLI)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self.conn.commit()
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def get(self, key):
+        if not self.enabled:
+            return None
+
+        with self.lock:
+            try:
+                row = self.conn.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+            except sqlite3.Error:
+                row = None
+            if row is None:
+                self.misses += 1
+                self._write(lambda: self._count("misses"))
+                return None
+
+            # The LRU touch and the shared counters are bookkeeping: the hit stands even if they fail
+            self._write(lambda: (
+                self.conn.execute("UPDATE entries SET last_used = ? WHERE key = ?", (time.time(), key)),
+                self._count("hits")
+            ))
+            self.hits += 1
+            return json.loads(row[0])
+
+    def put(self, key, value):
+        if not self.enabled:
+            return
+
+        encoded = json.dumps(value)
+
+        def insert():
+            self.conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, last_used) VALUES (?, ?, ?, ?)",
+                (key, encoded, len(encoded), time.time())
+            )
+            self._evict()
+
+        with self.lock:
+            self._write(insert)
+
+    def _write(self, statements):
+        """Run statements() and commit, or roll back and return False if the database is locked or broken"""
+        try:
+            statements()
+            self.conn.commit()
+            return True
+        except sqlite3.Error:
+            try:
+                self.conn.rollback()
+            except sqlite3.Error:
+                pass
+            return False
+
+    def _count(self, name):
+        self.conn.execute(
+            "INSERT INTO counters (name, value) VALUES (?, 1) ON CONFLICT(name) DO UPDATE SET value = value + 1",
+            (name,)
+        )
+
+    def _evict(self):
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        # Walk from least recently used until we are back under the limit
+        stale = []
+        for key, size in self.conn.execute("SELECT key, size FROM entries ORDER BY last_used"):
+            if total <= self.max_bytes:
+                break
+            stale.append((key,))
+            total -= size
+        self.conn.executemany("DELETE FROM entries WHERE key = ?", stale)
+
+    def clear(self):
+        if not self.enabled:
+            return
+
+        with self.lock:
+            self._write(lambda: self.conn.execute("DELETE FROM entries"))
+
+    def stats(self):
+        """hits/misses count this process's lookups; total_hits/total_misses every process's"""
+        entries, size, counters = 0, 0, {}
+        if self.enabled:
+            with self.lock:
+                entries, size = self.conn.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+                ).fetchone()
+                counters = dict(self.conn.execute("SELECT name, value FROM counters").fetchall())
+
+        lookups = self.hits + self.misses
+        total_hits = counters.get("hits", 0)
+        total_lookups = total_hits + counters.get("misses", 0)
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "total_hits": total_hits,
+            "total_misses": total_lookups - total_hits,
+            "total_hit_rate": total_hits / total_lookups if total_lookups else 0.0,
+            "entries": entries,
+            "size_bytes": size,
+        }
@@ -0,0 +1,195 @@
+"""Score a folder of resumes from the command line, without the Gradio UI.
+
+    python -m score_resumes applicants/ --job job.yaml --concurrency 8 --output results.csv
+
+The job spec is a JSON or YAML file with job_title, important_duties and
+considerable_duties (each duty field may be a string or a list of strings).
+To match against several open roles at once, give a "roles" list of such
+objects instead; each resume is then scored against every role and the
+output has one row per resume and role (add --matrix for a resume x role table).
+Rows are written as each resume finishes; .jsonl outputs get one JSON object per line.
+"""
+import argparse
+import csv
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from analyzer import (MAX_CONCURRENT_REQUESTS, REQUESTS_PER_MINUTE, RESULT_CACHE, RESULT_COLUMNS, RateLimiter,
+                      UsageStats, analyze_resume_file, prescreen_resume_files, validate_job_requirements)
+from extraction import EXTRACTION_CACHE, submit_extraction
+from metrics import StageTimings
+from multi_role import MULTI_ROLE_COLUMNS, analyze_resume_roles, role_rows, score_matrix, validate_roles
+from prescreen import PRESCREEN_MIN_SCORE
+from resilience import CircuitBreaker
+
+SUPPORTED_EXTENSIONS = ('.pdf', '.docx', '.txt')
+
+
+def find_resumes(inputs):
+    """Expand directories (recursively) and glob patterns into a sorted, de-duplicated file list"""
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, files in os.walk(item):
+                paths.extend(os.path.join(root, name) for name in files
+                             if name.lower().endswith(SUPPORTED_EXTENSIONS))
+        elif glob.has_magic(item):
+            paths.extend(path for path in glob.glob(item, recursive=True) if os.path.isfile(path))
+        else:
+            paths.append(item)
+    return sorted(dict.fromkeys(os.path.normpath(path) for path in paths))
+
+
+def load_job_spec(path):
+    """List of roles (job_title, important_duties, considerable_duties dicts), several if the spec has a roles list"""
+    with open(path, encoding='utf-8') as f:
+        if path.lower().endswith(('.yaml', '.yml')):
+            try:
+                import yaml
+            except ImportError:
+                raise SystemExit("PyYAML is required for YAML job specs (pip install pyyaml), or use JSON")
+            spec = yaml.safe_load(f)
+        else:
+            spec = json.load(f)
+
+    def field(role, name):
+        value = role.get(name) or ""
+        if isinstance(value, list):
+            value = "\n".join(f"- {item}" for item in value)
+        return str(value)
+
+    return [{name: field(role, name) for name in ("job_title", "important_duties", "considerable_duties")}
+            for role in spec.get("roles") or [spec]]
+
+
+def make_row_writer(stream, output_format, columns=RESULT_COLUMNS):
+    if output_format == 'jsonl':
+        def write(row):
+            stream.write(json.dumps(row, ensure_ascii=False) + "\n")
+            stream.flush()
+    else:
+        writer = csv.DictWriter(stream, fieldnames=columns, extrasaction='ignore')
+        writer.writeheader()
+
+        def write(row):
+            writer.writerow(row)
+            stream.flush()
+    return write
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m score_resumes",
+        description="Analyze resumes against a job spec and stream the results to CSV or JSONL."
+    )
+    parser.add_argument("inputs", nargs="+", help="Resume files, directories or glob patterns")
+    parser.add_argument("--job", required=True, help="Job spec file (JSON or YAML)")
+    parser.add_argument("--concurrency", type=int, default=MAX_CONCURRENT_REQUESTS,
+                        help=f"Resumes analyzed in parallel (default {MAX_CONCURRENT_REQUESTS})")
+    parser.add_argument("--prescreen-min-score", type=float, default=PRESCREEN_MIN_SCORE,
+                        help="Reject resumes below this keyword similarity without an API call (default %(default)s, 0 = off)")
+    parser.add_argument("--output", default="-", help="Output file, or - for stdout (default)")
+    parser.add_argument("--format", choices=["csv", "jsonl"],
+                        help="Output format (default: jsonl for .jsonl outputs, otherwise csv)")
+    parser.add_argument("--matrix", help="With a multi-role spec, also write a resume x role score matrix to this CSV file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    api_key = os.getenv('ANTHROPIC_API_KEY')
+    if not api_key:
+        raise SystemExit("ANTHROPIC_API_KEY is not set")
+
+    roles = load_job_spec(args.job)
+    multi_role = len(roles) > 1
+    if multi_role:
+        error_message = validate_roles(roles)
+    else:
+        job_title, important_duties, considerable_duties = roles[0].values()
+        error_message = validate_job_requirements(job_title, important_duties, considerable_duties)
+    if error_message:
+        raise SystemExit(f"Invalid job spec {args.job}: {error_message}")
+
+    resume_paths = find_resumes(args.inputs)
+    if not resume_paths:
+        raise SystemExit("No resume files found")
+
+    output_format = args.format or ('jsonl' if args.output.lower().endswith('.jsonl') else 'csv')
+    started = time.monotonic()
+
+    # Start parsing before importing the SDK so the two overlap
+    timings = StageTimings()
+    extractions = [submit_extraction(path, timings) for path in resume_paths]
+
+    import anthropic
+    client = anthropic.Anthropic(api_key=api_key)
+    rate_limiter = RateLimiter(REQUESTS_PER_MINUTE)
+    breaker = CircuitBreaker()
+    usage = UsageStats()
+
+    if multi_role:
+        # A resume passes the pre-screen if it is close enough to any one role
+        important_duties = [role["important_duties"] for role in roles]
+        considerable_duties = [role["considerable_duties"] for role in roles]
+    rejected, order = prescreen_resume_files(resume_paths, extractions, important_duties, considerable_duties, args.prescreen_min_score, timings)
+
+    matrix_rows = []
+    stream = sys.stdout if args.output == "-" else open(args.output, 'w', newline='', encoding='utf-8')
+    try:
+        write_row = make_row_writer(stream, output_format, MULTI_ROLE_COLUMNS if multi_role else RESULT_COLUMNS)
+
+        def write_rows(rows):
+            for row in rows:
+                write_row(row)
+            if args.matrix:
+                matrix_rows.extend(rows)
+
+        for row in rejected.values():
+            write_rows(role_rows(row, roles) if multi_role else [row])
+
+        with ThreadPoolExecutor(max_workers=max(1, args.concurrency)) as executor:
+            if multi_role:
+                futures = [
+                    executor.submit(analyze_resume_roles, client, resume_paths[index], extractions[index], roles, rate_limiter, usage, breaker, timings)
+                    for index in order
+                ]
+            else:
+                futures = [
+                    executor.submit(analyze_resume_file, client, resume_paths[index], extractions[index], job_title, important_duties, considerable_duties, rate_limiter, usage, breaker, timings)
+                    for index in order
+                ]
+            for future in as_completed(futures):
+                write_rows(future.result() if multi_role else [future.result()])
+    finally:
+        if stream is not sys.stdout:
+            stream.close()
+
+    if multi_role and args.matrix:
+        with open(args.matrix, 'w', newline='', encoding='utf-8') as f:
+            columns = ["File Name", "Name", "Current Designation", *(role["job_title"] for role in roles), "Best Role"]
+            writer = csv.DictWriter(f, fieldnames=columns)
+            writer.writeheader()
+            writer.writerows(score_matrix(matrix_rows, roles))
+
+    elapsed = time.monotonic() - started
+    against = f" against {len(roles)} roles" if multi_role else ""
+    print(f"Scored {len(resume_paths)} resume(s){against} in {elapsed:.1f}s ({len(rejected)} rejected by pre-screen)", file=sys.stderr)
+    if usage.requests:
+        print(usage.summary(), file=sys.stderr)
+    print(f"Timing: {timings.summary()}", file=sys.stderr)
+    if breaker.trips:
+        print(f"Circuit breaker paused all workers {breaker.trips} time(s) because the API was overloaded", file=sys.stderr)
+    for label, cache in (("Result cache", RESULT_CACHE), ("Text cache", EXTRACTION_CACHE)):
+        if cache.enabled:
+            stats = cache.stats()
+            print(f"{label}: {stats['hits']} hits, {stats['misses']} misses", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
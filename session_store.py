@@ -0,0 +1,97 @@
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+# Rows kept in memory per session before they spill to SQLite
+SESSION_MEMORY_ROWS = int(os.getenv('SESSION_MEMORY_ROWS', 500))
+# Sessions idle for longer than this are dropped (seconds)
+SESSION_TTL = float(os.getenv('SESSION_TTL', 4 * 60 * 60))
+SESSION_SPILL_DIR = os.getenv('SESSION_SPILL_DIR', os.path.join(tempfile.gettempdir(), 'resume_sessions'))
+
+class SessionResults:
+    """Append-only result rows for one browser session, in memory until they outgrow SESSION_MEMORY_ROWS"""
+
+    def __init__(self, session_id, memory_rows=SESSION_MEMORY_ROWS):
+        self.session_id = session_id
+        self.memory_rows = memory_rows
+        self.rows = []
+        self.conn = None
+        self.spill_path = None
+        self.spilled = 0
+        self.loaded_jobs = set()
+        self.last_used = time.time()
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return self.spilled + len(self.rows)
+
+    def _spill(self):
+        if self.conn is None:
+            os.makedirs(SESSION_SPILL_DIR, exist_ok=True)
+            self.spill_path = os.path.join(SESSION_SPILL_DIR, f"{self.session_id}.sqlite3")
+            self.conn = sqlite3.connect(self.spill_path, check_same_thread=False)
+            self.conn.execute("CREATE TABLE IF NOT EXISTS rows (id INTEGER PRIMARY KEY, data TEXT NOT NULL)")
+
+        self.conn.executemany("INSERT INTO rows (data) VALUES (?)", [(json.dumps(row),) for row in self.rows])
+        self.conn.commit()
+        self.spilled += len(self.rows)
+        self.rows = []
+
+    def append(self, rows):
+        with self.lock:
+            self.rows.extend(rows)
+            if self.conn is not None or len(self.rows) > self.memory_rows:
+                self._spill()
+
+    def slice(self, start, stop):
+        """Rows [start, stop) in insertion order"""
+        with self.lock:
+            rows = []
+            if start < self.spilled:
+                cursor = self.conn.execute(
+                    "SELECT data FROM rows ORDER BY id LIMIT ? OFFSET ?",
+                    (min(stop, self.spilled) - start, start)
+                )
+                rows.extend(json.loads(data) for data, in cursor)
+            if stop > self.spilled:
+                rows.extend(self.rows[max(start - self.spilled, 0):stop - self.spilled])
+            return rows
+
+    def all_rows(self):
+        return self.slice(0, len(self))
+
+    def clear(self):
+        with self.lock:
+            self.rows = []
+            self.spilled = 0
+            self.loaded_jobs = set()
+            self._close()
+
+    def _close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+            os.remove(self.spill_path)
+
+class SessionRegistry:
+    def __init__(self, ttl=SESSION_TTL):
+        self.ttl = ttl
+        self.sessions = {}
+        self.lock = threading.Lock()
+
+    def get(self, session_id):
+        now = time.time()
+        with self.lock:
+            for stale_id, session in list(self.sessions.items()):
+                if now - session.last_used > self.ttl:
+                    session.clear()
+                    del self.sessions[stale_id]
+
+            session = self.sessions.get(session_id)
+            if session is None:
+                session = self.sessions[session_id] = SessionResults(session_id)
+            session.last_used = now
+            return session
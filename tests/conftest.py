@@ -0,0 +1,40 @@
+import os
+import sys
+import tempfile
+
+# The modules read their settings at import time: keep tests away from the real
+# .cache directory and turn off persistent caches and metrics before importing them
+_tmp = tempfile.mkdtemp(prefix="resume_tests_")
+os.environ.update({
+    "METRICS_PATH": "",
+    "RESULT_CACHE_MAX_MB": "0",
+    "EXTRACTION_CACHE_MAX_MB": "0",
+    "JOB_QUEUE_PATH": os.path.join(_tmp, "job_queue.sqlite3"),
+    "JOB_FILES_DIR": os.path.join(_tmp, "job_files"),
+    "BATCH_JOBS_DIR": os.path.join(_tmp, "batch_jobs"),
+    "SESSION_SPILL_DIR": os.path.join(_tmp, "sessions"),
+})
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+
+@pytest.fixture
+def fake_api():
+    """Factory: start a fake Anthropic server with the given options and return (server, client)"""
+    import anthropic
+    import fake_anthropic
+
+    servers = []
+
+    def start(**options):
+        server, base_url = fake_anthropic.start_server(**options)
+        servers.append(server)
+        # The SDK's own retries are off so the code under test does all the retrying
+        return server, anthropic.Anthropic(api_key="test", base_url=base_url, max_retries=0)
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
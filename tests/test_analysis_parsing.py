@@ -0,0 +1,81 @@
+from types import SimpleNamespace
+
+import pytest
+
+import fake_anthropic
+from analyzer import (ANALYSIS_MAX_ATTEMPTS, AnalysisValidationError, UsageStats, analyze_single_resume,
+                      parse_analysis_message)
+
+JOB = ("Backend Engineer", "Design and run Python services on AWS", "Mentor engineers and review code")
+RESUME = "Ada Example\nada@example.com\nEngineer, Foo\n2020 - Present"
+
+
+def tool_message(tool_input, name="record_analysis"):
+    return SimpleNamespace(model="claude-test", content=[
+        SimpleNamespace(type="text", text="Here is the analysis."),
+        SimpleNamespace(type="tool_use", name=name, input=tool_input),
+    ])
+
+
+def valid_input(**overrides):
+    return {"candidate_name": "Ada Example", "email": "ada@example.com", "phone": "", "current_company": "Foo",
+            "current_designation": "Engineer", "total_experience": "5 years", "match_score": 8,
+            "recommendation": "GOOD MATCH", "reason": "Runs Python services on AWS.", **overrides}
+
+
+def test_valid_reply_becomes_a_row():
+    row = parse_analysis_message(tool_message(valid_input()), "ada.txt")
+    assert row["Name"] == "Ada Example"
+    assert row["Match Score"] == 8
+    assert row["Recommendation"] == "GOOD MATCH"
+    assert row["Phone"] == "Not Available"
+    assert row["File Name"] == "ada.txt"
+    assert row["Model"] == "claude-test"
+
+
+def test_score_and_recommendation_are_normalized():
+    row = parse_analysis_message(tool_message(valid_input(match_score="5", recommendation=" considerable match ")), "ada.txt")
+    assert row["Match Score"] == 5
+    assert row["Recommendation"] == "CONSIDERABLE MATCH"
+
+
+@pytest.mark.parametrize("message, error", [
+    (SimpleNamespace(model="claude-test", content=[SimpleNamespace(type="text", text="8/10, good match")]), "did not call"),
+    (tool_message(valid_input(), name="other_tool"), "did not call"),
+    (tool_message({key: value for key, value in valid_input().items() if key != "reason"}), "missing fields: reason"),
+    (tool_message(valid_input(match_score=11)), "match_score"),
+    (tool_message(valid_input(match_score=7.5)), "match_score"),
+    (tool_message(valid_input(match_score=True)), "match_score"),
+    (tool_message(valid_input(recommendation="MAYBE")), "unknown recommendation"),
+])
+def test_invalid_replies_are_rejected(message, error):
+    with pytest.raises(AnalysisValidationError, match=error):
+        parse_analysis_message(message, "ada.txt")
+
+
+def test_invalid_reply_is_asked_for_again(fake_api, monkeypatch):
+    server, client = fake_api()
+    replies = iter([{"match_score": 0, "recommendation": "GOOD MATCH", "reason": "Out of range."}])
+    real_match = fake_anthropic.fake_match
+    monkeypatch.setattr(fake_anthropic, "fake_match", lambda seed: next(replies, None) or real_match(seed))
+    usage = UsageStats()
+
+    row = analyze_single_resume(client, RESUME, *JOB, "ada.txt", usage=usage)
+
+    assert row["Name"] == "Ada Example"
+    assert isinstance(row["Match Score"], int)
+    assert server.state.requests == 2
+    # Both replies were paid for
+    assert usage.requests == 2
+
+
+def test_reply_that_stays_invalid_becomes_an_error_row(fake_api, monkeypatch):
+    server, client = fake_api()
+    monkeypatch.setattr(fake_anthropic, "fake_match",
+                        lambda seed: {"match_score": 42, "recommendation": "GOOD MATCH", "reason": "Out of range."})
+
+    row = analyze_single_resume(client, RESUME, *JOB, "ada.txt")
+
+    assert row["Name"] == "Error"
+    assert f"Invalid analysis response after {ANALYSIS_MAX_ATTEMPTS} attempt(s)" in row["Reason"]
+    assert server.state.requests == ANALYSIS_MAX_ATTEMPTS
@@ -0,0 +1,82 @@
+import os
+import time
+
+import pytest
+
+import batch_jobs
+
+JOB = ("Backend Engineer", "Design and run Python services on AWS", "Mentor engineers and review code")
+
+
+@pytest.fixture
+def resumes(tmp_path, monkeypatch):
+    monkeypatch.setattr(batch_jobs, "BATCH_JOBS_DIR", str(tmp_path / "batch_jobs"))
+    paths = []
+    for name in ("ada", "grace", "linus"):
+        path = tmp_path / f"{name}.txt"
+        path.write_text(f"{name.title()} Example\n{name}@example.com\nEXPERIENCE\nEngineer, Foo\n2020 - Present\n- Python services on AWS")
+        paths.append(str(path))
+    return paths
+
+
+def test_submit_then_refresh_merges_results(fake_api, resumes):
+    server, client = fake_api(batch_delay=0.5)
+
+    job = batch_jobs.submit_batch_job(client, resumes, *JOB, 0, owner="browser-a")
+    assert job["status"] == "in_progress"
+    assert not batch_jobs.job_finished(job)
+    assert batch_jobs.batch_job_rows(job) == []
+
+    time.sleep(0.6)
+    job = batch_jobs.refresh_batch_job(client, batch_jobs.load_job(job["id"]))
+
+    assert batch_jobs.job_finished(job)
+    rows = batch_jobs.batch_job_rows(job)
+    assert [row["File Name"] for row in rows] == ["ada.txt", "grace.txt", "linus.txt"]
+    assert [row["Email"] for row in rows] == ["ada@example.com", "grace@example.com", "linus@example.com"]
+    assert job["usage"]["requests"] == 3
+    # Nothing went through the live Messages endpoint
+    assert server.state.requests == 0
+
+
+def test_batch_that_ends_at_once_is_merged_on_submit(fake_api, resumes):
+    _, client = fake_api(batch_delay=0)
+
+    job = batch_jobs.submit_batch_job(client, resumes, *JOB, 0)
+
+    assert batch_jobs.job_finished(job)
+    assert len(batch_jobs.batch_job_rows(job)) == 3
+    assert batch_jobs.load_job(job["id"])["entries"][0]["result"] is not None
+
+
+def test_unreadable_files_are_not_sent(fake_api, resumes, tmp_path):
+    _, client = fake_api(batch_delay=0)
+    broken = tmp_path / "broken.pdf"
+    broken.write_bytes(b"not a pdf")
+
+    job = batch_jobs.submit_batch_job(client, [resumes[0], str(broken)], *JOB, 0)
+
+    rows = batch_jobs.batch_job_rows(job)
+    assert rows[0]["Name"] == "Ada Example"
+    assert rows[1]["File Name"] == "broken.pdf"
+    assert rows[1]["Recommendation"] == "ERROR"
+
+
+def test_jobs_are_listed_only_for_their_owner(fake_api, resumes):
+    _, client = fake_api(batch_delay=0)
+    mine = batch_jobs.submit_batch_job(client, resumes[:1], *JOB, 0, owner="browser-a")
+    batch_jobs.submit_batch_job(client, resumes[:1], *JOB, 0, owner="browser-b")
+
+    assert [job["id"] for job in batch_jobs.list_jobs("browser-a")] == [mine["id"]]
+    assert batch_jobs.list_jobs("browser-c") == []
+
+
+def test_old_jobs_are_pruned(fake_api, resumes):
+    _, client = fake_api(batch_delay=0)
+    old = batch_jobs.submit_batch_job(client, resumes[:1], *JOB, 0, owner="browser-a")
+    fresh = batch_jobs.submit_batch_job(client, resumes[:1], *JOB, 0, owner="browser-a")
+    week_ago = time.time() - 8 * 24 * 60 * 60
+    os.utime(batch_jobs.job_path(old["id"]), (week_ago, week_ago))
+
+    assert batch_jobs.prune_jobs(7 * 24 * 60 * 60) == 1
+    assert [job["id"] for job in batch_jobs.list_jobs("browser-a")] == [fresh["id"]]
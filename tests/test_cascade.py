@@ -0,0 +1,88 @@
+import anthropic
+import pytest
+
+import analyzer
+import fake_anthropic
+from analyzer import UsageStats, build_request_params, cascade_analysis, needs_escalation, parse_analysis_message
+from resilience import RETRY_MAX_ATTEMPTS
+
+FAST_MODEL = "claude-3-haiku-20240307"
+JOB = ("Backend Engineer", "Design and run Python services on AWS", "Mentor engineers and review code")
+RESUME = "Ada Example\nada@example.com\nEXPERIENCE\nEngineer, Foo\n2020 - Present\n- Python services on AWS"
+
+
+@pytest.fixture
+def cascade(monkeypatch):
+    monkeypatch.setattr(analyzer, "CLAUDE_FAST_MODEL", FAST_MODEL)
+
+    def run(client, parse=None, usage=None):
+        return cascade_analysis(
+            client,
+            lambda model: build_request_params(RESUME, *JOB, model),
+            parse or (lambda message: parse_analysis_message(message, "ada.txt")),
+            lambda result: needs_escalation(result["Match Score"]),
+            usage=usage
+        )
+
+    return run
+
+
+def match(score):
+    return lambda seed: {"match_score": score, "recommendation": "GOOD MATCH", "reason": "Fixed score."}
+
+
+def test_clear_fast_result_is_kept(cascade, fake_api, monkeypatch):
+    server, client = fake_api()
+    monkeypatch.setattr(fake_anthropic, "fake_match", match(9))
+
+    row = cascade(client)
+
+    assert row["Model"] == FAST_MODEL
+    assert server.state.requests == 1
+
+
+def test_borderline_fast_result_is_escalated(cascade, fake_api, monkeypatch):
+    server, client = fake_api()
+    monkeypatch.setattr(fake_anthropic, "fake_match", match(5))
+    usage = UsageStats()
+
+    row = cascade(client, usage=usage)
+
+    assert row["Model"] == analyzer.CLAUDE_MODEL
+    assert server.state.requests == 2
+    assert usage.escalations == 1
+
+
+def test_invalid_fast_reply_is_escalated(cascade, fake_api, monkeypatch):
+    server, client = fake_api()
+    monkeypatch.setattr(fake_anthropic, "fake_match", lambda seed: {"match_score": 42, "recommendation": "GOOD MATCH", "reason": "x"})
+    replies = []
+
+    def parse(message):
+        replies.append(message.model)
+        if message.model == FAST_MODEL:
+            return parse_analysis_message(message, "ada.txt")
+        return {"Model": message.model}
+
+    assert cascade(client, parse) == {"Model": analyzer.CLAUDE_MODEL}
+    assert replies == [FAST_MODEL] * analyzer.ANALYSIS_MAX_ATTEMPTS + [analyzer.CLAUDE_MODEL]
+
+
+def test_api_errors_on_the_fast_model_are_not_escalated(cascade, fake_api):
+    server, client = fake_api(error_rate=1.0, retry_after=0)
+
+    with pytest.raises(anthropic.APIStatusError):
+        cascade(client)
+    # Only the fast model's own retries; the stronger model was never asked
+    assert server.state.requests == RETRY_MAX_ATTEMPTS
+
+
+def test_bugs_are_not_escalated(cascade, fake_api):
+    server, client = fake_api()
+
+    def parse(message):
+        raise KeyError("match_score")
+
+    with pytest.raises(KeyError):
+        cascade(client, parse)
+    assert server.state.requests == 1
@@ -0,0 +1,92 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+
+import pytest
+
+from extraction import normalize_text
+
+
+def test_repeated_header_kept_once():
+    pages = [
+        "Jane Doe | jane@example.com\nSUMMARY\nEngineer\nPage 1 of 2",
+        "Jane Doe | jane@example.com\nEXPERIENCE\nEngineer, Foo\nPage 2 of 2",
+    ]
+    text = normalize_text(pages)
+    assert text.count("Jane Doe | jane@example.com") == 1
+    assert "Page" not in text
+
+
+def test_running_header_with_page_label_is_repeated():
+    pages = [f"Jane Doe - Page {number}\nline {number}" for number in (1, 2, 3)]
+    assert normalize_text(pages).count("Jane Doe") == 1
+
+
+def test_date_lines_at_page_edges_are_kept():
+    pages = [
+        "EXPERIENCE\nLead Engineer, Baz\n2019 - Present\nSenior Engineer, Foo\n2015 - 2019",
+        "Engineer, Bar\n2012 - 2015\nEDUCATION\nBSc Computer Science",
+    ]
+    text = normalize_text(pages)
+    assert "2015 - 2019" in text
+    assert "Engineer, Bar\n2012 - 2015" in text
+
+
+def test_year_on_its_own_line_is_not_a_page_number():
+    pages = ["Senior Engineer, Foo\n2015 -\n2019", "2012\nEngineer, Bar\n- 2 -"]
+    text = normalize_text(pages)
+    assert "2019" in text
+    assert "2012" in text
+    assert "- 2 -" not in text
+
+
+def test_whitespace_collapsed():
+    assert normalize_text(["  Jane   Doe \n\n\n\tEngineer  "]) == "Jane Doe\nEngineer"
+
+
+def fake_extract(path):
+    if "hang" in path:
+        time.sleep(30)
+    return f"text of {os.path.basename(path)}"
+
+
+@pytest.fixture
+def one_worker_pool(monkeypatch):
+    import extraction
+    extraction.shutdown_extraction_pool()
+    monkeypatch.setattr(extraction, "EXTRACTION_WORKERS", 1)
+    monkeypatch.setattr(extraction, "EXTRACTION_TIMEOUT", 1)
+    monkeypatch.setattr(extraction, "extract_text_from_file", fake_extract)
+    # Spawned or forkserver workers re-import extraction and would run the real extractor,
+    # so the pool forks its workers whatever the platform default is
+    if "fork" not in multiprocessing.get_all_start_methods():
+        pytest.skip("needs the fork start method")
+    monkeypatch.setattr(extraction, "ProcessPoolExecutor",
+                        partial(ProcessPoolExecutor, mp_context=multiprocessing.get_context("fork")))
+    yield extraction
+    extraction.shutdown_extraction_pool()
+
+
+def test_hung_file_does_not_stall_the_files_queued_behind_it(one_worker_pool, tmp_path):
+    extraction = one_worker_pool
+    paths = [str(tmp_path / name) for name in ("hang.txt", "a.txt", "b.txt")]
+    futures = [extraction.submit_extraction(path) for path in paths]
+
+    started = time.monotonic()
+    with ThreadPoolExecutor() as executor:
+        texts = list(executor.map(extraction.wait_for_extraction, futures, paths))
+
+    assert "timed out" in texts[0]
+    assert texts[1:] == ["text of a.txt", "text of b.txt"]
+    assert time.monotonic() - started < 10
+
+
+def test_pool_is_usable_after_a_timeout(one_worker_pool, tmp_path):
+    extraction = one_worker_pool
+    hung = str(tmp_path / "hang.txt")
+    assert "timed out" in extraction.wait_for_extraction(extraction.submit_extraction(hung), hung)
+
+    path = str(tmp_path / "c.txt")
+    assert extraction.wait_for_extraction(extraction.submit_extraction(path), path) == "text of c.txt"
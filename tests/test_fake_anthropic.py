@@ -0,0 +1,36 @@
+from analyzer import build_request_params
+from fake_anthropic import build_message
+from multi_role import build_roles_request_params
+
+DUTIES = "- " + "Design, build and operate Python services " * 11
+
+
+def cache_usage(params, requests=2):
+    seen = set()
+    return [build_message(params, seen)["usage"] for _ in range(requests)]
+
+
+def test_single_role_prompt_is_too_short_to_cache():
+    params = build_request_params("Ada Example\nEngineer", "Backend Engineer", DUTIES[:500], DUTIES[:500])
+    for usage in cache_usage(params):
+        assert usage["cache_creation_input_tokens"] == 0
+        assert usage["cache_read_input_tokens"] == 0
+
+
+def test_long_prefix_is_written_then_read():
+    roles = [{"job_title": f"Role {number}", "important_duties": DUTIES, "considerable_duties": DUTIES} for number in range(5)]
+    first, second = cache_usage(build_roles_request_params("Ada Example\nEngineer", roles))
+
+    assert first["cache_creation_input_tokens"] >= 1024
+    assert first["cache_read_input_tokens"] == 0
+    assert second["cache_read_input_tokens"] == first["cache_creation_input_tokens"]
+    assert second["input_tokens"] == first["input_tokens"]
+
+
+def test_haiku_needs_a_longer_prefix():
+    roles = [{"job_title": f"Role {number}", "important_duties": DUTIES, "considerable_duties": DUTIES} for number in range(3)]
+    params = build_roles_request_params("Ada Example\nEngineer", roles)
+    assert cache_usage(params)[1]["cache_read_input_tokens"] > 0
+
+    params = build_roles_request_params("Ada Example\nEngineer", roles, model="claude-3-haiku-20240307")
+    assert cache_usage(params)[1]["cache_read_input_tokens"] == 0
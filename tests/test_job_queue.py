@@ -0,0 +1,282 @@
+import os
+import threading
+import time
+
+import pytest
+
+import job_queue
+
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch):
+    monkeypatch.setattr(job_queue, "JOB_QUEUE_PATH", str(tmp_path / "queue.sqlite3"))
+    monkeypatch.setattr(job_queue, "JOB_FILES_DIR", str(tmp_path / "files"))
+    resume = tmp_path / "jane.txt"
+    resume.write_text("Jane Doe\nEngineer")
+    return str(resume)
+
+
+@pytest.fixture
+def resumes(queue, tmp_path):
+    paths = []
+    for name in ("ada", "grace", "linus", "margaret"):
+        path = tmp_path / f"{name}.txt"
+        path.write_text(f"{name.title()} Example\n{name}@example.com\nEXPERIENCE\nEngineer, Foo\n2020 - Present")
+        paths.append(str(path))
+    return paths
+
+
+def finished_count(job_id):
+    return sum(item["result"] is not None for item in job_queue.get_job(job_id)["items"])
+
+
+def test_jobs_are_listed_only_for_their_owner(queue):
+    mine = job_queue.enqueue_job([queue], "Engineer", "a" * 20, "b" * 20, owner="browser-a")
+    job_queue.enqueue_job([queue], "Engineer", "a" * 20, "b" * 20, owner="browser-b")
+
+    assert [job["id"] for job in job_queue.list_jobs("browser-a")] == [mine]
+    assert job_queue.list_jobs("browser-c") == []
+
+
+def test_old_jobs_are_pruned_with_their_files(queue):
+    old = job_queue.enqueue_job([queue], "Engineer", "a" * 20, "b" * 20, owner="browser-a")
+    running = job_queue.enqueue_job([queue], "Engineer", "a" * 20, "b" * 20, owner="browser-a")
+    fresh = job_queue.enqueue_job([queue], "Engineer", "a" * 20, "b" * 20, owner="browser-a")
+
+    conn = job_queue.connect()
+    week_ago = time.time() - 8 * 24 * 60 * 60
+    conn.execute("UPDATE jobs SET status = 'done', created_at = ?, finished_at = ? WHERE id = ?", (week_ago, week_ago, old))
+    conn.execute("UPDATE jobs SET status = 'running', created_at = ? WHERE id = ?", (week_ago, running))
+    conn.close()
+
+    assert job_queue.prune_jobs(7 * 24 * 60 * 60) == 1
+    assert job_queue.get_job(old) is None
+    assert not os.path.exists(os.path.join(job_queue.JOB_FILES_DIR, old))
+    assert job_queue.get_job(running) is not None
+    assert os.path.exists(os.path.join(job_queue.JOB_FILES_DIR, fresh))
+
+
+def test_retention_of_zero_keeps_everything(queue):
+    job_id = job_queue.enqueue_job([queue], "Engineer", "a" * 20, "b" * 20)
+    assert job_queue.prune_jobs(0) == 0
+    assert job_queue.get_job(job_id) is not None
+
+
+@pytest.fixture
+def worker_env(queue, fake_api, monkeypatch):
+    """Factory: start a fake API with the given options and point worker subprocesses at it and this test's queue"""
+    def start(**options):
+        server, client = fake_api(**options)
+        monkeypatch.setenv("JOB_QUEUE_PATH", job_queue.JOB_QUEUE_PATH)
+        monkeypatch.setenv("JOB_FILES_DIR", job_queue.JOB_FILES_DIR)
+        monkeypatch.setenv("ANTHROPIC_BASE_URL", str(client.base_url))
+        monkeypatch.setenv("ANTHROPIC_API_KEY", "test")
+        return server
+
+    yield start
+    job_queue.stop_workers()
+
+
+def wait_for_status(job_id, statuses, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = job_queue.get_job(job_id)
+        if job["status"] in statuses:
+            return job
+        time.sleep(0.1)
+    raise AssertionError(f"job {job_id} still {job['status']}")
+
+
+def test_started_workers_drain_the_queue(queue, worker_env):
+    server = worker_env()
+    job_id = job_queue.enqueue_job([queue], "Engineer", "a" * 20, "b" * 20)
+
+    workers = list(job_queue.start_workers(1))
+    job = wait_for_status(job_id, ("done", "failed"))
+
+    assert job["status"] == "done"
+    assert job_queue.job_rows(job)[0]["File Name"] == "jane.txt"
+    assert server.state.requests == 1
+    assert job_queue.live_workers() == 1
+    job_queue.stop_workers()
+    assert [worker.returncode for worker in workers] == [0]
+    # A worker that exits cleanly signs off
+    assert job_queue.live_workers() == 0
+
+
+def test_watching_a_job_nobody_runs_gives_up(queue, monkeypatch):
+    monkeypatch.setattr(job_queue, "JOB_STALE_AFTER", 0.3)
+    job_id = job_queue.enqueue_job([queue], "Engineer", "a" * 20, "b" * 20)
+
+    started = time.monotonic()
+    states = list(job_queue.watch_job(job_id, poll_interval=0.05))
+
+    assert states[-1]["status"] == "queued"
+    assert time.monotonic() - started < 5
+
+
+def test_watching_a_job_follows_it_while_a_worker_is_alive(queue, monkeypatch):
+    monkeypatch.setattr(job_queue, "JOB_STALE_AFTER", 30)
+    job_id = job_queue.enqueue_job([queue], "Engineer", "a" * 20, "b" * 20)
+    conn = job_queue.connect()
+    job_queue.check_in(conn, "worker-a")
+
+    for count, job in enumerate(job_queue.watch_job(job_id, poll_interval=0.01)):
+        if count == 5:
+            conn.execute("UPDATE jobs SET status = 'done' WHERE id = ?", (job_id,))
+    conn.close()
+
+    assert job["status"] == "done"
+    assert count == 6
+
+
+def test_claim_takes_the_oldest_queued_job_then_stale_running_ones(queue):
+    first = job_queue.enqueue_job([queue], "Engineer", "a" * 20, "b" * 20)
+    second = job_queue.enqueue_job([queue], "Engineer", "a" * 20, "b" * 20)
+    conn = job_queue.connect()
+
+    job = job_queue.claim_job(conn, "worker-a")
+    assert (job["id"], job["status"], job["worker"], job["attempts"]) == (first, "running", "worker-a", 1)
+    assert job_queue.claim_job(conn, "worker-b")["id"] == second
+    # Both are running with fresh heartbeats
+    assert job_queue.claim_job(conn, "worker-c") is None
+
+    conn.execute("UPDATE jobs SET heartbeat_at = ? WHERE id = ?", (time.time() - job_queue.JOB_STALE_AFTER - 1, first))
+    job = job_queue.claim_job(conn, "worker-c")
+    conn.close()
+    assert (job["id"], job["worker"], job["attempts"]) == (first, "worker-c", 2)
+
+
+def test_interrupted_job_resumes_with_only_its_unfinished_resumes(resumes, fake_api, monkeypatch):
+    import extraction
+
+    server, client = fake_api(latency=0.3)
+    monkeypatch.setattr(job_queue, "MAX_CONCURRENT_REQUESTS", 1)
+    job_id = job_queue.enqueue_job(resumes, "Engineer", "Python services", "Code review")
+    conn = job_queue.connect()
+
+    worker = threading.Thread(target=job_queue.process_job, args=(client, job_queue.claim_job(conn, "worker-a"), "worker-a"))
+    worker.start()
+    try:
+        # Rows are saved as they finish, not when the job ends
+        deadline = time.monotonic() + 30
+        while finished_count(job_id) == 0 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        # What SIGTERM does in a worker process
+        job_queue._shutdown.set()
+        worker.join(timeout=30)
+    finally:
+        job_queue._shutdown.clear()
+
+    job = job_queue.get_job(job_id)
+    saved = {item["index"]: item["result"] for item in job["items"] if item["result"] is not None}
+    assert (job["status"], job["worker"]) == ("queued", None)
+    assert 1 <= len(saved) < len(resumes)
+    assert server.state.requests == len(saved)
+
+    job = job_queue.claim_job(conn, "worker-b")
+    job_queue.process_job(client, job, "worker-b")
+    extraction.shutdown_extraction_pool()
+    conn.close()
+
+    job = job_queue.get_job(job_id)
+    assert job["status"] == "done"
+    # Only the resumes missing a row were sent again
+    assert server.state.requests == len(resumes)
+    assert all(job["items"][index]["result"] == result for index, result in saved.items())
+    assert [row["File Name"] for row in job_queue.job_rows(job)] == [os.path.basename(path) for path in resumes]
+
+
+def test_terminated_worker_requeues_its_job_with_the_rows_it_finished(resumes, worker_env, monkeypatch):
+    worker_env(latency=0.5)
+    monkeypatch.setenv("MAX_CONCURRENT_REQUESTS", "1")
+    job_id = job_queue.enqueue_job(resumes, "Engineer", "Python services", "Code review")
+
+    job_queue.start_workers(1)
+    deadline = time.monotonic() + 60
+    while finished_count(job_id) == 0 and time.monotonic() < deadline:
+        time.sleep(0.05)
+    job_queue.stop_workers()
+
+    job = job_queue.get_job(job_id)
+    assert job["status"] == "queued"
+    assert 1 <= finished_count(job_id) < len(resumes)
+
+
+def test_bulk_jobs_are_submitted_by_a_worker(resumes, fake_api, tmp_path, monkeypatch):
+    import batch_jobs
+    import extraction
+
+    monkeypatch.setattr(batch_jobs, "BATCH_JOBS_DIR", str(tmp_path / "batch_jobs"))
+    server, client = fake_api(batch_delay=60)
+    job_id = job_queue.enqueue_job(resumes, "Engineer", "Python services", "Code review", owner="browser-a", kind="bulk")
+    assert job_queue.list_jobs("browser-a") == []
+    assert [job["id"] for job in job_queue.list_jobs("browser-a", kind="bulk")] == [job_id]
+
+    conn = job_queue.connect()
+    job_queue.process_job(client, job_queue.claim_job(conn, "worker-a"), "worker-a")
+    extraction.shutdown_extraction_pool()
+    conn.close()
+
+    # Back in the queue until the batch ends
+    job = job_queue.get_job(job_id)
+    assert (job["status"], job["worker"]) == ("waiting", None)
+    batch_job = batch_jobs.load_job(job_id)
+    assert (batch_job["owner"], batch_job["status"]) == ("browser-a", "in_progress")
+    assert [entry["filename"] for entry in batch_job["entries"]] == [os.path.basename(path) for path in resumes]
+    assert not os.path.exists(os.path.join(job_queue.JOB_FILES_DIR, job_id))
+    # Submitted as one batch, nothing through the live endpoint
+    assert len(server.state.batches) == 1
+    assert server.state.requests == 0
+
+
+def test_workers_merge_a_bulk_batch_once_it_ends(resumes, fake_api, tmp_path, monkeypatch):
+    import batch_jobs
+    import extraction
+
+    monkeypatch.setattr(batch_jobs, "BATCH_JOBS_DIR", str(tmp_path / "batch_jobs"))
+    monkeypatch.setattr(batch_jobs, "BATCH_POLL_INTERVAL", 0.5)
+    server, client = fake_api(batch_delay=0.3)
+    job_id = job_queue.enqueue_job(resumes, "Engineer", "Python services", "Code review", owner="browser-a", kind="bulk")
+    conn = job_queue.connect()
+
+    job_queue.process_job(client, job_queue.claim_job(conn, "worker-a"), "worker-a")
+    extraction.shutdown_extraction_pool()
+    assert job_queue.get_job(job_id)["status"] == "waiting"
+    # Not due for another check yet
+    assert job_queue.claim_job(conn, "worker-b") is None
+
+    time.sleep(0.6)
+    job_queue.process_job(client, job_queue.claim_job(conn, "worker-b"), "worker-b")
+    conn.close()
+
+    job = job_queue.get_job(job_id)
+    batch_job = batch_jobs.load_job(job_id)
+    assert job["status"] == "done"
+    assert job["usage"]["requests"] == len(resumes)
+    assert batch_jobs.job_finished(batch_job)
+    assert [row["File Name"] for row in batch_jobs.batch_job_rows(batch_job)] == [os.path.basename(path) for path in resumes]
+    assert len(server.state.batches) == 1
+
+
+def test_failed_batch_check_is_retried_later(resumes, fake_api, tmp_path, monkeypatch):
+    import anthropic
+    import batch_jobs
+    import extraction
+
+    monkeypatch.setattr(batch_jobs, "BATCH_JOBS_DIR", str(tmp_path / "batch_jobs"))
+    monkeypatch.setattr(batch_jobs, "BATCH_POLL_INTERVAL", 0)
+    _, client = fake_api(batch_delay=60)
+    job_id = job_queue.enqueue_job(resumes, "Engineer", "Python services", "Code review", kind="bulk")
+    conn = job_queue.connect()
+    job_queue.process_job(client, job_queue.claim_job(conn, "worker-a"), "worker-a")
+    extraction.shutdown_extraction_pool()
+
+    # Nothing listens on the discard port, so the status check fails to connect
+    unreachable = anthropic.Anthropic(api_key="test", base_url="http://127.0.0.1:9", max_retries=0)
+    job_queue.process_job(unreachable, job_queue.claim_job(conn, "worker-b"), "worker-b")
+    conn.close()
+
+    job = job_queue.get_job(job_id)
+    assert (job["status"], job["error"]) == ("waiting", None)
+    assert batch_jobs.load_job(job_id)["status"] == "in_progress"
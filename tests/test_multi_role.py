@@ -0,0 +1,86 @@
+from types import SimpleNamespace
+
+import pytest
+
+import multi_role
+from analyzer import AnalysisValidationError, api_error_result, file_error_result
+from multi_role import parse_roles_message, role_groups, role_rows, score_matrix, validate_roles
+
+ROLES = [
+    {"job_title": "Backend Engineer", "important_duties": "Design and run Python services", "considerable_duties": "Review code"},
+    {"job_title": "Data Engineer", "important_duties": "Build data pipelines in Spark", "considerable_duties": "Write SQL"},
+    {"job_title": "SRE", "important_duties": "Run production systems on-call", "considerable_duties": "Automate deploys"},
+]
+
+
+def match(role, score=5, recommendation="CONSIDERABLE MATCH"):
+    return {"role": role, "match_score": score, "recommendation": recommendation, "reason": f"Role {role}."}
+
+
+def roles_message(matches):
+    tool_input = {"candidate_name": "Ada Example", "email": "ada@example.com", "phone": "", "current_company": "Foo",
+                  "current_designation": "Engineer", "total_experience": "5 years", "roles": matches}
+    return SimpleNamespace(model="claude-test", content=[
+        SimpleNamespace(type="tool_use", name="record_role_matches", input=tool_input),
+    ])
+
+
+def test_reply_becomes_one_row_per_role_in_role_order():
+    message = roles_message([match(3, 2, "REJECT"), match("1", 9, "good match"), match(2)])
+    rows = parse_roles_message(message, "ada.txt", ROLES)
+
+    assert [row["Job Title"] for row in rows] == ["Backend Engineer", "Data Engineer", "SRE"]
+    assert [row["Match Score"] for row in rows] == [9, 5, 2]
+    assert rows[0]["Recommendation"] == "GOOD MATCH"
+    assert rows[0]["Phone"] == "Not Available"
+    assert {row["File Name"] for row in rows} == {"ada.txt"}
+
+
+@pytest.mark.parametrize("matches, error", [
+    ([match(1), match(2)], "no match recorded for role\\(s\\) 3"),
+    ([match(1), match(2), match(2), match(3)], "role 2 recorded more than once"),
+    ([match(1), match(2), match(4)], "unknown role 4"),
+    ([match(0), match(1), match(2), match(3)], "unknown role 0"),
+    ([match(1), match(2), {"role": 3, "match_score": 5}], "incomplete role entry"),
+    ([match(1), match(2), match(3, 11)], "match_score"),
+    ("not a list", "no match recorded"),
+])
+def test_invalid_role_entries_are_rejected(matches, error):
+    with pytest.raises(AnalysisValidationError, match=error):
+        parse_roles_message(roles_message(matches), "ada.txt", ROLES)
+
+
+def test_roles_must_be_valid_and_distinct():
+    assert validate_roles(ROLES) is None
+    assert validate_roles([]) == "Please define at least one role"
+    duplicate = [ROLES[0], {**ROLES[1], "job_title": " backend engineer "}]
+    assert validate_roles(duplicate) == 'Role 2: job title " backend engineer " is used more than once'
+    assert validate_roles([ROLES[0], {**ROLES[1], "important_duties": ""}]) == "Role 2: Please enter the important duties"
+
+
+def test_too_many_roles(monkeypatch):
+    monkeypatch.setattr(multi_role, "MAX_ROLES", 2)
+    assert validate_roles(ROLES) == "At most 2 roles can be matched at once"
+
+
+def test_roles_are_split_into_request_groups(monkeypatch):
+    monkeypatch.setattr(multi_role, "ROLES_PER_REQUEST", 2)
+    assert role_groups(ROLES) == [ROLES[:2], ROLES[2:]]
+    monkeypatch.setattr(multi_role, "ROLES_PER_REQUEST", 5)
+    assert role_groups(ROLES) == [ROLES]
+
+
+def test_score_matrix_pivots_rows_and_keeps_error_rows():
+    ada = parse_roles_message(roles_message([match(1, 8), match(2, 8), match(3, 4)]), "ada.txt", ROLES)
+    grace = parse_roles_message(roles_message([match(1, 3), match(2, 6), match(3, 7)]), "grace.txt", ROLES)
+    # An API error in the second group of a split request leaves only that role without a score
+    grace[2] = role_rows(api_error_result("grace.txt", "overloaded"), ROLES[2:])[0]
+    broken = role_rows(file_error_result("broken.pdf", "Error reading broken.pdf"), ROLES)
+
+    matrix = score_matrix(ada + grace + broken, ROLES)
+
+    assert [entry["File Name"] for entry in matrix] == ["ada.txt", "grace.txt", "broken.pdf"]
+    assert matrix[0]["Best Role"] == "Backend Engineer / Data Engineer"
+    assert (matrix[1]["SRE"], matrix[1]["Best Role"]) == ("Error", "Data Engineer")
+    assert [matrix[2][role["job_title"]] for role in ROLES] == ["N/A"] * 3
+    assert (matrix[2]["Name"], matrix[2]["Best Role"]) == ("File Error", "N/A")
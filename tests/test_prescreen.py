@@ -0,0 +1,82 @@
+import os
+import subprocess
+import sys
+from concurrent.futures import Future
+
+import pytest
+
+from analyzer import prescreen_resume_files
+from prescreen import rank_by_similarity, similarity_scores
+
+IMPORTANT = "Design, build and operate backend services in Python; own reliability and on-call"
+CONSIDERABLE = "Mentor engineers, review code and plan projects with product managers"
+
+BACKEND = "Senior backend engineer. Build Python services, operate them on-call and own their reliability."
+MENTOR = "Engineering lead at a retail company. Mentor junior engineers and plan hiring. Some Python."
+CHEF = "Head chef. Plan seasonal menus, run the kitchen brigade and manage food suppliers."
+
+
+def test_rejects_below_threshold_and_orders_by_score():
+    scores, passed = rank_by_similarity([CHEF, MENTOR, BACKEND], IMPORTANT, CONSIDERABLE, min_score=0.1)
+    assert scores[2] > scores[1] > 0.1 > scores[0]
+    assert passed == [2, 1]
+
+
+def test_zero_threshold_passes_everything():
+    _, passed = rank_by_similarity([CHEF, BACKEND], IMPORTANT, CONSIDERABLE, min_score=0)
+    assert passed == [1, 0]
+
+
+def test_score_does_not_depend_on_the_rest_of_the_batch():
+    alone = similarity_scores([BACKEND], IMPORTANT, CONSIDERABLE)[0]
+    with_similar = similarity_scores([BACKEND] + [MENTOR] * 30, IMPORTANT, CONSIDERABLE)[0]
+    with_unrelated = similarity_scores([BACKEND] + [CHEF] * 30, IMPORTANT, CONSIDERABLE)[0]
+    assert alone == pytest.approx(with_similar) == pytest.approx(with_unrelated)
+
+
+def test_scores_repeat_across_processes():
+    code = ("import sys; sys.path.insert(0, sys.argv[1]); from prescreen import similarity_scores; "
+            f"print(repr(similarity_scores([{BACKEND!r}], {IMPORTANT!r}, {CONSIDERABLE!r})[0]))")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    outputs = {
+        subprocess.run([sys.executable, "-c", code, root], capture_output=True, text=True, check=True,
+                       env={**os.environ, "PYTHONHASHSEED": seed}).stdout
+        for seed in ("1", "2")
+    }
+    assert len(outputs) == 1
+
+
+def test_list_duties_pass_resumes_that_fit_any_role():
+    roles_important = [IMPORTANT, "Cook and plan seasonal menus; run a kitchen brigade"]
+    roles_considerable = [CONSIDERABLE, "Manage food suppliers and kitchen stock"]
+    single, _ = rank_by_similarity([CHEF], IMPORTANT, CONSIDERABLE)
+    scores, passed = rank_by_similarity([CHEF, BACKEND], roles_important, roles_considerable, min_score=0.1)
+    assert scores[0] > single[0]
+    assert sorted(passed) == [0, 1]
+
+
+def extracted(text):
+    future = Future()
+    future.pool = future.pool_future = None
+    future.set_result((text, 0.0))
+    return future
+
+
+def test_prescreen_resume_files_keeps_unreadable_files_for_their_error_row():
+    files = ["chef.txt", "broken.pdf", "backend.txt", "mentor.txt"]
+    extractions = [extracted(CHEF), extracted("Error reading broken.pdf: bad xref"),
+                   extracted(BACKEND), extracted(MENTOR)]
+    rejected, order = prescreen_resume_files(files, extractions, IMPORTANT, CONSIDERABLE, min_score=0.1)
+
+    assert list(rejected) == [0]
+    assert rejected[0]["Recommendation"] == "REJECT (pre-screen)"
+    assert rejected[0]["File Name"] == "chef.txt"
+    # Best match first, then the unreadable file so analyze_resume_file gives it a File Error row
+    assert order == [2, 3, 1]
+
+
+def test_prescreen_off_keeps_upload_order():
+    files = ["chef.txt", "backend.txt"]
+    rejected, order = prescreen_resume_files(files, [None, None], IMPORTANT, CONSIDERABLE, min_score=0)
+    assert rejected == {}
+    assert order == [0, 1]
@@ -0,0 +1,99 @@
+import random
+import time
+
+import anthropic
+import pytest
+
+from resilience import CircuitBreaker, call_with_retries, retry_after_seconds
+
+PARAMS = {"model": "claude-3-sonnet-20240229", "max_tokens": 64, "messages": [{"role": "user", "content": "CANDIDATE RESUME:\nJane Doe"}]}
+
+
+def create(client):
+    return lambda: client.messages.with_raw_response.create(**PARAMS)
+
+
+def test_recovers_from_injected_overloads(fake_api):
+    random.seed(3)
+    server, client = fake_api(error_rate=0.5, retry_after=0)
+
+    for _ in range(10):
+        response = call_with_retries(create(client), max_attempts=10)
+        assert response.parse().content
+
+    assert server.state.errors > 0
+    assert server.state.requests == 10 + server.state.errors
+
+
+def test_gives_up_after_max_attempts(fake_api):
+    server, client = fake_api(error_rate=1.0, retry_after=0)
+
+    with pytest.raises(anthropic.APIStatusError) as raised:
+        call_with_retries(create(client), max_attempts=3)
+
+    assert raised.value.status_code == 529
+    assert server.state.requests == 3
+
+
+def test_client_errors_are_not_retried(fake_api):
+    server, client = fake_api(error_rate=1.0, error_status=400)
+
+    with pytest.raises(anthropic.BadRequestError):
+        call_with_retries(create(client), max_attempts=3)
+
+    assert server.state.requests == 1
+
+
+def test_waits_as_long_as_retry_after_asks(fake_api):
+    server, client = fake_api(error_rate=1.0, retry_after=0.3)
+
+    started = time.monotonic()
+    with pytest.raises(anthropic.APIStatusError):
+        call_with_retries(create(client), max_attempts=3)
+
+    assert time.monotonic() - started >= 0.6
+    assert server.state.requests == 3
+
+
+def test_breaker_pauses_after_repeated_overloads(fake_api):
+    server, client = fake_api(error_rate=1.0, retry_after=0)
+    breaker = CircuitBreaker(failure_threshold=2, cooldown=0.5)
+
+    started = time.monotonic()
+    with pytest.raises(anthropic.APIStatusError):
+        call_with_retries(create(client), breaker=breaker, max_attempts=3)
+
+    # The second overload trips the breaker, so the third attempt waits out the cooldown
+    assert breaker.trips == 1
+    assert time.monotonic() - started >= 0.5
+    assert server.state.requests == 3
+
+
+def test_breaker_resets_on_success(fake_api):
+    random.seed(0)
+    _, client = fake_api(error_rate=0.0)
+    breaker = CircuitBreaker(failure_threshold=2, cooldown=10)
+    breaker.failures = 1
+
+    call_with_retries(create(client), breaker=breaker)
+
+    assert breaker.failures == 0
+    assert not breaker.is_open
+
+
+def test_breaker_ignores_errors_that_are_not_overloads(fake_api):
+    server, client = fake_api(error_rate=1.0, error_status=500, retry_after=0)
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=10)
+
+    with pytest.raises(anthropic.InternalServerError):
+        call_with_retries(create(client), breaker=breaker, max_attempts=2)
+
+    assert breaker.trips == 0
+    assert server.state.requests == 2
+
+
+def test_retry_after_headers():
+    assert retry_after_seconds({"retry-after-ms": "250"}) == 0.25
+    assert retry_after_seconds({"retry-after": "2"}) == 2
+    assert retry_after_seconds({"retry-after": "soon"}) is None
+    assert retry_after_seconds(None) is None
@@ -0,0 +1,97 @@
+import sqlite3
+import time
+
+import pytest
+
+from result_cache import ResultCache, make_key
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / "cache.sqlite3")
+
+
+def test_keys_change_with_every_part():
+    key = make_key("resume", "Engineer", "duties", "claude-3-sonnet-20240229", 3)
+    assert key == make_key("resume", "Engineer", "duties", "claude-3-sonnet-20240229", 3)
+    assert key != make_key("resume", "Engineer", "duties", "claude-3-sonnet-20240229", 4)
+    assert key != make_key("resume", "Engineer", "duties", "claude-3-haiku-20240307", 3)
+    assert key != make_key("resume ", "Engineer", "duties", "claude-3-sonnet-20240229", 3)
+    # Parts are length-prefixed, so moving text across a boundary changes the key
+    assert make_key("ab", "c") != make_key("a", "bc")
+
+
+def test_put_then_get_counts_hits_and_misses(cache_path):
+    cache = ResultCache(cache_path, 1024 * 1024)
+    assert cache.get("missing") is None
+    cache.put("ada", {"Name": "Ada"})
+    assert cache.get("ada") == {"Name": "Ada"}
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+    # Another process sharing the file sees the same totals
+    assert ResultCache(cache_path, 1024 * 1024).stats()["total_hits"] == 1
+
+
+def test_least_recently_used_entries_are_evicted_first(cache_path):
+    value = "x" * 100
+    cache = ResultCache(cache_path, 250)
+    cache.put("a", value)
+    time.sleep(0.01)
+    cache.put("b", value)
+    time.sleep(0.01)
+    # Reading "a" makes "b" the least recently used
+    assert cache.get("a") == value
+    time.sleep(0.01)
+    cache.put("c", value)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == value
+    assert cache.get("c") == value
+
+
+def test_disabled_cache_stores_nothing(cache_path):
+    cache = ResultCache(cache_path, 0)
+    cache.put("ada", {"Name": "Ada"})
+    assert cache.get("ada") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_locked_cache_still_serves_hits_and_skips_writes(cache_path):
+    cache = ResultCache(cache_path, 1024 * 1024, timeout=0.1)
+    cache.put("ada", {"Name": "Ada"})
+
+    other = sqlite3.connect(cache_path, isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")
+    try:
+        # WAL lets the read through; the LRU touch and counters give up quietly
+        assert cache.get("ada") == {"Name": "Ada"}
+        assert cache.get("grace") is None
+        cache.put("grace", {"Name": "Grace"})
+    finally:
+        other.execute("ROLLBACK")
+        other.close()
+
+    assert cache.get("grace") is None
+    assert cache.stats()["hits"] == 1
+
+
+class BrokenConnection:
+    def execute(self, *args):
+        raise sqlite3.OperationalError("database is locked")
+
+    def commit(self):
+        raise sqlite3.OperationalError("database is locked")
+
+    def rollback(self):
+        pass
+
+
+def test_cache_errors_count_as_misses(cache_path):
+    cache = ResultCache(cache_path, 1024 * 1024)
+    cache.put("ada", {"Name": "Ada"})
+    cache.conn = BrokenConnection()
+
+    assert cache.get("ada") is None
+    cache.put("grace", {"Name": "Grace"})
+    assert cache.misses == 1
@@ -0,0 +1,81 @@
+import os
+import time
+
+import pytest
+
+import session_store
+from session_store import SessionRegistry, SessionResults
+
+
+@pytest.fixture(autouse=True)
+def spill_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(session_store, "SESSION_SPILL_DIR", str(tmp_path / "sessions"))
+
+
+def rows(start, stop):
+    return [{"File Name": f"resume_{index}.pdf", "Match Score": index} for index in range(start, stop)]
+
+
+def test_rows_stay_in_memory_up_to_the_limit():
+    session = SessionResults("small", memory_rows=5)
+    session.append(rows(0, 5))
+
+    assert session.conn is None
+    assert len(session) == 5
+    assert session.all_rows() == rows(0, 5)
+
+
+def test_rows_spill_to_sqlite_past_the_limit():
+    session = SessionResults("large", memory_rows=5)
+    session.append(rows(0, 4))
+    session.append(rows(4, 8))
+
+    assert session.spilled == 8
+    assert session.rows == []
+    assert os.path.exists(session.spill_path)
+    # Once spilled, later rows go straight to SQLite too
+    session.append(rows(8, 10))
+    assert (len(session), session.spilled) == (10, 10)
+    assert session.all_rows() == rows(0, 10)
+
+
+@pytest.mark.parametrize("start, stop", [(0, 3), (2, 7), (4, 6), (5, 9), (0, 12), (7, 20), (12, 15)])
+def test_pages_are_the_same_before_and_after_spilling(start, stop):
+    session = SessionResults("pages", memory_rows=5)
+    session.append(rows(0, 5))
+    before = session.slice(start, stop)
+    session.append(rows(5, 12))
+
+    assert before == rows(start, min(stop, 5))
+    assert session.spilled == 12
+    assert session.slice(start, stop) == rows(start, min(stop, 12))
+
+
+def test_clear_removes_the_spill_file():
+    session = SessionResults("cleared", memory_rows=2)
+    session.append(rows(0, 5))
+    session.loaded_jobs.add("q_1")
+    spill_path = session.spill_path
+
+    session.clear()
+
+    assert not os.path.exists(spill_path)
+    assert (len(session), session.all_rows(), session.loaded_jobs) == (0, [], set())
+    session.append(rows(0, 1))
+    assert session.all_rows() == rows(0, 1)
+
+
+def test_idle_sessions_expire_with_their_spill_files():
+    registry = SessionRegistry(ttl=0.05)
+    idle = registry.get("idle")
+    idle.memory_rows = 2
+    idle.append(rows(0, 5))
+    spill_path = idle.spill_path
+
+    time.sleep(0.1)
+    active = registry.get("active")
+
+    assert "idle" not in registry.sessions
+    assert not os.path.exists(spill_path)
+    assert registry.get("active") is active
+    assert len(registry.get("idle")) == 0
@@ -0,0 +1,73 @@
+from token_budget import MIN_PARTIAL_TOKENS, NOTE_TOKENS, estimate_tokens, fit_to_budget, split_sections
+
+
+def work_history(roles, heading="PROFESSIONAL BACKGROUND"):
+    lines = [heading, "Principal Engineer, Current Co", "2020 - Present",
+             "- Leads the platform team and owns the deployment pipeline"]
+    for number in range(roles - 1):
+        end = 2019 - number
+        lines += [f"Engineer {number}, Company {number}", f"{end - 1} - {end}",
+                  f"- Built and maintained internal services for team {number} across several regions"]
+    return lines
+
+
+def resume(history, padding=0):
+    lines = ["Jane Doe", "jane@example.com", "SUMMARY", "Platform engineer.", "LANGUAGES", "English, French"]
+    lines += history
+    lines += ["EDUCATION", "BSc Computer Science" + " " * padding]
+    return "\n".join(lines)
+
+
+def just_over(budget, history):
+    """A resume built around `history` whose estimate is exactly one token over the budget"""
+    text = resume(history)
+    return resume(history, (budget + 1 - estimate_tokens(text)) * 4)
+
+
+def test_under_budget_is_unchanged():
+    text = resume(work_history(3))
+    assert fit_to_budget(text, 1000) == (text, estimate_tokens(text), estimate_tokens(text))
+
+
+def test_unrecognized_heading_with_dated_roles_is_experience():
+    categories = [category for category, _ in split_sections(resume(work_history(3)))]
+    assert categories == ["contact", "summary", "other", "experience", "education"]
+
+
+def test_all_caps_line_without_dates_stays_in_its_section():
+    text = "Jane Doe\nSKILLS\nPython\nCLOUD PLATFORMS\nAWS, GCP"
+    assert [category for category, _ in split_sections(text)] == ["contact", "skills"]
+
+
+def test_work_history_under_unknown_heading_survives_trimming():
+    history = work_history(30)
+    text = just_over(1000, history)
+    assert estimate_tokens(text) == 1001
+
+    trimmed, original_tokens, tokens = fit_to_budget(text, 1000)
+    assert original_tokens == 1001
+    assert "2020 - Present" in trimmed
+    assert "Principal Engineer, Current Co" in trimmed
+    assert tokens <= 1000
+    assert tokens >= 1000 - NOTE_TOKENS - MIN_PARTIAL_TOKENS
+
+
+def test_work_history_found_by_dates_without_any_heading():
+    # A mixed-case heading we cannot recognize leaves the roles inside LANGUAGES
+    history = work_history(30, heading="Professional background")
+    text = just_over(1000, history)
+    categories = [category for category, _ in split_sections(text)]
+    assert "experience" in categories
+
+    trimmed, _, tokens = fit_to_budget(text, 1000)
+    assert "2020 - Present" in trimmed
+    assert tokens >= 1000 - NOTE_TOKENS - MIN_PARTIAL_TOKENS
+
+
+def test_low_priority_section_is_cut_down_rather_than_dropped():
+    text = "\n".join(["Jane Doe", "EXPERIENCE", "Engineer, Foo", "2019 - Present", "PUBLICATIONS"]
+                     + [f"Paper number {number} on distributed systems and storage" for number in range(60)])
+    trimmed, _, tokens = fit_to_budget(text, 300)
+    assert "Paper number 0 " in trimmed
+    assert "Paper number 59 " not in trimmed
+    assert 300 - NOTE_TOKENS - MIN_PARTIAL_TOKENS <= tokens <= 300
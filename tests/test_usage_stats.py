@@ -0,0 +1,41 @@
+from types import SimpleNamespace
+
+import pytest
+
+from analyzer import (BATCH_DISCOUNT, CLAUDE_MODEL, RateLimiter, UsageStats, build_request_params, model_cost,
+                      parse_analysis_message, request_analysis)
+
+TOKENS = {"input_tokens": 1_000_000, "output_tokens": 100_000,
+          "cache_creation_input_tokens": 0, "cache_read_input_tokens": 0}
+
+
+def test_model_cost():
+    assert model_cost("claude-3-sonnet-20240229", TOKENS) == pytest.approx(3.00 + 1.50)
+    assert model_cost("unknown-model", TOKENS) is None
+
+
+def test_batch_tokens_cost_half():
+    live = model_cost("claude-3-sonnet-20240229", TOKENS)
+    assert model_cost("claude-3-sonnet-20240229", TOKENS, batch=True) == pytest.approx(live * BATCH_DISCOUNT)
+
+
+def test_summary_prices_batches_at_batch_rates():
+    usage = UsageStats()
+    usage.add(SimpleNamespace(**TOKENS), "claude-3-sonnet-20240229")
+
+    assert "~$4.5000" in usage.summary()
+    assert "~$2.2500 at batch rates" in usage.summary(batch=True)
+
+
+def test_model_latency_leaves_out_rate_limit_waits(fake_api):
+    _, client = fake_api(latency=0.2)
+    # An empty bucket at one request per second makes the request wait about a second first
+    rate_limiter = RateLimiter(60)
+    rate_limiter.tokens = 0
+    usage = UsageStats()
+
+    params = build_request_params("Ada Example\nEngineer", "Engineer", "Python services", "Code review")
+    request_analysis(client, params, lambda message: parse_analysis_message(message, "ada.txt"), rate_limiter, usage)
+
+    seconds = usage.models[CLAUDE_MODEL]["seconds"]
+    assert 0.2 <= seconds < 0.8
@@ -0,0 +1,208 @@
+import os
+import re
+
+# Approximate tokens allowed for one resume in the prompt (0 disables trimming)
+RESUME_TOKEN_BUDGET = int(os.getenv('RESUME_TOKEN_BUDGET', 3000))
+
+# Claude averages roughly four characters of English per token; close enough for budgeting
+CHARS_PER_TOKEN = 4
+
+# Room kept for the note that lists what was left out
+NOTE_TOKENS = 40
+# A section is only cut down, rather than dropped, if at least this much of it fits
+MIN_PARTIAL_TOKENS = 60
+# Dated lines that make an unlabelled section read as work history (an ongoing role is enough on its own)
+WORK_HISTORY_MIN_DATES = 2
+
+# Section heading -> category; lower priority numbers are kept first
+SECTION_HEADINGS = {
+    "experience": ("experience", "work experience", "professional experience", "relevant experience",
+                   "employment", "employment history", "work history", "career history", "professional history",
+                   "positions held", "career"),
+    "summary": ("summary", "professional summary", "profile", "professional profile", "career summary",
+                "objective", "career objective", "about me", "about"),
+    "skills": ("skills", "technical skills", "key skills", "core skills", "core competencies", "competencies",
+               "areas of expertise", "expertise", "technologies", "tools"),
+    "education": ("education", "academic background", "qualifications", "academic qualifications"),
+    "certifications": ("certifications", "certificates", "licenses", "licenses and certifications",
+                       "training", "courses"),
+    "projects": ("projects", "key projects", "selected projects"),
+    "other": ("publications", "selected publications", "presentations", "conferences", "patents",
+              "references", "awards", "honors", "honors and awards", "achievements", "interests", "hobbies",
+              "volunteer", "volunteering", "volunteer experience", "languages", "memberships",
+              "affiliations", "personal details", "personal information", "additional information"),
+}
+
+SECTION_PRIORITY = {"contact": 0, "experience": 1, "summary": 2, "skills": 3, "education": 4,
+                    "certifications": 5, "projects": 6, "other": 7}
+
+HEADING_CATEGORY = {heading: category for category, headings in SECTION_HEADINGS.items() for heading in headings}
+HEADING_CLEANUP = re.compile(r"[^a-z ]+")
+
+YEAR = re.compile(r"\b(?:19|20)\d{2}\b")
+DATE_RANGE = re.compile(
+    r"\b(?:19|20)\d{2}\s*(?:-|–|—|to|until)\s*(?:[a-z]+\.?\s+)?(?:(?:19|20)\d{2}|present|current|now|date|today)\b",
+    re.IGNORECASE
+)
+CURRENT_RANGE = re.compile(r"(?:-|–|—|to|until)\s*(?:[a-z]+\.?\s+)?(?:present|current|now|date|today)\b", re.IGNORECASE)
+BULLET = re.compile(r"^[•\-*–·▪●]")
+
+def estimate_tokens(text):
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+def lines_cost(lines):
+    """Tokens the lines add to the joined text, newlines included; unrounded so that costs add up"""
+    return sum(len(line) + 1 for line in lines) / CHARS_PER_TOKEN
+
+def heading_category(line):
+    """Section category if the line is a recognized heading, else None"""
+    if len(line) > 40:
+        return None
+    return HEADING_CATEGORY.get(" ".join(HEADING_CLEANUP.sub(" ", line.lower().replace("&", " and ")).split()))
+
+def looks_like_heading(line):
+    """A heading we have no category for: a short all-caps line, or a few words ending in a colon"""
+    words = line.rstrip(":").split()
+    if not words or len(line) > 40 or any(char.isdigit() for char in line):
+        return False
+    return (line.isupper() and len(words) > 1) or (line.endswith(":") and len(words) <= 4)
+
+def is_work_history(lines, min_dates=WORK_HISTORY_MIN_DATES):
+    text = "\n".join(lines)
+    return bool(CURRENT_RANGE.search(text)) or sum(bool(DATE_RANGE.search(line)) for line in lines) >= min_dates
+
+def split_sections(text):
+    """[(category, lines)]; whatever precedes the first heading is the contact block
+
+    Work history is found by its date ranges when its heading is not one we know
+    ("PROFESSIONAL BACKGROUND"): an unrecognized heading after the first known one starts
+    an experience section if dated roles follow it, and with no experience heading at all
+    the section holding the work history is treated as experience.
+    """
+    sections = [("contact", [])]
+    for line in text.splitlines():
+        category = heading_category(line.strip())
+        if category:
+            sections.append((category, [line]))
+        elif len(sections) > 1 and looks_like_heading(line.strip()):
+            sections.append((None, [line]))
+        else:
+            sections[-1][1].append(line)
+
+    merged = []
+    for category, lines in sections:
+        if category is None and not is_work_history(lines):
+            # Not a section after all (a company name, a skill group): keep it with the section above
+            merged[-1][1].extend(lines)
+        else:
+            merged.append((category or "experience", lines))
+    merged = [(category, lines) for category, lines in merged if any(line.strip() for line in lines)]
+
+    if all(category != "experience" for category, _ in merged):
+        dated = [index for index, (category, lines) in enumerate(merged)
+                 if category != "contact" and is_work_history(lines, WORK_HISTORY_MIN_DATES + 1)]
+        if dated:
+            index = max(dated, key=lambda index: sum(bool(DATE_RANGE.search(line)) for line in merged[index][1]))
+            merged[index] = ("experience", merged[index][1])
+    return merged
+
+def split_roles(lines):
+    """Split an experience section into roles; a new role starts at each further date range"""
+    roles = [[]]
+    for line in lines:
+        if DATE_RANGE.search(line) and any(DATE_RANGE.search(previous) for previous in roles[-1]):
+            carried = []
+            # A short non-bullet line just above the dates is usually the next role's title/company
+            last = roles[-1][-1]
+            if not DATE_RANGE.search(last) and len(last) < 80 and not BULLET.match(last.strip()):
+                carried = [roles[-1].pop()]
+            roles.append(carried)
+        roles[-1].append(line)
+    return [role for role in roles if role]
+
+def role_recency(lines):
+    """Sort key that puts ongoing roles first, then the latest end year"""
+    text = "\n".join(lines)
+    years = [int(year) for year in YEAR.findall(text)]
+    return (bool(CURRENT_RANGE.search(text)), max(years, default=0))
+
+def head_lines(lines, budget):
+    """As many leading lines as fit in the budget, the last one cut at a word boundary"""
+    kept, used = [], 0
+    for line in lines:
+        cost = lines_cost([line])
+        if used + cost > budget:
+            room = int((budget - used) * CHARS_PER_TOKEN) - 1
+            if room >= 40:
+                kept.append(line[:room - 1].rsplit(" ", 1)[0] + "…")
+            break
+        kept.append(line)
+        used += cost
+    return kept
+
+def trim_experience(lines, budget):
+    """Keep the ongoing and most recent roles that fit, in their original order"""
+    first = lines[0].strip()
+    heading, body = (lines[:1], lines[1:]) if heading_category(first) or looks_like_heading(first) else ([], lines)
+    roles = split_roles(body)
+    ranked = sorted(range(len(roles)), key=lambda index: role_recency(roles[index]), reverse=True)
+
+    remaining = budget - lines_cost(heading)
+    kept = set()
+    partial = {}
+    for index in ranked:
+        cost = lines_cost(roles[index])
+        if cost <= remaining:
+            kept.add(index)
+            remaining -= cost
+            continue
+        if not kept:
+            # Even the current role alone is too long: keep its beginning
+            partial[index] = head_lines(roles[index], remaining)
+        # Stop at the first role that doesn't fit so no older role is kept in place of a newer one
+        break
+
+    trimmed = list(heading)
+    for index, role in enumerate(roles):
+        if index in kept:
+            trimmed.extend(role)
+        elif index in partial:
+            trimmed.extend(partial[index])
+    dropped = len(roles) - len(kept) - len(partial)
+    if dropped:
+        trimmed.append(f"[{dropped} older role(s) omitted]")
+    return trimmed
+
+def fit_to_budget(text, budget=RESUME_TOKEN_BUDGET):
+    """Return (text, original_tokens, tokens) with the text cut down to roughly `budget` tokens
+
+    Sections are kept in priority order: contact block, experience (ongoing and most
+    recent roles first), summary, skills, education, and so on. The first section that
+    does not fit is cut down to the room left, and so is each later one while at least
+    MIN_PARTIAL_TOKENS remain; the rest are dropped and named in a closing note. The kept
+    sections stay in their original order.
+    """
+    original_tokens = estimate_tokens(text)
+    if budget <= 0 or original_tokens <= budget:
+        return text, original_tokens, original_tokens
+
+    sections = split_sections(text)
+    remaining = budget - NOTE_TOKENS
+    chosen = {}
+    for index in sorted(range(len(sections)), key=lambda index: (SECTION_PRIORITY[sections[index][0]], index)):
+        category, lines = sections[index]
+        cost = lines_cost(lines)
+        if cost <= remaining:
+            chosen[index] = lines
+        elif remaining >= MIN_PARTIAL_TOKENS:
+            chosen[index] = trim_experience(lines, remaining) if category == "experience" else head_lines(lines, remaining)
+        else:
+            continue
+        remaining -= lines_cost(chosen[index])
+
+    omitted = [sections[index][1][0].strip() for index in range(len(sections))
+               if index not in chosen and sections[index][0] != "contact"]
+    trimmed = "\n".join(line for index in sorted(chosen) for line in chosen[index])
+    if omitted:
+        trimmed += f"\n[Sections omitted to save tokens: {', '.join(omitted)}]"
+    return trimmed, original_tokens, estimate_tokens(trimmed)